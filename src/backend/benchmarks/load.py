@@ -0,0 +1,390 @@
+import argparse
+import http.client
+import json
+import os
+import random
+import socket
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+
+# Proporção padrão de cada operação na carga mista
+DEFAULT_MIX = 'list=40,get=30,update=20,history=10'
+OPERATIONS = ('list', 'get', 'update', 'history')
+PERCENTILES = (50, 95, 99)
+
+
+def parse_mix(mix: str):
+    """Parse the workload mix.
+
+    Args:
+        mix (str): Comma-separated ``operation=weight`` pairs, such as ``list=40,get=60``.
+
+    Returns:
+        dict: The weight of each operation.
+
+    Raises:
+        ValueError: If an operation is unknown or a weight is not a non-negative integer.
+    """
+    weights = {}
+    for entry in mix.split(','):
+        name, _, weight = entry.partition('=')
+        name = name.strip()
+        if name not in OPERATIONS:
+            raise ValueError(f'Operação desconhecida na carga: {name!r} (use {", ".join(OPERATIONS)})')
+        if not weight.strip().isdigit():
+            raise ValueError(f'Peso inválido para a operação {name!r}: {weight!r}')
+        weights[name] = int(weight)
+    if not any(weights.values()):
+        raise ValueError('A carga precisa de ao menos uma operação com peso positivo')
+    return weights
+
+
+def seed(engine, items: int, movements: int, seed_value: int):
+    """Insert deterministic items and movements into an empty database.
+
+    The same seed always produces the same items, quantities and order of movements;
+    only the timestamps follow the current time, so they fall in the current partitions.
+
+    Args:
+        engine (Engine): The database engine.
+        items (int): The number of items.
+        movements (int): The number of movements.
+        seed_value (int): The seed of the generator.
+    """
+    from controller import summary
+    from models.models import DEFAULT_LOCATION_ID, Item, ItemStock, MovementType, StockMovementHistory, UoMType
+    from sqlalchemy import insert
+    from sqlalchemy.orm import Session
+
+    rng = random.Random(seed_value)
+    units = list(UoMType)
+    rows = [
+        {
+            'id': i + 1,
+            'produto': f'Produto {i:07d}',
+            'unidade_medida': units[rng.randrange(len(units))],
+            'custo_medio': round(rng.uniform(1, 100), 2),
+            'valor_venda': round(rng.uniform(100, 200), 2),
+            'estoque': 0.0,
+            'versao': 1,
+        }
+        for i in range(items)
+    ]
+
+    history = []
+    start = datetime.now(timezone.utc) - timedelta(seconds=movements)
+    for i in range(movements):
+        item = rows[rng.randrange(items)]
+        quantidade = float(rng.randint(1, 20))
+        if item['estoque'] >= quantidade and rng.random() < 0.4:
+            movimentacao = MovementType.SAIDA
+            item['estoque'] -= quantidade
+        else:
+            movimentacao = MovementType.ENTRADA
+            item['estoque'] += quantidade
+        history.append(
+            {
+                'data': start + timedelta(seconds=i),
+                'movimentacao': movimentacao,
+                'produto_id': item['id'],
+                'quantidade': quantidade,
+                'estoque_final': item['estoque'],
+            }
+        )
+
+    with engine.begin() as connection:
+        connection.execute(insert(Item), rows)
+        connection.execute(
+            insert(ItemStock),
+            [{'produto_id': row['id'], 'local_id': DEFAULT_LOCATION_ID, 'estoque': row['estoque']} for row in rows],
+        )
+        if history:
+            connection.execute(insert(StockMovementHistory), history)
+    if engine.dialect.name == 'postgresql':
+        with engine.begin() as connection:
+            connection.exec_driver_sql(f"SELECT setval(pg_get_serial_sequence('items', 'id'), {items + 1}, false)")
+    with Session(engine) as db:
+        summary.rebuild(db)
+
+
+def plan(rng: random.Random, requests: int, weights: dict, items: int):
+    """Build the sequence of requests of a run.
+
+    Args:
+        rng (random.Random): The generator.
+        requests (int): The number of requests.
+        weights (dict): The weight of each operation.
+        items (int): The number of seeded items.
+
+    Returns:
+        list[tuple]: The operation, method, path and JSON body of each request.
+    """
+    names = [name for name in weights if weights[name] > 0]
+    choices = rng.choices(names, weights=[weights[name] for name in names], k=requests)
+    sorts = ('id', 'produto')
+    result = []
+    for name in choices:
+        item_id = rng.randint(1, items)
+        if name == 'list':
+            result.append((name, 'GET', f'/api/items?limit=50&sort={rng.choice(sorts)}', None))
+        elif name == 'get':
+            result.append((name, 'GET', f'/api/items/{item_id}', None))
+        elif name == 'update':
+            # Entradas predominam para que as saídas raramente esbarrem em estoque insuficiente
+            quantidade = rng.randint(1, 10) if rng.random() < 0.7 else -1
+            result.append((name, 'POST', f'/api/items/{item_id}/movements', {'quantidade': quantidade}))
+        else:
+            result.append((name, 'GET', f'/api/movements/{item_id}?limit=50', None))
+    return result
+
+
+def percentile(values: list, percent: float):
+    """Get a percentile of sorted values by the nearest-rank method.
+
+    Args:
+        values (list[float]): The values, in ascending order.
+        percent (float): The percentile, between 0 and 100.
+
+    Returns:
+        float: The value at the percentile, or 0 if there are no values.
+    """
+    if not values:
+        return 0.0
+    rank = max(int(-(-percent * len(values) // 100)), 1)
+    return values[rank - 1]
+
+
+def summarize(latencies: list, errors: int, elapsed: float):
+    """Summarize the latencies of a group of requests.
+
+    Args:
+        latencies (list[float]): The latency of each request, in seconds.
+        errors (int): The number of responses with status 400 or above.
+        elapsed (float): The wall time of the run, in seconds.
+
+    Returns:
+        dict: The number of requests, errors, requests per second and latency percentiles in milliseconds.
+    """
+    ordered = sorted(latencies)
+    latency = {f'p{percent}': round(percentile(ordered, percent) * 1000, 3) for percent in PERCENTILES}
+    latency['mean'] = round(sum(ordered) / len(ordered) * 1000, 3) if ordered else 0.0
+    latency['max'] = round(ordered[-1] * 1000, 3) if ordered else 0.0
+    return {
+        'requests': len(ordered),
+        'errors': errors,
+        'rps': round(len(ordered) / elapsed, 2) if elapsed else 0.0,
+        'latency_ms': latency,
+    }
+
+
+def drive(port: int, requests: list, concurrency: int):
+    """Send requests to the server from several threads, each with its own keep-alive connection.
+
+    Args:
+        port (int): The server port on localhost.
+        requests (list[tuple]): The planned requests.
+        concurrency (int): The number of concurrent clients.
+
+    Returns:
+        tuple: The ``(operation, latency, status)`` of each request and the wall time, in seconds.
+    """
+    results = []
+    position = iter(range(len(requests)))
+    lock = threading.Lock()
+
+    def client():
+        connection = http.client.HTTPConnection('127.0.0.1', port)
+        local = []
+        try:
+            while True:
+                with lock:
+                    index = next(position, None)
+                if index is None:
+                    break
+                name, method, path, body = requests[index]
+                payload = json.dumps(body).encode() if body is not None else None
+                headers = {'Content-Type': 'application/json'} if payload is not None else {}
+                started = time.perf_counter()
+                connection.request(method, path, body=payload, headers=headers)
+                response = connection.getresponse()
+                response.read()
+                local.append((name, time.perf_counter() - started, response.status))
+        finally:
+            connection.close()
+            with lock:
+                results.extend(local)
+
+    threads = [threading.Thread(target=client) for _ in range(concurrency)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results, time.perf_counter() - started
+
+
+def free_port():
+    """Get a free TCP port on localhost.
+
+    Returns:
+        int: The port.
+    """
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def start_server(app, port: int):
+    """Start uvicorn with the application in a background thread.
+
+    Args:
+        app (FastAPI): The application.
+        port (int): The port on localhost.
+
+    Returns:
+        tuple: The server and its thread.
+
+    Raises:
+        RuntimeError: If the server does not start within 30 seconds.
+    """
+    import uvicorn
+
+    server = uvicorn.Server(uvicorn.Config(app, host='127.0.0.1', port=port, log_level='warning', access_log=False))
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    deadline = time.monotonic() + 30
+    while not server.started:
+        if not thread.is_alive() or time.monotonic() > deadline:
+            raise RuntimeError('O servidor de benchmark não iniciou')
+        time.sleep(0.05)
+    return server, thread
+
+
+def compare(report: dict, baseline: dict, tolerance: float):
+    """Compare a run with a baseline run.
+
+    A regression is a drop in requests per second or a rise in p95 latency beyond the
+    tolerance, overall or for an operation present in both runs.
+
+    Args:
+        report (dict): The current report.
+        baseline (dict): The baseline report.
+        tolerance (float): The accepted relative change, such as 0.1 for 10%.
+
+    Returns:
+        list[str]: A description of each regression.
+    """
+    groups = [('total', report['total'], baseline.get('total'))]
+    groups += [(name, stats, baseline.get('operations', {}).get(name)) for name, stats in report['operations'].items()]
+    regressions = []
+    for name, current, previous in groups:
+        if not previous:
+            continue
+        if current['rps'] < previous['rps'] * (1 - tolerance):
+            regressions.append(f'{name}: rps {current["rps"]} < {previous["rps"]}')
+        if current['latency_ms']['p95'] > previous['latency_ms']['p95'] * (1 + tolerance):
+            regressions.append(f'{name}: p95 {current["latency_ms"]["p95"]} ms > {previous["latency_ms"]["p95"]} ms')
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Executa uma carga mista de leituras e escritas contra a API e mede latência e vazão.'
+    )
+    parser.add_argument('--items', type=int, default=1000, help='Itens gerados no banco')
+    parser.add_argument('--movements', type=int, default=10000, help='Movimentações geradas no banco')
+    parser.add_argument('--requests', type=int, default=2000, help='Requisições medidas')
+    parser.add_argument('--warmup', type=int, default=200, help='Requisições de aquecimento, fora da medição')
+    parser.add_argument('--concurrency', type=int, default=8, help='Clientes simultâneos')
+    parser.add_argument('--mix', default=DEFAULT_MIX, help=f'Pesos das operações (padrão: {DEFAULT_MIX})')
+    parser.add_argument('--seed', type=int, default=42, help='Semente do gerador de dados e de requisições')
+    parser.add_argument('--mode', choices=('sync', 'async'), default='sync', help='DATABASE_MODE da API')
+    parser.add_argument(
+        '--database-url',
+        help='Banco vazio usado no benchmark, como um PostgreSQL local (padrão: SQLite temporário)',
+    )
+    parser.add_argument('--output', help='Arquivo em que o relatório JSON também é gravado')
+    parser.add_argument('--baseline', help='Relatório JSON de referência; regressões encerram com código 1')
+    parser.add_argument('--tolerance', type=float, default=0.1, help='Variação aceita em relação à referência')
+    args = parser.parse_args()
+    if args.items < 1 or args.requests < 1 or args.concurrency < 1:
+        parser.error('--items, --requests e --concurrency devem ser positivos')
+    try:
+        weights = parse_mix(args.mix)
+    except ValueError as e:
+        parser.error(str(e))
+
+    with tempfile.TemporaryDirectory() as directory:
+        os.environ['DATABASE_URL'] = args.database_url or f'sqlite:///{directory}/load.db'
+        os.environ['DATABASE_MODE'] = args.mode
+        # Tarefas periódicas desligadas para não interferir na medição
+        os.environ['SNAPSHOT_INTERVAL'] = '0'
+        os.environ['PARTITION_MAINTENANCE_INTERVAL'] = '0'
+        from main import app
+        from migrations.runner import migrate
+        from migrations.versions import MIGRATIONS
+        from models.database import async_engine, engine
+
+        migrate(engine, MIGRATIONS)
+        seed(engine, args.items, args.movements, args.seed)
+
+        rng = random.Random(args.seed)
+        warmup = plan(rng, args.warmup, weights, args.items)
+        measured = plan(rng, args.requests, weights, args.items)
+        server, thread = start_server(app, free_port())
+        try:
+            port = server.servers[0].sockets[0].getsockname()[1]
+            drive(port, warmup, args.concurrency)
+            results, elapsed = drive(port, measured, args.concurrency)
+        finally:
+            server.should_exit = True
+            thread.join()
+            engine.dispose()
+            if async_engine is not None:
+                async_engine.sync_engine.dispose()
+
+    report = {
+        'config': {
+            'items': args.items,
+            'movements': args.movements,
+            'requests': args.requests,
+            'concurrency': args.concurrency,
+            'mix': weights,
+            'seed': args.seed,
+            'mode': args.mode,
+            'database': engine.dialect.name,
+        },
+        'duration_s': round(elapsed, 3),
+        'total': summarize(
+            [latency for _, latency, _ in results], sum(status >= 400 for *_, status in results), elapsed
+        ),
+        'operations': {
+            name: summarize(
+                [latency for operation, latency, _ in results if operation == name],
+                sum(status >= 400 for operation, _, status in results if operation == name),
+                elapsed,
+            )
+            for name in OPERATIONS
+            if any(operation == name for operation, _, _ in results)
+        },
+    }
+    regressions = []
+    if args.baseline:
+        with open(args.baseline) as file:
+            regressions = compare(report, json.load(file), args.tolerance)
+        report['regressions'] = regressions
+
+    document = json.dumps(report, indent=2)
+    print(document)
+    if args.output:
+        with open(args.output, 'w') as file:
+            file.write(document + '\n')
+    if regressions:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
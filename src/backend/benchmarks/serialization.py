@@ -0,0 +1,132 @@
+import argparse
+import json
+import os
+import tempfile
+import time
+
+
+def seed(engine, rows: int):
+    """Insert synthetic items into an empty database.
+
+    Args:
+        engine (Engine): The database engine.
+        rows (int): The number of items to insert.
+    """
+    from migrations.runner import migrate
+    from migrations.versions import MIGRATIONS
+    from models.models import Item, UoMType
+    from sqlalchemy import insert
+
+    migrate(engine, MIGRATIONS)
+    units = list(UoMType)
+    with engine.begin() as conn:
+        conn.execute(
+            insert(Item),
+            [
+                {
+                    'produto': f'Produto {i:07d}',
+                    'unidade_medida': units[i % len(units)],
+                    'custo_medio': 1.5 + i % 100,
+                    'valor_venda': 3.0 + i % 100,
+                    'estoque': float(i % 500),
+                    'versao': 1,
+                }
+                for i in range(rows)
+            ],
+        )
+
+
+def serialize_orm(db, rows: int):
+    """Serialize items the way a ``response_model`` route does: ORM objects validated by Pydantic.
+
+    Args:
+        db (Session): The database session.
+        rows (int): The number of items to serialize.
+
+    Returns:
+        bytes: The JSON document.
+    """
+    from models.models import Item
+    from pydantic import TypeAdapter
+    from schemas.schema import ItemResponse
+    from sqlalchemy import select
+
+    items = db.scalars(select(Item).order_by(Item.id).limit(rows)).all()
+    adapter = TypeAdapter(list[ItemResponse])
+    content = adapter.dump_python(adapter.validate_python(items, from_attributes=True), mode='json')
+    return json.dumps(content, ensure_ascii=False, separators=(',', ':')).encode()
+
+
+def serialize_fast(db, rows: int):
+    """Serialize items with the fast path: column tuples encoded by orjson.
+
+    Args:
+        db (Session): The database session.
+        rows (int): The number of items to serialize.
+
+    Returns:
+        bytes: The JSON document.
+    """
+    import orjson
+    from controller.crud import ITEM_COLUMNS, item_row_to_dict
+    from models.models import Item
+    from sqlalchemy import select
+
+    statement = select(*ITEM_COLUMNS).order_by(Item.id).limit(rows)
+    return orjson.dumps([item_row_to_dict(row) for row in db.execute(statement)])
+
+
+def measure(function, session_factory, rows: int, repeat: int):
+    """Run a serializer several times and keep the best time.
+
+    Args:
+        function (Callable): The serializer.
+        session_factory (sessionmaker): Factory of database sessions.
+        rows (int): The number of items to serialize.
+        repeat (int): The number of runs.
+
+    Returns:
+        float: The best throughput, in rows per second.
+    """
+    best = float('inf')
+    for _ in range(repeat):
+        with session_factory() as db:
+            start = time.perf_counter()
+            function(db, rows)
+            best = min(best, time.perf_counter() - start)
+    return rows / best
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Compara a serialização das listas de itens: ORM + Pydantic versus colunas + orjson.'
+    )
+    parser.add_argument('--rows', type=int, default=50000, help='Quantidade de itens serializados')
+    parser.add_argument('--repeat', type=int, default=5, help='Execuções por modo (vale a melhor)')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        # Sempre um banco SQLite temporário, nunca o banco configurado no ambiente
+        os.environ['DATABASE_URL'] = f'sqlite:///{directory}/serialization.db'
+        from models.database import SessionLocal, engine
+
+        seed(engine, args.rows)
+        baseline = measure(serialize_orm, SessionLocal, args.rows, args.repeat)
+        fast = measure(serialize_fast, SessionLocal, args.rows, args.repeat)
+        engine.dispose()
+
+    print(
+        json.dumps(
+            {
+                'rows': args.rows,
+                'orm_pydantic_rows_per_second': round(baseline),
+                'columns_orjson_rows_per_second': round(fast),
+                'speedup': round(fast / baseline, 2),
+            },
+            indent=2,
+        )
+    )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,417 @@
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from fastapi.concurrency import run_in_threadpool
+from models.database import env_int
+
+try:
+    import redis
+except ImportError:  # pragma: no cover - dependência opcional
+    redis = None
+
+logger = logging.getLogger(__name__)
+
+# Número de workers do uvicorn (a mesma variável que o uvicorn lê para o padrão de --workers)
+WEB_CONCURRENCY = env_int('WEB_CONCURRENCY', 1)
+
+
+def default_backend(workers: int = WEB_CONCURRENCY):
+    """Get the cache backend used when ``CACHE_BACKEND`` is not set.
+
+    The memory backend is only invalidated inside its own process, so with several
+    workers the others would serve stale items and ETags until the TTL expires.
+
+    Args:
+        workers (int): The number of worker processes.
+
+    Returns:
+        str: 'memory' with a single worker, otherwise 'none'.
+    """
+    return 'memory' if workers <= 1 else 'none'
+
+
+# Backend do cache: 'memory' (LRU em processo, apenas com um worker), 'redis' (compartilhado entre workers) ou 'none'
+CACHE_BACKEND = os.getenv('CACHE_BACKEND', default_backend()).lower()
+CACHE_URL = os.getenv('CACHE_URL', 'redis://localhost:6379/0')
+CACHE_TTL = env_int('CACHE_TTL', 30)
+CACHE_MAX_ENTRIES = env_int('CACHE_MAX_ENTRIES', 10000)
+
+MISSING = object()
+
+
+class CacheStats:
+    """Cache hit, miss and eviction counters.
+
+    Attributes:
+        hits (int): The number of lookups answered by the cache.
+        misses (int): The number of lookups that went to the database.
+        evictions (int): The number of entries evicted to respect the size limit.
+        invalidations (int): The number of invalidated entries or namespaces.
+    """
+
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def to_dict(self):
+        """Convert the counters to a dictionary.
+
+        Returns:
+            dict: The counters and the hit ratio.
+        """
+        lookups = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'invalidations': self.invalidations,
+            'hit_ratio': self.hits / lookups if lookups else 0.0,
+        }
+
+
+class NullCache:
+    """Cache backend that never stores anything.
+
+    Attributes:
+        blocking (bool): Whether the operations block on network I/O.
+    """
+
+    blocking = False
+
+    def __init__(self):
+        self.stats = CacheStats()
+
+    def get(self, key: str):
+        """Count a miss."""
+        self.stats.misses += 1
+        return MISSING
+
+    def set(self, key: str, value, ttl: int = CACHE_TTL):
+        """Discard the value."""
+        pass
+
+    def delete(self, key: str):
+        """Do nothing."""
+        pass
+
+    def counter(self, key: str):
+        """Always return zero."""
+        return 0
+
+    def incr(self, key: str):
+        """Always return zero."""
+        return 0
+
+    def size(self):
+        """Always return zero."""
+        return 0
+
+
+class MemoryCache:
+    """In-process LRU cache with per-entry TTL and a bounded number of entries.
+
+    Attributes:
+        blocking (bool): Whether the operations block on network I/O.
+        max_entries (int): The maximum number of entries kept.
+        stats (CacheStats): The cache counters.
+    """
+
+    blocking = False
+
+    def __init__(self, max_entries: int = CACHE_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        # Contadores ficam fora do LRU para nunca serem despejados
+        self.counters = {}
+        self.lock = threading.Lock()
+        self.stats = CacheStats()
+
+    def get(self, key: str):
+        """Get a value, refreshing its LRU position.
+
+        Args:
+            key (str): The cache key.
+
+        Returns:
+            The cached value, or MISSING if absent or expired.
+        """
+        now = time.monotonic()
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None or entry[0] < now:
+                if entry is not None:
+                    del self.entries[key]
+                self.stats.misses += 1
+                return MISSING
+            self.entries.move_to_end(key)
+            self.stats.hits += 1
+            return entry[1]
+
+    def set(self, key: str, value, ttl: int = CACHE_TTL):
+        """Store a value, evicting the least recently used entries when full.
+
+        Args:
+            key (str): The cache key.
+            value: The value to store.
+            ttl (int): The time to live, in seconds.
+        """
+        with self.lock:
+            self.entries[key] = (time.monotonic() + ttl, value)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+                self.stats.evictions += 1
+
+    def delete(self, key: str):
+        """Remove a value.
+
+        Args:
+            key (str): The cache key.
+        """
+        with self.lock:
+            self.entries.pop(key, None)
+
+    def counter(self, key: str):
+        """Read an integer counter without touching the hit/miss counters.
+
+        Args:
+            key (str): The counter key.
+
+        Returns:
+            int: The counter value, 0 if never incremented.
+        """
+        with self.lock:
+            return self.counters.get(key, 0)
+
+    def incr(self, key: str):
+        """Increment an integer counter that never expires.
+
+        Args:
+            key (str): The counter key.
+
+        Returns:
+            int: The new counter value.
+        """
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0) + 1
+            return self.counters[key]
+
+    def size(self):
+        """Get the number of entries.
+
+        Returns:
+            int: The number of entries, including expired ones not yet removed.
+        """
+        return len(self.entries)
+
+
+class RedisCache:
+    """Cache backend on any Redis-compatible server, shared by all workers.
+
+    Values are stored as JSON; entries are evicted by TTL and by the server's
+    ``maxmemory`` policy.
+
+    Attributes:
+        blocking (bool): Whether the operations block on network I/O.
+        client (redis.Redis): The Redis client.
+        stats (CacheStats): The cache counters of this process.
+    """
+
+    # Cada operação é uma ida e volta ao servidor
+    blocking = True
+
+    def __init__(self, url: str = CACHE_URL, client=None):
+        if client is None:
+            if redis is None:
+                raise RuntimeError("CACHE_BACKEND=redis requer o pacote 'redis' instalado")
+            client = redis.Redis.from_url(url)
+        self.client = client
+        self.stats = CacheStats()
+
+    def get(self, key: str):
+        """Get a value.
+
+        Args:
+            key (str): The cache key.
+
+        Returns:
+            The cached value, or MISSING if absent or expired.
+        """
+        raw = self.client.get(key)
+        if raw is None:
+            self.stats.misses += 1
+            return MISSING
+        self.stats.hits += 1
+        return json.loads(raw)
+
+    def set(self, key: str, value, ttl: int = CACHE_TTL):
+        """Store a value as JSON.
+
+        Args:
+            key (str): The cache key.
+            value: The value to store.
+            ttl (int): The time to live, in seconds.
+        """
+        self.client.set(key, json.dumps(value, default=str), ex=ttl)
+
+    def delete(self, key: str):
+        """Remove a value.
+
+        Args:
+            key (str): The cache key.
+        """
+        self.client.delete(key)
+
+    def counter(self, key: str):
+        """Read an integer counter without touching the hit/miss counters.
+
+        Args:
+            key (str): The counter key.
+
+        Returns:
+            int: The counter value, 0 if never incremented.
+        """
+        return int(self.client.get(key) or 0)
+
+    def incr(self, key: str):
+        """Increment an integer counter atomically for all workers.
+
+        Args:
+            key (str): The counter key.
+
+        Returns:
+            int: The new counter value.
+        """
+        return self.client.incr(key)
+
+    def size(self):
+        """Get the number of keys in the Redis database.
+
+        Returns:
+            int: The number of keys.
+        """
+        return self.client.dbsize()
+
+
+def create_cache(backend: str = CACHE_BACKEND):
+    """Create the configured cache backend.
+
+    Args:
+        backend (str): 'memory', 'redis' or 'none'.
+
+    Returns:
+        The cache backend.
+
+    Raises:
+        ValueError: If the backend is unknown.
+    """
+    if backend == 'memory':
+        if WEB_CONCURRENCY > 1:
+            logger.warning(
+                'CACHE_BACKEND=memory com WEB_CONCURRENCY=%d: cada worker invalida apenas o próprio cache e os demais '
+                'servem itens e ETags desatualizados por até CACHE_TTL segundos; use CACHE_BACKEND=redis',
+                WEB_CONCURRENCY,
+            )
+        return MemoryCache()
+    if backend == 'redis':
+        return RedisCache()
+    if backend == 'none':
+        return NullCache()
+    raise ValueError("A variável de ambiente CACHE_BACKEND deve ser 'memory', 'redis' ou 'none'")
+
+
+cache = create_cache()
+
+
+async def run_blocking(function, *args):
+    """Run a cache operation without blocking the event loop on network I/O.
+
+    Operations of backends that talk to a server run in the threadpool; in-process
+    backends run inline.
+
+    Args:
+        function (Callable): The cache operation.
+        *args: The operation arguments.
+
+    Returns:
+        The operation result.
+    """
+    if cache.blocking:
+        return await run_in_threadpool(function, *args)
+    return function(*args)
+
+
+async def read_through(key: str, load):
+    """Get a value from the cache, loading and storing it on a miss.
+
+    Args:
+        key (str): The cache key.
+        load (Callable): Coroutine function that loads the value from the database.
+
+    Returns:
+        The cached or loaded value.
+    """
+    value = await run_blocking(cache.get, key)
+    if value is MISSING:
+        value = await load()
+        await run_blocking(cache.set, key, value)
+    return value
+
+
+def item_key(item_id: int):
+    """Get the cache key of an item.
+
+    Args:
+        item_id (int): The item ID.
+
+    Returns:
+        str: The cache key.
+    """
+    return f'item:{item_id}'
+
+
+def items_key(query):
+    """Get the cache key of an item listing.
+
+    The key embeds the current listing generation, so every listing is invalidated at
+    once by :func:`invalidate_items`.
+
+    Args:
+        query (ItemQuery): The listing parameters.
+
+    Returns:
+        str: The cache key.
+    """
+    generation = cache.counter('items:generation')
+    return f'items:{generation}:{query.model_dump_json()}'
+
+
+def invalidate_item(item_id: int):
+    """Invalidate an item and every item listing.
+
+    Args:
+        item_id (int): The item ID.
+    """
+    cache.delete(item_key(item_id))
+    invalidate_items()
+
+
+def invalidate_items():
+    """Invalidate every item listing."""
+    cache.incr('items:generation')
+    cache.stats.invalidations += 1
+
+
+def cache_status():
+    """Get the cache configuration and counters.
+
+    Returns:
+        dict: The backend, TTL, number of entries and counters.
+    """
+    return {'backend': CACHE_BACKEND, 'ttl': CACHE_TTL, 'entries': cache.size(), **cache.stats.to_dict()}
@@ -1,32 +1,175 @@
-from models.models import Item, MovementType, StockMovementHistory
-from schemas.schema import ItemCreate, ItemUpdate
-from sqlalchemy import func, select
+from datetime import datetime, timedelta
+
+from controller import search, summary
+from controller.pagination import decode_cursor, encode_cursor
+from models.models import (
+    DEFAULT_LOCATION_ID,
+    DailyMovementSummary,
+    Item,
+    ItemStock,
+    Location,
+    MovementType,
+    StockMovementHistory,
+    StockSnapshot,
+    StockSnapshotItem,
+    ValuationSummary,
+)
+from schemas.schema import (
+    DEFAULT_PAGE_SIZE,
+    DailyMovementQuery,
+    ItemCreate,
+    ItemExportQuery,
+    ItemFilter,
+    ItemQuery,
+    ItemUpdate,
+    LocationCreate,
+    LocationStockQuery,
+    MovementBatch,
+    MovementCreate,
+    MovementExportQuery,
+    MovementFilter,
+    MovementQuery,
+    SearchQuery,
+    StockAsOfQuery,
+    TransferCreate,
+)
+from sqlalchemy import bindparam, case, delete, exists, func, insert, literal, select, tuple_, update
+from sqlalchemy.exc import IntegrityError, SQLAlchemyError
 from sqlalchemy.orm import Session
 
+# Número máximo de movimentações removidas por transação na limpeza de itens arquivados
+PURGE_BATCH_SIZE = 5000
+
+
+class StockError(ValueError):
+    """Raised when a change would leave the stock of an item at a location negative."""
+
+
+class LocationNotFound(LookupError):
+    """Raised when a movement or transfer refers to a location that does not exist."""
+
 
-def get_current_date_formatted(db: Session):
-    """Get the current date formatted as DD/MM/YYYY.
+def filter_items(statement, query: ItemFilter):
+    """Apply the listing filters to an item query.
 
     Args:
-        db (Session): The database session.
+        statement (Select): The select statement over items.
+        query (ItemFilter): The filter parameters.
+
+    Returns:
+        Select: The filtered statement.
+    """
+    statement = statement.where(Item.arquivado_em.is_(None))
+    if query.produto:
+        statement = statement.where(Item.produto.startswith(query.produto, autoescape=True))
+    if query.unidade_medida is not None:
+        statement = statement.where(Item.unidade_medida == query.unidade_medida)
+    if query.estoque_min is not None:
+        statement = statement.where(Item.estoque >= query.estoque_min)
+    if query.estoque_max is not None:
+        statement = statement.where(Item.estoque <= query.estoque_max)
+    if query.low_stock is not None:
+        statement = statement.where(Item.estoque < query.low_stock)
+    return statement
+
+
+ITEM_COLUMNS = (
+    Item.id,
+    Item.produto,
+    Item.unidade_medida,
+    Item.custo_medio,
+    Item.valor_venda,
+    Item.estoque,
+    Item.versao,
+)
+
+MOVEMENT_COLUMNS = (
+    StockMovementHistory.id,
+    StockMovementHistory.data,
+    StockMovementHistory.movimentacao,
+    StockMovementHistory.produto_id,
+    StockMovementHistory.local_id,
+    StockMovementHistory.quantidade,
+    StockMovementHistory.estoque_final,
+    StockMovementHistory.custo_unitario,
+    StockMovementHistory.transferencia,
+)
+
+
+def item_row_to_dict(row):
+    """Convert an item column row to the same dictionary as ``Item.to_dict``.
+
+    Args:
+        row (Row): The row selected with ``ITEM_COLUMNS``.
 
     Returns:
-        str: The current date formatted as DD/MM/YYYY.
+        dict: The item as a dictionary.
     """
-    result = db.execute(select(func.current_date())).scalar()
-    return result
+    item = dict(row._mapping)
+    item['unidade_medida'] = item['unidade_medida'].value
+    return item
 
 
-def get_items(db: Session):
-    """Get all items.
+def movement_row_to_dict(row):
+    """Convert a movement column row to the same dictionary as ``StockMovementHistory.to_dict``.
+
+    Args:
+        row (Row): The row selected with ``MOVEMENT_COLUMNS``.
+
+    Returns:
+        dict: The movement as a dictionary.
+    """
+    movement = dict(row._mapping)
+    movement['movimentacao'] = movement['movimentacao'].value
+    return movement
+
+
+def get_items(db: Session, query: ItemQuery):
+    """Get a page of items using keyset pagination.
+
+    Items are ordered by ``id`` or by ``(produto, id)`` and the page starts right after
+    the position encoded in ``query.after``, so the cost of a page does not depend on
+    how deep into the catalog it is. Only the needed columns are selected, without
+    hydrating ORM objects.
 
     Args:
         db (Session): The database session.
+        query (ItemQuery): The listing parameters.
 
     Returns:
-        list: A list of all items.
+        tuple: The items in the page as dictionaries and the cursor for the next page (None on the last page).
+
+    Raises:
+        ValueError: If the cursor is invalid.
     """
-    return db.scalars(select(Item)).all()
+    statement = filter_items(select(*ITEM_COLUMNS), query)
+    descending = query.order == 'desc'
+
+    if query.sort == 'produto':
+        key = tuple_(Item.produto, Item.id)
+        order_by = (Item.produto.desc(), Item.id.desc()) if descending else (Item.produto, Item.id)
+    else:
+        key = Item.id
+        order_by = (Item.id.desc(),) if descending else (Item.id,)
+
+    if query.after:
+        position = decode_cursor(query.after, query.sort, query.order)
+        try:
+            value = (str(position['produto']), int(position['id'])) if query.sort == 'produto' else int(position['id'])
+        except (KeyError, TypeError, ValueError):
+            raise ValueError('Cursor inválido')
+        bound = tuple_(*value) if query.sort == 'produto' else value
+        statement = statement.where(key < bound if descending else key > bound)
+
+    items = [item_row_to_dict(row) for row in db.execute(statement.order_by(*order_by).limit(query.limit + 1))]
+
+    next_cursor = None
+    if len(items) > query.limit:
+        items = items[: query.limit]
+        last = items[-1]
+        position = {'produto': last['produto'], 'id': last['id']} if query.sort == 'produto' else {'id': last['id']}
+        next_cursor = encode_cursor(query.sort, query.order, position)
+    return items, next_cursor
 
 
 def get_item(db: Session, item_id: int):
@@ -40,14 +183,51 @@ def get_item(db: Session, item_id: int):
         Item: The item with the given ID, or None if not found.
     """
     item = db.get(Item, item_id)
-    if not item:
+    if not item or item.arquivado_em is not None:
         return None
     return item
 
 
+def load_items_page(db: Session, query: ItemQuery):
+    """Load a page of items in the form stored by the read-through cache.
+
+    Args:
+        db (Session): The database session.
+        query (ItemQuery): The listing parameters.
+
+    Returns:
+        dict: The items in the page as dictionaries and the cursor for the next page.
+
+    Raises:
+        ValueError: If the cursor is invalid.
+    """
+    items, next_cursor = get_items(db, query)
+    return {'items': items, 'next_cursor': next_cursor}
+
+
+def load_item(db: Session, item_id: int):
+    """Load an item in the form stored by the read-through cache.
+
+    A missing item is loaded as None, which is cached too, so repeated lookups of unknown IDs
+    do not reach the database.
+
+    Args:
+        db (Session): The database session.
+        item_id (int): The item ID.
+
+    Returns:
+        dict: The item as a dictionary, or None if not found.
+    """
+    item = get_item(db, item_id)
+    return item.to_dict() if item else None
+
+
 def create_item(db: Session, item: ItemCreate):
     """Create a new item.
 
+    The item, its stock at the default location and its initial ENTRADA movement are
+    written in a single transaction.
+
     Args:
         db (Session): The database session.
         item (ItemCreate): The item data.
@@ -63,65 +243,496 @@ def create_item(db: Session, item: ItemCreate):
         estoque=item.estoque,
     )
     db.add(new_item)
-    db.commit()
-    db.refresh(new_item)
 
     if item.estoque > 0:
         # Criar histórico de movimentação de entrada
-        new_movement = create_movement_history(db, new_item, MovementType.ENTRADA, new_item.estoque)
-        db.add(new_movement)
-        db.commit()
-        db.refresh(new_movement)
+        movement = create_movement_history(db, new_item, MovementType.ENTRADA, new_item.estoque)
+        movement.custo_unitario = item.custo_medio
+        db.add(movement)
+    db.flush()
+    db.add(ItemStock(produto_id=new_item.id, local_id=DEFAULT_LOCATION_ID, estoque=item.estoque))
+    db.flush()
+
+    delta = summary.SummaryDelta()
+    delta.add_item(new_item.id, item.unidade_medida, item.estoque, item.custo_medio, item.valor_venda)
+    if item.estoque > 0:
+        delta.add_movement(new_item.id, MovementType.ENTRADA, item.estoque)
+    delta.apply(db)
+    search.invalidate(db)
+
+    db.commit()
     return new_item
 
 
-def update_item(db: Session, item_id: int, item_update: ItemUpdate):
+def import_items(db: Session, items: list[ItemCreate]):
+    """Insert a batch of items and their initial ENTRADA movements.
+
+    Items, their stock at the default location and movements are written with
+    multi-row INSERTs in a single transaction.
+
+    Args:
+        db (Session): The database session.
+        items (list[ItemCreate]): The items to insert.
+
+    Returns:
+        int: The number of inserted items.
+
+    Raises:
+        SQLAlchemyError: If the batch cannot be inserted; the transaction is rolled back.
+    """
+    try:
+        rows = db.execute(
+            insert(Item).returning(Item.id, Item.estoque, Item.custo_medio, sort_by_parameter_order=True),
+            [item.model_dump() for item in items],
+        ).all()
+        db.execute(
+            insert(ItemStock),
+            [
+                {'produto_id': item_id, 'local_id': DEFAULT_LOCATION_ID, 'estoque': estoque}
+                for item_id, estoque, _ in rows
+            ],
+        )
+        movements = [
+            {
+                'movimentacao': MovementType.ENTRADA,
+                'produto_id': item_id,
+                'local_id': DEFAULT_LOCATION_ID,
+                'quantidade': estoque,
+                'estoque_final': estoque,
+                'custo_unitario': custo_medio,
+            }
+            for item_id, estoque, custo_medio in rows
+            if estoque > 0
+        ]
+        if movements:
+            db.execute(insert(StockMovementHistory).values(data=func.now()), movements)
+
+        delta = summary.SummaryDelta()
+        for (item_id, estoque, _), item in zip(rows, items):
+            delta.add_item(item_id, item.unidade_medida, estoque, item.custo_medio, item.valor_venda)
+            if estoque > 0:
+                delta.add_movement(item_id, MovementType.ENTRADA, estoque)
+        delta.apply(db)
+        search.invalidate(db)
+        db.commit()
+    except SQLAlchemyError:
+        db.rollback()
+        raise
+    return len(rows)
+
+
+def update_item(db: Session, item_id: int, item_update: ItemUpdate, expected_version: int = None):
     """Update an existing item.
 
+    The item and the movement generated by a stock change are written in a single transaction.
+    A change of ``estoque`` is applied to the stock at the default location.
+
     Args:
         db (Session): The database session.
         item_id (int): The item ID.
         item_update (ItemUpdate): The updated item data.
+        expected_version (int): If given, the update is only applied when the item is still at this version.
 
     Returns:
         Item: The updated item, or None if not found.
+
+    Raises:
+        ValueError: If the item is no longer at the expected version.
+        StockError: If the default location does not hold enough stock for a reduction.
     """
-    item = db.get(Item, item_id)
-    if not item:
+    # Bloqueia a linha até o commit para que o cálculo da diferença não perca atualizações concorrentes
+    item = db.get(Item, item_id, with_for_update=True)
+    if not item or item.arquivado_em is not None:
+        db.rollback()
         return None
+    if expected_version is not None and item.versao != expected_version:
+        db.rollback()
+        raise ValueError('O item foi alterado por outra requisição')
 
-    # Armazenar o estoque antes da atualização
+    # Armazenar o estoque e o nome antes da atualização
     estoque_anterior = item.estoque
+    produto_anterior = item.produto
+    delta = summary.SummaryDelta()
+    delta.remove_item(item.id, item.unidade_medida, item.estoque, item.custo_medio, item.valor_venda)
 
     for key, value in item_update.model_dump(exclude_unset=True).items():
         setattr(item, key, value)
 
+    # Determinar o tipo de movimentação com base na diferença de estoque
+    if item.estoque != estoque_anterior:
+        estoque_local = change_location_stock(db, item.id, DEFAULT_LOCATION_ID, item.estoque - estoque_anterior)
+        if estoque_local is None:
+            db.rollback()
+            raise StockError('Estoque insuficiente no local padrão para reduzir o estoque')
+        movimentacao = MovementType.ENTRADA if item.estoque > estoque_anterior else MovementType.SAIDA
+        quantidade = abs(item.estoque - estoque_anterior)
+        db.add(create_movement_history(db, item, movimentacao, quantidade, estoque_final=estoque_local))
+        delta.add_movement(item.id, movimentacao, quantidade)
+
+    delta.add_item(item.id, item.unidade_medida, item.estoque, item.custo_medio, item.valor_venda)
+    db.flush()
+    delta.apply(db)
+    if item.produto != produto_anterior:
+        search.invalidate(db)
     db.commit()
-    db.refresh(item)
+    return item
 
-    # Determinar o tipo de movimentação com base na diferença de estoque
-    if item.estoque > estoque_anterior:
-        tipo_movimentacao = MovementType.ENTRADA
-        quantidade = item.estoque - estoque_anterior
-    elif item.estoque < estoque_anterior:
-        tipo_movimentacao = MovementType.SAIDA
-        quantidade = estoque_anterior - item.estoque
+
+def weighted_average_cost(estoque, custo_medio, quantidade: float, custo_unitario: float):
+    """Get the moving weighted average cost after receiving goods.
+
+    Works both on Python values and on SQL expressions, so the same formula is used by
+    the atomic UPDATE and by the batches computed in memory.
+
+    Args:
+        estoque: The stock before the receipt.
+        custo_medio: The average cost before the receipt.
+        quantidade (float): The quantity received.
+        custo_unitario (float): The unit cost of the received goods.
+
+    Returns:
+        The new average cost.
+    """
+    return (estoque * custo_medio + quantidade * custo_unitario) / (estoque + quantidade)
+
+
+def change_location_stock(db: Session, item_id: int, local_id: int, delta: float):
+    """Change the stock of an item at a location atomically.
+
+    An increase creates the location stock on the first ENTRADA; a decrease only
+    applies when the location holds enough stock, so no constraint violation aborts
+    the transaction.
+
+    Args:
+        db (Session): The database session.
+        item_id (int): The item ID.
+        local_id (int): The location ID.
+        delta (float): The quantity to add; negative to remove stock.
+
+    Returns:
+        float: The stock at the location after the change, or None if it does not hold enough stock.
+    """
+    if delta > 0:
+        statement = summary.increment_statement(
+            db,
+            ItemStock,
+            ('produto_id', 'local_id'),
+            ('estoque',),
+            produto_id=item_id,
+            local_id=local_id,
+            estoque=delta,
+        )
     else:
-        # Se o estoque não mudou, não criar movimentação
-        return item
+        statement = (
+            update(ItemStock)
+            .where(ItemStock.produto_id == item_id, ItemStock.local_id == local_id, ItemStock.estoque + delta >= 0)
+            .values(estoque=ItemStock.estoque + delta)
+            .execution_options(synchronize_session=False)
+        )
+    return db.scalar(statement.returning(ItemStock.estoque))
+
+
+def missing_locations(db: Session, location_ids):
+    """Find the locations that do not exist.
+
+    The default location always exists and is not looked up.
+
+    Args:
+        db (Session): The database session.
+        location_ids (Iterable[int]): The location IDs.
+
+    Returns:
+        set[int]: The IDs of the missing locations.
+    """
+    wanted = set(location_ids) - {DEFAULT_LOCATION_ID}
+    if not wanted:
+        return set()
+    return wanted - set(db.scalars(select(Location.id).where(Location.id.in_(wanted))))
+
+
+def apply_movement(db: Session, item_id: int, movement: MovementCreate):
+    """Apply a stock movement to an item atomically.
+
+    The stock is changed with a single ``UPDATE ... SET estoque = estoque + :delta RETURNING``,
+    so concurrent movements on the same item never lose updates. An ENTRADA with a unit
+    cost also updates ``custo_medio`` to the moving weighted average in the same
+    statement. The stock at the location of the movement and the movement record are
+    written in the same transaction.
+
+    Args:
+        db (Session): The database session.
+        item_id (int): The item ID.
+        movement (MovementCreate): The movement data.
+
+    Returns:
+        StockMovementHistory: The created movement record, or None if the item is not found.
+
+    Raises:
+        StockError: If the movement would leave the stock at the location negative.
+        LocationNotFound: If the location does not exist.
+    """
+    if missing_locations(db, [movement.local_id]):
+        db.rollback()
+        raise LocationNotFound('Local não encontrado')
+
+    delta = movement.delta
+    values = {'estoque': Item.estoque + delta, 'versao': Item.versao + 1}
+    if movement.custo_unitario is not None:
+        # O SET usa os valores anteriores da linha, então estoque e custo são lidos antes da alteração
+        values['custo_medio'] = weighted_average_cost(
+            Item.estoque, func.coalesce(Item.custo_medio, 0), delta, movement.custo_unitario
+        )
+    statement = (
+        update(Item)
+        .where(Item.id == item_id, Item.arquivado_em.is_(None))
+        .values(**values)
+        .returning(Item.estoque, Item.unidade_medida, Item.custo_medio, Item.valor_venda)
+        .execution_options(synchronize_session=False)
+    )
+    try:
+        row = db.execute(statement).one_or_none()
+    except IntegrityError:
+        # Violação da constraint stock_positive
+        db.rollback()
+        raise StockError('Estoque insuficiente para a movimentação')
 
-    # Criar histórico de movimentação
-    new_movement = create_movement_history(db, item, tipo_movimentacao, quantidade)
+    if row is None:
+        db.rollback()
+        return None
+
+    # A linha do item é bloqueada antes da linha do local, a mesma ordem das demais escritas
+    _, unidade_medida, custo_medio, valor_venda = row
+    estoque_final = change_location_stock(db, item_id, movement.local_id, delta)
+    if estoque_final is None:
+        db.rollback()
+        raise StockError('Estoque insuficiente no local para a movimentação')
+
+    movimentacao = MovementType.ENTRADA if delta > 0 else MovementType.SAIDA
+    new_movement = StockMovementHistory(
+        data=func.now(),
+        movimentacao=movimentacao,
+        produto_id=item_id,
+        local_id=movement.local_id,
+        quantidade=abs(delta),
+        estoque_final=estoque_final,
+        custo_unitario=movement.custo_unitario,
+    )
     db.add(new_movement)
+    db.flush()
+
+    # A média ponderada preserva o valor do estoque anterior: o valor muda apenas pelo que entrou ou saiu
+    changes = summary.SummaryDelta()
+    cost = movement.custo_unitario if movement.custo_unitario is not None else custo_medio
+    changes.add_item(item_id, unidade_medida, delta, cost, valor_venda, itens=0)
+    changes.add_movement(item_id, movimentacao, abs(delta))
+    changes.apply(db)
     db.commit()
-    db.refresh(new_movement)
+    return new_movement
+
+
+def apply_movement_batch(db: Session, batch: MovementBatch):
+    """Apply a batch of stock movements in a single transaction.
+
+    The affected active items are locked with one ``SELECT ... FOR UPDATE`` ordered by ID and
+    then their stock at the affected locations ordered by ``(produto_id, local_id)``, so
+    concurrent batches always lock in the same order and cannot deadlock. The stock
+    changes, including the weighted average cost of ENTRADA lines with a unit cost, are
+    applied with a single executemany UPDATE, the location stocks with a single
+    executemany upsert and the movement records with a single multi-row INSERT.
+
+    Args:
+        db (Session): The database session.
+        batch (MovementBatch): The movements and the failure mode.
+
+    Returns:
+        dict: The number of applied and failed lines and the errors of the failed lines.
+            In 'all_or_nothing' mode nothing is applied when any line fails.
+    """
+    product_ids = sorted({line.produto_id for line in batch.lines})
+    locked = db.execute(
+        select(Item.id, Item.estoque, Item.unidade_medida, Item.custo_medio, Item.valor_venda)
+        .where(Item.id.in_(product_ids), Item.arquivado_em.is_(None))
+        .order_by(Item.id)
+        .with_for_update()
+    ).all()
+    estoques = {row.id: row.estoque for row in locked}
+    custos = {row.id: row.custo_medio for row in locked}
+    items = {row.id: row for row in locked}
+
+    missing = missing_locations(db, {line.local_id for line in batch.lines})
+    keys = sorted({(line.produto_id, line.local_id) for line in batch.lines if line.produto_id in items})
+    locais = {}
+    if keys:
+        locais = {
+            (row.produto_id, row.local_id): row.estoque
+            for row in db.execute(
+                select(ItemStock.produto_id, ItemStock.local_id, ItemStock.estoque)
+                .where(tuple_(ItemStock.produto_id, ItemStock.local_id).in_(keys))
+                .order_by(ItemStock.produto_id, ItemStock.local_id)
+                .with_for_update()
+            )
+        }
+
+    movements, errors = [], []
+    deltas, local_deltas = {}, {}
+    changes = summary.SummaryDelta()
+    for number, line in enumerate(batch.lines, start=1):
+        if line.produto_id not in estoques:
+            errors.append({'line': number, 'produto_id': line.produto_id, 'error': 'Item não encontrado'})
+            continue
+        if line.local_id in missing:
+            errors.append({'line': number, 'produto_id': line.produto_id, 'error': 'Local não encontrado'})
+            continue
+        delta = line.delta
+        key = (line.produto_id, line.local_id)
+        estoque_final = locais.get(key, 0.0) + delta
+        if estoque_final < 0:
+            errors.append(
+                {
+                    'line': number,
+                    'produto_id': line.produto_id,
+                    'error': 'Estoque insuficiente no local para a movimentação',
+                }
+            )
+            continue
+        item = items[line.produto_id]
+        cost = custos[line.produto_id]
+        if line.custo_unitario is not None:
+            custos[line.produto_id] = weighted_average_cost(
+                estoques[line.produto_id], cost or 0, delta, line.custo_unitario
+            )
+            cost = line.custo_unitario
+        estoques[line.produto_id] += delta
+        locais[key] = estoque_final
+        deltas[line.produto_id] = deltas.get(line.produto_id, 0.0) + delta
+        local_deltas[key] = local_deltas.get(key, 0.0) + delta
+        movimentacao = MovementType.ENTRADA if delta > 0 else MovementType.SAIDA
+        movements.append(
+            {
+                'movimentacao': movimentacao,
+                'produto_id': line.produto_id,
+                'local_id': line.local_id,
+                'quantidade': abs(delta),
+                'estoque_final': estoque_final,
+                'custo_unitario': line.custo_unitario,
+            }
+        )
+        changes.add_item(item.id, item.unidade_medida, delta, cost, item.valor_venda, itens=0)
+        changes.add_movement(item.id, movimentacao, abs(delta))
+
+    if not movements or (errors and batch.mode == 'all_or_nothing'):
+        db.rollback()
+        return {'applied': 0, 'failed': len(errors), 'errors': errors}
+
+    items_table = Item.__table__
+    db.execute(
+        update(items_table)
+        .where(items_table.c.id == bindparam('item_id'))
+        .values(
+            estoque=items_table.c.estoque + bindparam('delta'),
+            custo_medio=bindparam('custo_medio'),
+            versao=items_table.c.versao + 1,
+        ),
+        [{'item_id': item_id, 'delta': delta, 'custo_medio': custos[item_id]} for item_id, delta in deltas.items()],
+    )
+    # Reduções alteram linhas já bloqueadas; só os aumentos podem criar o estoque do item em um local
+    local_changes = sorted(local_deltas.items())
+    increases = [
+        {'produto_id': produto_id, 'local_id': local_id, 'estoque': delta}
+        for (produto_id, local_id), delta in local_changes
+        if delta > 0
+    ]
+    if increases:
+        summary.upsert_increments(db, ItemStock, ('produto_id', 'local_id'), increases)
+    decreases = [
+        {'item_id': produto_id, 'location_id': local_id, 'delta': delta}
+        for (produto_id, local_id), delta in local_changes
+        if delta < 0
+    ]
+    if decreases:
+        stocks_table = ItemStock.__table__
+        db.execute(
+            update(stocks_table)
+            .where(
+                stocks_table.c.produto_id == bindparam('item_id'), stocks_table.c.local_id == bindparam('location_id')
+            )
+            .values(estoque=stocks_table.c.estoque + bindparam('delta')),
+            decreases,
+        )
+    db.execute(insert(StockMovementHistory).values(data=func.now()), movements)
+    changes.apply(db)
+    db.commit()
+    return {'applied': len(movements), 'failed': len(errors), 'errors': errors}
 
-    return item
+
+def transfer_stock(db: Session, transfer: TransferCreate):
+    """Transfer stock of an item between two locations atomically.
+
+    The SAIDA at the origin and the ENTRADA at the destination are written in a single
+    transaction. A transfer does not change the total stock or the value of the item,
+    so it only updates the two location rows, in location ID order, and never the item
+    row; transfers and movements in other locations do not wait for each other. For the
+    same reason its movements are marked as transfer legs and stay out of the daily
+    received and issued totals.
+
+    Args:
+        db (Session): The database session.
+        transfer (TransferCreate): The item, locations and quantity.
+
+    Returns:
+        tuple: The SAIDA and the ENTRADA movement records, or None if the item is not found.
+
+    Raises:
+        StockError: If the origin does not hold enough stock.
+        LocationNotFound: If a location does not exist.
+    """
+    # FOR KEY SHARE impede a exclusão do item sem bloquear as atualizações de estoque e custo
+    found = db.scalar(
+        select(Item.id)
+        .where(Item.id == transfer.produto_id, Item.arquivado_em.is_(None))
+        .with_for_update(read=True, key_share=True)
+    )
+    if found is None:
+        db.rollback()
+        return None
+    if missing_locations(db, [transfer.origem_id, transfer.destino_id]):
+        db.rollback()
+        raise LocationNotFound('Local não encontrado')
+
+    estoques = {}
+    changes = sorted(((transfer.origem_id, -transfer.quantidade), (transfer.destino_id, transfer.quantidade)))
+    for local_id, delta in changes:
+        estoques[local_id] = change_location_stock(db, transfer.produto_id, local_id, delta)
+        if estoques[local_id] is None:
+            db.rollback()
+            raise StockError('Estoque insuficiente no local de origem')
+
+    movements = [
+        StockMovementHistory(
+            data=func.now(),
+            movimentacao=movimentacao,
+            produto_id=transfer.produto_id,
+            local_id=local_id,
+            quantidade=transfer.quantidade,
+            estoque_final=estoques[local_id],
+            transferencia=True,
+        )
+        for movimentacao, local_id in (
+            (MovementType.SAIDA, transfer.origem_id),
+            (MovementType.ENTRADA, transfer.destino_id),
+        )
+    ]
+    db.add_all(movements)
+    db.commit()
+    return tuple(movements)
 
 
 def delete_item(db: Session, item_id: int):
     """Delete an item by ID and its associated movement history.
 
+    The movement history is removed with a single set-based DELETE in the same
+    transaction as the item.
+
     Args:
         db (Session): The database session.
         item_id (int): The item ID.
@@ -129,38 +740,238 @@ def delete_item(db: Session, item_id: int):
     Returns:
         Item: The deleted item, or None if not found.
     """
-    moviments = db.scalars(select(StockMovementHistory).filter_by(produto_id=item_id)).all()
-    if moviments:
-        for moviment in moviments:
-            db.delete(moviment)
-            db.commit()
-
     item = db.get(Item, item_id)
-    if not item:
+    if not item or item.arquivado_em is not None:
         return None
 
+    delta = summary.SummaryDelta()
+    delta.remove_item(item.id, item.unidade_medida, item.estoque, item.custo_medio, item.valor_venda)
+    delta.remove_movements(db, StockMovementHistory.produto_id == item_id)
+
+    db.execute(
+        delete(StockMovementHistory)
+        .where(StockMovementHistory.produto_id == item_id)
+        .execution_options(synchronize_session=False)
+    )
+    db.execute(delete(StockSnapshotItem).where(StockSnapshotItem.produto_id == item_id))
+    db.execute(delete(ItemStock).where(ItemStock.produto_id == item_id))
     db.delete(item)
+    db.flush()
+    delta.apply(db)
+    search.invalidate(db)
     db.commit()
     return item
 
 
-def get_product_movement_history(db: Session, product_id: int):
-    """Get the movement history for a product.
+def archive_item(db: Session, item_id: int):
+    """Archive an item so it can be deleted later by :func:`purge_item`.
+
+    Archived items are hidden from all queries and cannot receive movements.
 
     Args:
         db (Session): The database session.
-        product_id (int): The product ID.
+        item_id (int): The item ID.
 
     Returns:
-        list: A list of movement history records for the product.
+        Item: The archived item, or None if not found.
     """
-    movements = db.scalars(select(StockMovementHistory).filter_by(produto_id=product_id)).all()
-    if not movements:
+    item = db.get(Item, item_id, with_for_update=True)
+    if not item or item.arquivado_em is not None:
+        db.rollback()
         return None
-    return movements
 
+    item.arquivado_em = func.now()
+    db.flush()
+    # Itens arquivados deixam de contar na valorização do estoque
+    delta = summary.SummaryDelta()
+    delta.remove_item(item.id, item.unidade_medida, item.estoque, item.custo_medio, item.valor_venda)
+    delta.apply(db)
+    search.invalidate(db)
+    db.commit()
+    return item
+
+
+def purge_item(db: Session, item_id: int, batch_size: int = PURGE_BATCH_SIZE):
+    """Delete an archived item and its movement history in bounded batches.
+
+    Each batch is committed separately, so the purge never holds long locks and can
+    be resumed by running it again. Each batch locks the item row first, so a concurrent
+    purge of the same item waits and then reads only the movements still left.
+
+    Args:
+        db (Session): The database session.
+        item_id (int): The archived item ID.
+        batch_size (int): The maximum number of movements deleted per transaction.
+
+    Returns:
+        int: The number of deleted movements.
+    """
+    deleted = 0
+    while True:
+        archived = db.scalar(
+            select(Item.id).where(Item.id == item_id, Item.arquivado_em.is_not(None)).with_for_update()
+        )
+        if archived is None:
+            # Outra limpeza já removeu o item
+            db.rollback()
+            return deleted
+        ids = db.scalars(
+            select(StockMovementHistory.id).where(StockMovementHistory.produto_id == item_id).limit(batch_size)
+        ).all()
+        if ids:
+            delta = summary.SummaryDelta()
+            delta.remove_movements(db, StockMovementHistory.id.in_(ids))
+            db.execute(
+                delete(StockMovementHistory)
+                .where(StockMovementHistory.id.in_(ids))
+                .execution_options(synchronize_session=False)
+            )
+            delta.apply(db)
+        db.commit()
+        deleted += len(ids)
+        if len(ids) < batch_size:
+            break
+
+    db.execute(delete(StockSnapshotItem).where(StockSnapshotItem.produto_id == item_id))
+    db.execute(delete(ItemStock).where(ItemStock.produto_id == item_id))
+    db.execute(
+        delete(Item)
+        .where(Item.id == item_id, Item.arquivado_em.is_not(None))
+        .execution_options(synchronize_session=False)
+    )
+    db.commit()
+    return deleted
+
+
+def purge_archived_items(db: Session, batch_size: int = PURGE_BATCH_SIZE):
+    """Purge every archived item, e.g. after a restart interrupted a purge.
+
+    Args:
+        db (Session): The database session.
+        batch_size (int): The maximum number of movements deleted per transaction.
+
+    Returns:
+        int: The number of purged items.
+    """
+    item_ids = db.scalars(select(Item.id).where(Item.arquivado_em.is_not(None))).all()
+    for item_id in item_ids:
+        purge_item(db, item_id, batch_size)
+    return len(item_ids)
+
+
+def filter_movements(statement, query: MovementFilter):
+    """Apply the date, type and location filters to a movement query.
 
-def create_movement_history(db: Session, item: Item, tipo_movimentacao: MovementType, quantidade: int):
+    Args:
+        statement (Select): The select statement over movements.
+        query (MovementFilter): The filter parameters.
+
+    Returns:
+        Select: The filtered statement.
+    """
+    if query.from_ is not None:
+        statement = statement.where(StockMovementHistory.data >= query.from_)
+    if query.to is not None:
+        statement = statement.where(StockMovementHistory.data < query.to)
+    if query.movimentacao is not None:
+        statement = statement.where(StockMovementHistory.movimentacao == query.movimentacao)
+    if query.local_id is not None:
+        statement = statement.where(StockMovementHistory.local_id == query.local_id)
+    return statement
+
+
+def export_items_statement(query: ItemExportQuery):
+    """Build the statement that streams items for export, ordered by ID.
+
+    Args:
+        query (ItemExportQuery): The filter parameters.
+
+    Returns:
+        Select: The statement over the item columns.
+    """
+    return filter_items(select(*ITEM_COLUMNS), query).order_by(Item.id)
+
+
+def export_movements_statement(query: MovementExportQuery):
+    """Build the statement that streams movements for export.
+
+    Movements of a single product are ordered by ``(data, id)`` through the composite
+    index; the whole table is ordered by ID.
+
+    Args:
+        query (MovementExportQuery): The filter parameters.
+
+    Returns:
+        Select: The statement over the movement columns.
+    """
+    statement = filter_movements(select(*MOVEMENT_COLUMNS), query)
+    if query.produto_id is not None:
+        statement = statement.where(StockMovementHistory.produto_id == query.produto_id)
+        return statement.order_by(StockMovementHistory.data, StockMovementHistory.id)
+    return statement.order_by(StockMovementHistory.id)
+
+
+def get_product_movement_history(db: Session, product_id: int, query: MovementQuery):
+    """Get a page of the movement history for a product using keyset pagination.
+
+    Movements are ordered by ``(data, id)`` and read through the
+    ``(produto_id, data, id)`` index, so the cost of a page depends on its size and
+    not on the length of the history. Only the needed columns are selected, without
+    hydrating ORM objects.
+
+    Args:
+        db (Session): The database session.
+        product_id (int): The product ID.
+        query (MovementQuery): The pagination and filter parameters.
+
+    Returns:
+        tuple: The movements in the page as dictionaries and the cursor for the next page (None on the last page).
+
+    Raises:
+        ValueError: If the cursor is invalid.
+    """
+    statement = filter_movements(
+        select(*MOVEMENT_COLUMNS).where(StockMovementHistory.produto_id == product_id),
+        query,
+    )
+
+    key = tuple_(StockMovementHistory.data, StockMovementHistory.id)
+    descending = query.order == 'desc'
+    if query.after:
+        position = decode_cursor(query.after, 'data', query.order)
+        try:
+            data, movement_id = datetime.fromisoformat(position['data']), int(position['id'])
+        except (KeyError, TypeError, ValueError):
+            raise ValueError('Cursor inválido')
+        bound = tuple_(data, movement_id)
+        # A condição redundante sobre data permite ao PostgreSQL descartar partições fora do intervalo
+        if descending:
+            statement = statement.where(key < bound, StockMovementHistory.data <= data)
+        else:
+            statement = statement.where(key > bound, StockMovementHistory.data >= data)
+
+    if descending:
+        order_by = (StockMovementHistory.data.desc(), StockMovementHistory.id.desc())
+    else:
+        order_by = (StockMovementHistory.data, StockMovementHistory.id)
+    movements = [movement_row_to_dict(row) for row in db.execute(statement.order_by(*order_by).limit(query.limit + 1))]
+
+    next_cursor = None
+    if len(movements) > query.limit:
+        movements = movements[: query.limit]
+        last = movements[-1]
+        next_cursor = encode_cursor('data', query.order, {'data': last['data'].isoformat(), 'id': last['id']})
+    return movements, next_cursor
+
+
+def create_movement_history(
+    db: Session,
+    item: Item,
+    tipo_movimentacao: MovementType,
+    quantidade: int,
+    local_id: int = DEFAULT_LOCATION_ID,
+    estoque_final: float = None,
+):
     """Create a new stock movement history record.
 
     Args:
@@ -168,15 +979,470 @@ def create_movement_history(db: Session, item: Item, tipo_movimentacao: Movement
         item (Item): The item.
         tipo_movimentacao (MovementType): The type of movement.
         quantidade (int): The quantity moved.
+        local_id (int): The location where the stock moved.
+        estoque_final (float): The stock at the location after the movement; defaults to the item stock.
 
     Returns:
         StockMovementHistory: The created stock movement history record.
     """
     new_movement = StockMovementHistory(
-        data=get_current_date_formatted(db),
+        # Data gerada pelo banco dentro do próprio INSERT
+        data=func.now(),
         movimentacao=tipo_movimentacao,
-        produto_id=item.id,
+        produto=item,
+        local_id=local_id,
         quantidade=quantidade,
-        estoque_final=item.estoque,
+        estoque_final=item.estoque if estoque_final is None else estoque_final,
     )
     return new_movement
+
+
+def valuation_totals(itens: int, valor_estoque: float, receita_potencial: float):
+    """Build the valuation totals and derive the potential margin.
+
+    Args:
+        itens (int): The number of items.
+        valor_estoque (float): The total of ``estoque * custo_medio``.
+        receita_potencial (float): The total of ``estoque * valor_venda``.
+
+    Returns:
+        dict: The totals, margin and margin percentage.
+    """
+    margem = receita_potencial - valor_estoque
+    return {
+        'itens': itens,
+        'valor_estoque': valor_estoque,
+        'receita_potencial': receita_potencial,
+        'margem': margem,
+        'margem_percentual': margem / receita_potencial if receita_potencial else None,
+    }
+
+
+def get_valuation_report(db: Session):
+    """Get the stock valuation of the active items, in total and by unit of measure.
+
+    The report reads the incrementally maintained ``valuation_summary`` table, so its
+    cost does not depend on the number of items.
+
+    Args:
+        db (Session): The database session.
+
+    Returns:
+        dict: The totals and the totals by unit of measure.
+    """
+    rows = db.execute(
+        select(
+            ValuationSummary.unidade_medida,
+            func.sum(ValuationSummary.itens),
+            func.sum(ValuationSummary.estoque),
+            func.sum(ValuationSummary.valor_estoque),
+            func.sum(ValuationSummary.receita_potencial),
+        )
+        .group_by(ValuationSummary.unidade_medida)
+        .having(func.sum(ValuationSummary.itens) > 0)
+        .order_by(ValuationSummary.unidade_medida)
+    ).all()
+    groups = [
+        {'unidade_medida': unidade_medida.value, 'estoque': estoque, **valuation_totals(itens, valor, receita)}
+        for unidade_medida, itens, estoque, valor, receita in rows
+    ]
+    total = valuation_totals(
+        sum(group['itens'] for group in groups),
+        sum(group['valor_estoque'] for group in groups),
+        sum(group['receita_potencial'] for group in groups),
+    )
+    return {'total': total, 'por_unidade_medida': groups}
+
+
+def get_location_report(db: Session):
+    """Get the stock valuation of the active items at each location.
+
+    The totals are summed from the ``(local_id, produto_id, estoque)`` index of the
+    location stocks; only stock greater than zero counts.
+
+    Args:
+        db (Session): The database session.
+
+    Returns:
+        list[dict]: The totals of each location, ordered by location ID.
+    """
+    totals = (
+        select(
+            ItemStock.local_id,
+            func.count().label('itens'),
+            func.sum(ItemStock.estoque).label('estoque'),
+            func.sum(ItemStock.estoque * func.coalesce(Item.custo_medio, 0)).label('valor_estoque'),
+            func.sum(ItemStock.estoque * func.coalesce(Item.valor_venda, 0)).label('receita_potencial'),
+        )
+        .join(Item, Item.id == ItemStock.produto_id)
+        .where(ItemStock.estoque > 0, Item.arquivado_em.is_(None))
+        .group_by(ItemStock.local_id)
+        .subquery()
+    )
+    rows = db.execute(
+        select(Location.id, Location.nome, totals)
+        .outerjoin(totals, totals.c.local_id == Location.id)
+        .order_by(Location.id)
+    )
+    return [
+        {
+            'local_id': row.id,
+            'nome': row.nome,
+            'estoque': row.estoque or 0.0,
+            **valuation_totals(row.itens or 0, row.valor_estoque or 0.0, row.receita_potencial or 0.0),
+        }
+        for row in rows
+    ]
+
+
+def get_daily_movements(db: Session, query: DailyMovementQuery):
+    """Get the quantities received and issued per day.
+
+    The report reads the incrementally maintained ``daily_movement_summary`` table.
+
+    Args:
+        db (Session): The database session.
+        query (DailyMovementQuery): The range of days.
+
+    Returns:
+        list[dict]: The volumes of each day with movements, in chronological order.
+    """
+    statement = select(
+        DailyMovementSummary.dia,
+        DailyMovementSummary.movimentacao,
+        func.sum(DailyMovementSummary.quantidade),
+        func.sum(DailyMovementSummary.movimentos),
+    )
+    if query.from_ is not None:
+        statement = statement.where(DailyMovementSummary.dia >= query.from_)
+    if query.to is not None:
+        statement = statement.where(DailyMovementSummary.dia <= query.to)
+    rows = db.execute(
+        statement.group_by(DailyMovementSummary.dia, DailyMovementSummary.movimentacao)
+        .having(func.sum(DailyMovementSummary.movimentos) > 0)
+        .order_by(DailyMovementSummary.dia)
+    )
+
+    days = {}
+    for dia, movimentacao, quantidade, movimentos in rows:
+        day = days.setdefault(dia, {'dia': dia, 'entrada': 0.0, 'saida': 0.0, 'movimentos': 0})
+        day[movimentacao.value] += quantidade
+        day['movimentos'] += movimentos
+    return list(days.values())
+
+
+def rebuild_summaries(db: Session):
+    """Recompute the report summary tables from the items and the movement history.
+
+    Args:
+        db (Session): The database session.
+
+    Returns:
+        dict: The rebuilt valuation report.
+    """
+    summary.rebuild(db)
+    return get_valuation_report(db)
+
+
+def stock_as_of_statement(db: Session, at: datetime):
+    """Build the statement that reconstructs the stock of the active items at a moment.
+
+    The stock starts from the latest snapshot taken at or before ``at`` and replays only
+    the movements after it, so the cost depends on the time since that snapshot and not
+    on the length of the history. Without a snapshot every movement up to ``at`` is replayed.
+
+    Args:
+        db (Session): The database session.
+        at (datetime): The moment the stock is reconstructed for.
+
+    Returns:
+        tuple: The moment of the snapshot used (None if none) and the select statement over
+            the item ID, product name, unit of measure and reconstructed stock.
+    """
+    base = db.execute(
+        select(StockSnapshot.id, StockSnapshot.data)
+        .where(StockSnapshot.data <= at)
+        .order_by(StockSnapshot.data.desc(), StockSnapshot.id.desc())
+        .limit(1)
+    ).first()
+
+    signed = case(
+        (StockMovementHistory.movimentacao == MovementType.ENTRADA, StockMovementHistory.quantidade),
+        else_=-StockMovementHistory.quantidade,
+    )
+    replay = select(StockMovementHistory.produto_id, func.sum(signed).label('delta')).where(
+        StockMovementHistory.data <= at
+    )
+    if base is not None:
+        replay = replay.where(StockMovementHistory.data > base.data)
+    replay = replay.group_by(StockMovementHistory.produto_id).subquery()
+
+    estoque = func.coalesce(replay.c.delta, 0)
+    statement = select(Item.id, Item.produto, Item.unidade_medida).outerjoin(replay, replay.c.produto_id == Item.id)
+    if base is not None:
+        lines = (
+            select(StockSnapshotItem.produto_id, StockSnapshotItem.estoque)
+            .where(StockSnapshotItem.snapshot_id == base.id)
+            .subquery()
+        )
+        statement = statement.outerjoin(lines, lines.c.produto_id == Item.id)
+        estoque = func.coalesce(lines.c.estoque, 0) + estoque
+    statement = statement.add_columns(estoque.label('estoque')).where(Item.arquivado_em.is_(None))
+    return (base.data if base is not None else None), statement
+
+
+def get_stock_as_of(db: Session, query: StockAsOfQuery):
+    """Get a page of the stock of the active items at a moment, ordered by ID.
+
+    Args:
+        db (Session): The database session.
+        query (StockAsOfQuery): The moment, filters and pagination parameters.
+
+    Returns:
+        tuple: The moment of the snapshot used, the items in the page as dictionaries and
+            the cursor for the next page (None on the last page).
+
+    Raises:
+        ValueError: If the cursor is invalid.
+    """
+    snapshot, statement = stock_as_of_statement(db, query.at)
+    if query.produto:
+        statement = statement.where(Item.produto.startswith(query.produto, autoescape=True))
+    if query.unidade_medida is not None:
+        statement = statement.where(Item.unidade_medida == query.unidade_medida)
+    if query.after:
+        position = decode_cursor(query.after, 'id', 'asc')
+        try:
+            statement = statement.where(Item.id > int(position['id']))
+        except (KeyError, TypeError, ValueError):
+            raise ValueError('Cursor inválido')
+
+    items = [
+        {'id': row.id, 'produto': row.produto, 'unidade_medida': row.unidade_medida.value, 'estoque': row.estoque}
+        for row in db.execute(statement.order_by(Item.id).limit(query.limit + 1))
+    ]
+    next_cursor = None
+    if len(items) > query.limit:
+        items = items[: query.limit]
+        next_cursor = encode_cursor('id', 'asc', {'id': items[-1]['id']})
+    return snapshot, items, next_cursor
+
+
+def create_snapshot(db: Session, at: datetime, min_interval: int = 0):
+    """Checkpoint the stock of every active item at a moment.
+
+    The snapshot is itself computed from the previous snapshot and the movements after
+    it, so it is consistent with the history even while movements are being written.
+    ``at`` should be far enough in the past for every transaction started before it to
+    have committed.
+
+    Args:
+        db (Session): The database session.
+        at (datetime): The moment the stock is captured for.
+        min_interval (int): If positive, no snapshot is taken when another one was taken
+            less than this many seconds before ``at``.
+
+    Returns:
+        StockSnapshot: The created snapshot, or None if a recent one already exists.
+    """
+    if min_interval > 0:
+        recent = db.scalar(select(exists().where(StockSnapshot.data > at - timedelta(seconds=min_interval))))
+        if recent:
+            db.rollback()
+            return None
+
+    _, statement = stock_as_of_statement(db, at)
+    snapshot = StockSnapshot(data=at, itens=0)
+    db.add(snapshot)
+    db.flush()
+
+    lines = statement.subquery()
+    result = db.execute(
+        insert(StockSnapshotItem).from_select(
+            ['snapshot_id', 'produto_id', 'estoque'],
+            select(literal(snapshot.id), lines.c.id, lines.c.estoque),
+        )
+    )
+    snapshot.itens = result.rowcount
+    db.commit()
+    return snapshot
+
+
+def get_snapshots(db: Session, limit: int = DEFAULT_PAGE_SIZE):
+    """Get the most recent stock snapshots.
+
+    Args:
+        db (Session): The database session.
+        limit (int): The maximum number of snapshots.
+
+    Returns:
+        list[StockSnapshot]: The snapshots, most recent first.
+    """
+    return db.scalars(select(StockSnapshot).order_by(StockSnapshot.data.desc()).limit(limit)).all()
+
+
+def search_items(db: Session, query: SearchQuery, matches: list = None):
+    """Search active items by product name, best match first.
+
+    On PostgreSQL the search runs on the GiST trigram index of ``produto``; on other
+    databases the ranking comes from the in-memory index of :mod:`controller.search`,
+    and only the items of the page are read. Both rank by trigram distance and match
+    names that contain the term or are similar to it.
+
+    Args:
+        db (Session): The database session.
+        query (SearchQuery): The term and pagination parameters.
+        matches (list): The ``(distance, item ID)`` ranking of the in-memory index, or
+            None to search with pg_trgm.
+
+    Returns:
+        tuple: The items in the page as dictionaries and the cursor for the next page (None on the last page).
+
+    Raises:
+        ValueError: If the cursor is invalid.
+    """
+    bound = None
+    if query.after:
+        # O cursor fica vinculado ao termo buscado, pois a distância depende dele
+        position = decode_cursor(query.after, 'distance', query.q)
+        try:
+            bound = (float(position['distance']), int(position['id']))
+        except (KeyError, TypeError, ValueError):
+            raise ValueError('Cursor inválido')
+
+    if matches is None:
+        statement, distance = search.trigram_search_statement(query.q)
+        if bound is not None:
+            statement = statement.where(tuple_(distance, Item.id) > bound)
+        rows = [dict(row._mapping) for row in db.execute(statement.limit(query.limit + 1))]
+    else:
+        if bound is not None:
+            matches = [match for match in matches if match > bound]
+        ranking = {item_id: distance for distance, item_id in matches[: query.limit + 1]}
+        found = db.execute(
+            select(Item.id, Item.produto, Item.unidade_medida, Item.estoque).where(
+                Item.id.in_(ranking), Item.arquivado_em.is_(None)
+            )
+        ).all()
+        rows = sorted(
+            ({**row._mapping, 'distance': ranking[row.id]} for row in found),
+            key=lambda row: (row['distance'], row['id']),
+        )
+
+    next_cursor = None
+    if len(rows) > query.limit:
+        rows = rows[: query.limit]
+        next_cursor = encode_cursor('distance', query.q, {'distance': rows[-1]['distance'], 'id': rows[-1]['id']})
+    items = [
+        {
+            'id': row['id'],
+            'produto': row['produto'],
+            'unidade_medida': row['unidade_medida'].value,
+            'estoque': row['estoque'],
+            'score': 1.0 - row['distance'],
+        }
+        for row in rows
+    ]
+    return items, next_cursor
+
+
+def get_locations(db: Session):
+    """Get every stock location.
+
+    Args:
+        db (Session): The database session.
+
+    Returns:
+        list[Location]: The locations, ordered by ID.
+    """
+    return db.scalars(select(Location).order_by(Location.id)).all()
+
+
+def create_location(db: Session, location: LocationCreate):
+    """Create a new stock location.
+
+    Args:
+        db (Session): The database session.
+        location (LocationCreate): The location data.
+
+    Returns:
+        Location: The created location.
+
+    Raises:
+        ValueError: If a location with the same name already exists.
+    """
+    new_location = Location(nome=location.nome)
+    db.add(new_location)
+    try:
+        db.commit()
+    except IntegrityError:
+        db.rollback()
+        raise ValueError('Já existe um local com este nome')
+    return new_location
+
+
+def get_item_stock(db: Session, item_id: int):
+    """Get the stock of an active item at each location.
+
+    The rows are read through the ``(produto_id, local_id)`` primary key.
+
+    Args:
+        db (Session): The database session.
+        item_id (int): The item ID.
+
+    Returns:
+        dict: The total stock and the stock at each location, or None if the item is not found.
+    """
+    item = db.execute(select(Item.id, Item.estoque).where(Item.id == item_id, Item.arquivado_em.is_(None))).first()
+    if item is None:
+        return None
+    rows = db.execute(
+        select(ItemStock.local_id, Location.nome, ItemStock.estoque)
+        .join(Location, Location.id == ItemStock.local_id)
+        .where(ItemStock.produto_id == item_id)
+        .order_by(ItemStock.local_id)
+    )
+    return {'produto_id': item.id, 'estoque': item.estoque, 'locais': [dict(row._mapping) for row in rows]}
+
+
+def get_location_stock(db: Session, local_id: int, query: LocationStockQuery):
+    """Get a page of the active items with stock at a location, ordered by item ID.
+
+    The page is read through the ``(local_id, produto_id, estoque)`` index with keyset
+    pagination, so its cost does not depend on the number of items at the location.
+
+    Args:
+        db (Session): The database session.
+        local_id (int): The location ID.
+        query (LocationStockQuery): The pagination parameters.
+
+    Returns:
+        tuple: The items in the page as dictionaries and the cursor for the next page (None on the last page),
+            or None if the location is not found.
+
+    Raises:
+        ValueError: If the cursor is invalid.
+    """
+    if db.get(Location, local_id) is None:
+        return None
+    statement = (
+        select(ItemStock.produto_id, Item.produto, Item.unidade_medida, ItemStock.estoque)
+        .join(Item, Item.id == ItemStock.produto_id)
+        .where(ItemStock.local_id == local_id, ItemStock.estoque > 0, Item.arquivado_em.is_(None))
+    )
+    if query.after:
+        position = decode_cursor(query.after, 'produto_id', 'asc')
+        try:
+            statement = statement.where(ItemStock.produto_id > int(position['produto_id']))
+        except (KeyError, TypeError, ValueError):
+            raise ValueError('Cursor inválido')
+
+    items = [
+        {**row._mapping, 'unidade_medida': row.unidade_medida.value}
+        for row in db.execute(statement.order_by(ItemStock.produto_id).limit(query.limit + 1))
+    ]
+    next_cursor = None
+    if len(items) > query.limit:
+        items = items[: query.limit]
+        next_cursor = encode_cursor('produto_id', 'asc', {'produto_id': items[-1]['produto_id']})
+    return items, next_cursor
@@ -0,0 +1,92 @@
+import hashlib
+
+
+def item_etag(item_id: int, versao: int):
+    """Build the strong ETag of an item.
+
+    Args:
+        item_id (int): The item ID.
+        versao (int): The item version.
+
+    Returns:
+        str: The quoted ETag.
+    """
+    return f'"item-{item_id}-v{versao}"'
+
+
+def page_etag(items: list, next_cursor: str = None):
+    """Build the strong ETag of a page of items from their IDs and versions.
+
+    The ETag is derived from the page itself, so a conditional request still reads the
+    page (usually from the item cache); a 304 saves the serialization and the transfer
+    of the body, not the query.
+
+    Args:
+        items (list): The items in the page, as dictionaries.
+        next_cursor (str): The cursor for the next page.
+
+    Returns:
+        str: The quoted ETag.
+    """
+    digest = hashlib.sha1()
+    for item in items:
+        digest.update(f'{item["id"]}:{item["versao"]};'.encode())
+    digest.update((next_cursor or '').encode())
+    return f'"items-{digest.hexdigest()}"'
+
+
+def parse_etags(header: str):
+    """Split an If-None-Match or If-Match header into its entity tags.
+
+    Args:
+        header (str): The header value.
+
+    Returns:
+        list: The entity tags, including the weak prefix of weak tags.
+    """
+    return [tag.strip() for tag in header.split(',') if tag.strip()]
+
+
+def none_match(header: str, etag: str):
+    """Check whether an If-None-Match header matches the current ETag.
+
+    If-None-Match uses the weak comparison, so ``W/"x"`` matches ``"x"``.
+
+    Args:
+        header (str): The If-None-Match header value, or None.
+        etag (str): The current ETag.
+
+    Returns:
+        bool: True if the client copy is current and a 304 can be sent.
+    """
+    if not header:
+        return False
+    tags = [tag.removeprefix('W/') for tag in parse_etags(header)]
+    return '*' in tags or etag in tags
+
+
+def expected_version(header: str, item_id: int):
+    """Get the item version required by an If-Match header.
+
+    If-Match uses the strong comparison, so weak tags never match.
+
+    Args:
+        header (str): The If-Match header value, or None.
+        item_id (int): The item ID.
+
+    Returns:
+        int: The required version, or None if the header is absent or ``*``.
+
+    Raises:
+        ValueError: If no strong tag in the header matches the item.
+    """
+    if not header:
+        return None
+    tags = parse_etags(header)
+    if '*' in tags:
+        return None
+    prefix = f'"item-{item_id}-v'
+    for tag in tags:
+        if tag.startswith(prefix) and tag.endswith('"') and tag[len(prefix) : -1].isdigit():
+            return int(tag[len(prefix) : -1])
+    raise ValueError('If-Match não corresponde ao item')
@@ -0,0 +1,153 @@
+import csv
+import io
+from datetime import date, datetime
+from enum import Enum
+
+import orjson
+from models.database import DATABASE_MODE, AsyncSessionLocal, SessionLocal, env_int
+
+# Número de linhas buscadas do cursor do servidor e escritas por bloco da resposta
+EXPORT_CHUNK_SIZE = env_int('EXPORT_CHUNK_SIZE', 1000)
+
+MEDIA_TYPES = {
+    'ndjson': 'application/x-ndjson',
+    'csv': 'text/csv; charset=utf-8',
+}
+
+
+def plain_value(value):
+    """Convert a column value to a value the CSV writer renders as expected.
+
+    Args:
+        value: The column value.
+
+    Returns:
+        The enum value, the ISO 8601 date or the value unchanged.
+    """
+    if isinstance(value, Enum):
+        return value.value
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    return value
+
+
+def encode_ndjson(rows, columns: list[str]):
+    """Encode rows as NDJSON lines.
+
+    Args:
+        rows (list[Row]): The rows to encode.
+        columns (list[str]): The column names, in row order.
+
+    Returns:
+        bytes: One JSON object per line.
+    """
+    return b''.join(orjson.dumps(dict(zip(columns, row))) + b'\n' for row in rows)
+
+
+def encode_csv(rows, columns: list[str] = None):
+    """Encode rows, or the header when ``rows`` is None, as CSV lines.
+
+    Args:
+        rows (list[Row]): The rows to encode, or None to encode the header.
+        columns (list[str]): The column names, in row order.
+
+    Returns:
+        bytes: The CSV lines encoded as UTF-8.
+    """
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, lineterminator='\n')
+    if rows is None:
+        writer.writerow(columns)
+    else:
+        writer.writerows([plain_value(value) for value in row] for row in rows)
+    return buffer.getvalue().encode()
+
+
+def encode_chunk(rows, columns: list[str], format: str):
+    """Encode a chunk of rows in the export format.
+
+    Args:
+        rows (list[Row]): The rows to encode.
+        columns (list[str]): The column names, in row order.
+        format (str): 'ndjson' or 'csv'.
+
+    Returns:
+        bytes: The encoded chunk.
+    """
+    if format == 'csv':
+        return encode_csv(rows)
+    return encode_ndjson(rows, columns)
+
+
+def stream_rows(session_factory, statement, format: str, chunk_size: int = EXPORT_CHUNK_SIZE):
+    """Stream the rows of a statement as encoded chunks.
+
+    The rows are fetched through a server-side cursor, ``chunk_size`` at a time, so
+    memory use does not depend on the number of exported rows. The generator owns its
+    session: it is opened when the response starts and closed when it ends.
+
+    Args:
+        session_factory (sessionmaker): The factory of the session used for the export.
+        statement (Select): The select statement over the exported columns.
+        format (str): 'ndjson' or 'csv'.
+        chunk_size (int): The number of rows fetched and written per chunk.
+
+    Yields:
+        bytes: The encoded chunks, preceded by the header for CSV.
+    """
+    columns = [column.name for column in statement.selected_columns]
+    if format == 'csv':
+        yield encode_csv(None, columns)
+    with session_factory() as db:
+        result = db.execute(statement.execution_options(yield_per=chunk_size))
+        for rows in result.partitions():
+            yield encode_chunk(rows, columns, format)
+
+
+async def stream_rows_async(session_factory, statement, format: str, chunk_size: int = EXPORT_CHUNK_SIZE):
+    """Stream the rows of a statement as encoded chunks using the async driver.
+
+    Args:
+        session_factory (async_sessionmaker): The factory of the session used for the export.
+        statement (Select): The select statement over the exported columns.
+        format (str): 'ndjson' or 'csv'.
+        chunk_size (int): The number of rows fetched and written per chunk.
+
+    Yields:
+        bytes: The encoded chunks, preceded by the header for CSV.
+    """
+    columns = [column.name for column in statement.selected_columns]
+    if format == 'csv':
+        yield encode_csv(None, columns)
+    async with session_factory() as db:
+        result = await db.stream(statement.execution_options(yield_per=chunk_size))
+        async for rows in result.partitions():
+            yield encode_chunk(rows, columns, format)
+
+
+def export_stream(statement, format: str):
+    """Stream the rows of a statement with a session of the configured database mode.
+
+    Args:
+        statement (Select): The select statement over the exported columns.
+        format (str): 'ndjson' or 'csv'.
+
+    Returns:
+        Iterator[bytes]: The encoded chunks; an async iterator in async mode.
+    """
+    if DATABASE_MODE == 'async':
+        return stream_rows_async(AsyncSessionLocal, statement, format)
+    return stream_rows(SessionLocal, statement, format)
+
+
+def export_headers(name: str, format: str):
+    """Get the headers of an export response.
+
+    Args:
+        name (str): The base name of the exported file.
+        format (str): 'ndjson' or 'csv'.
+
+    Returns:
+        dict: The Content-Disposition header.
+    """
+    return {'Content-Disposition': f'attachment; filename="{name}.{format}"'}
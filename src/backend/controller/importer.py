@@ -0,0 +1,132 @@
+import codecs
+import csv
+import json
+
+from pydantic import ValidationError
+from schemas.schema import ItemCreate
+from sqlalchemy.exc import SQLAlchemyError
+
+# Número máximo de erros detalhados no relatório; os demais são apenas contados
+MAX_REPORTED_ERRORS = 1000
+
+CSV_FIELDS = ('produto', 'unidade_medida', 'custo_medio', 'valor_venda', 'estoque')
+
+
+async def iter_lines(chunks):
+    """Split a stream of byte chunks into text lines.
+
+    Only the current chunk and an incomplete trailing line are kept in memory.
+
+    Args:
+        chunks (AsyncIterator[bytes]): The request body chunks.
+
+    Yields:
+        tuple: The 1-based line number and the line text, without the line break.
+    """
+    decoder = codecs.getincrementaldecoder('utf-8-sig')()
+    pending = ''
+    number = 0
+    async for chunk in chunks:
+        pending += decoder.decode(chunk)
+        *lines, pending = pending.split('\n')
+        for line in lines:
+            number += 1
+            yield number, line.rstrip('\r')
+    pending += decoder.decode(b'', final=True)
+    if pending:
+        yield number + 1, pending.rstrip('\r')
+
+
+async def iter_records(chunks, format: str):
+    """Parse CSV or NDJSON records from a stream of byte chunks.
+
+    CSV input must have a header line; fields spanning multiple lines are not supported,
+    and empty fields are read as None.
+
+    Args:
+        chunks (AsyncIterator[bytes]): The request body chunks.
+        format (str): The input format ('csv' or 'ndjson').
+
+    Yields:
+        tuple: The line number and either the parsed record (dict) or the parse error message (str).
+    """
+    header = None
+    async for number, line in iter_lines(chunks):
+        if not line.strip():
+            continue
+        if format == 'ndjson':
+            try:
+                record = json.loads(line)
+            except ValueError as e:
+                yield number, f'JSON inválido: {e}'
+                continue
+            yield number, record if isinstance(record, dict) else 'Cada linha deve ser um objeto JSON'
+            continue
+
+        values = next(csv.reader([line]))
+        if header is None:
+            header = [value.strip() for value in values]
+            missing = [field for field in CSV_FIELDS if field not in header]
+            if missing:
+                raise ValueError(f'Cabeçalho CSV sem as colunas: {", ".join(missing)}')
+            continue
+        if len(values) != len(header):
+            yield number, f'Esperadas {len(header)} colunas, encontradas {len(values)}'
+            continue
+        # Campos vazios equivalem a valores ausentes, não a textos vazios
+        yield number, {field: value if value.strip() else None for field, value in zip(header, values)}
+
+
+async def import_items(chunks, format: str, batch_size: int, insert_batch):
+    """Validate and insert items from a CSV or NDJSON stream in batches.
+
+    Args:
+        chunks (AsyncIterator[bytes]): The request body chunks.
+        format (str): The input format ('csv' or 'ndjson').
+        batch_size (int): The number of rows inserted per batch.
+        insert_batch (Callable): Coroutine function that inserts a list of ItemCreate and
+            returns the number of inserted rows. A batch that fails is retried line by line,
+            so only the lines that cannot be inserted are reported.
+
+    Returns:
+        dict: The import report with inserted and failed counts and the per-line errors.
+
+    Raises:
+        ValueError: If the CSV header is invalid.
+    """
+    report = {'inserted': 0, 'failed': 0, 'errors': []}
+
+    def add_error(line, error):
+        report['failed'] += 1
+        if len(report['errors']) < MAX_REPORTED_ERRORS:
+            report['errors'].append({'line': line, 'error': error})
+
+    async def flush(batch):
+        try:
+            report['inserted'] += await insert_batch([item for _, item in batch])
+        except SQLAlchemyError as e:
+            if len(batch) == 1:
+                add_error(batch[0][0], f'Erro ao inserir a linha: {e.__class__.__name__}')
+                return
+            # O lote foi desfeito por inteiro; as linhas são reenviadas uma a uma para que só as inválidas falhem
+            for line_batch in batch:
+                await flush([line_batch])
+
+    batch = []
+    async for line, record in iter_records(chunks, format):
+        if isinstance(record, str):
+            add_error(line, record)
+            continue
+        try:
+            item = ItemCreate.model_validate(record)
+        except ValidationError as e:
+            add_error(line, '; '.join(f'{".".join(map(str, err["loc"]))}: {err["msg"]}' for err in e.errors()))
+            continue
+        batch.append((line, item))
+        if len(batch) >= batch_size:
+            await flush(batch)
+            batch = []
+
+    if batch:
+        await flush(batch)
+    return report
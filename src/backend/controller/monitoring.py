@@ -0,0 +1,64 @@
+from controller.cache import cache_status
+from controller.partitions import list_partitions
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+from models.database import active_engine, engine, query_metrics
+from monitoring.metrics import (
+    PrometheusWriter,
+    request_metrics,
+    write_cache_metrics,
+    write_pool_metrics,
+    write_query_metrics,
+    write_request_metrics,
+)
+from monitoring.pool import pool_status
+
+router = APIRouter()
+# Rotas servidas fora do prefixo /api, no caminho esperado pelo Prometheus
+metrics_router = APIRouter()
+
+
+@router.get('/pool/stats')
+def read_pool_stats():
+    """Get the connection pool statistics.
+
+    Returns:
+        dict: The pool state and checkout timing histograms.
+    """
+    return pool_status(active_engine.pool)
+
+
+@router.get('/cache/stats')
+def read_cache_stats():
+    """Get the item cache statistics.
+
+    Returns:
+        dict: The cache backend, size and hit/miss counters.
+    """
+    return cache_status()
+
+
+@router.get('/partitions')
+def read_partitions():
+    """Get the monthly partitions of the movement history.
+
+    Returns:
+        list: The name, month and estimated number of rows of each partition; empty
+            when the database does not support partitioning.
+    """
+    return list_partitions(engine)
+
+
+@metrics_router.get('/metrics', response_class=PlainTextResponse)
+def read_metrics():
+    """Get the request, SQL, connection pool and cache metrics in the Prometheus text format.
+
+    Returns:
+        PlainTextResponse: The metrics document.
+    """
+    writer = PrometheusWriter()
+    write_request_metrics(writer, request_metrics)
+    write_query_metrics(writer, query_metrics)
+    write_pool_metrics(writer, pool_status(active_engine.pool))
+    write_cache_metrics(writer, cache_status())
+    return PlainTextResponse(writer.render(), media_type='text/plain; version=0.0.4')
@@ -0,0 +1,45 @@
+import base64
+import binascii
+import json
+
+
+def encode_cursor(sort: str, order: str, values: dict):
+    """Encode a keyset position as an opaque cursor.
+
+    Args:
+        sort (str): The column the page is sorted by.
+        order (str): The sort direction ('asc' or 'desc').
+        values (dict): The key values of the last row of the page.
+
+    Returns:
+        str: The URL-safe cursor.
+    """
+    payload = json.dumps({'s': sort, 'o': order, 'v': values}, separators=(',', ':'), default=str)
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor: str, sort: str, order: str):
+    """Decode an opaque cursor back into its keyset position.
+
+    Args:
+        cursor (str): The cursor received from the client.
+        sort (str): The column the current request is sorted by.
+        order (str): The sort direction of the current request.
+
+    Returns:
+        dict: The key values of the last row of the previous page.
+
+    Raises:
+        ValueError: If the cursor is malformed or was issued for another ordering.
+    """
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        raise ValueError('Cursor inválido')
+
+    if not isinstance(payload, dict) or not isinstance(payload.get('v'), dict):
+        raise ValueError('Cursor inválido')
+    if payload.get('s') != sort or payload.get('o') != order:
+        raise ValueError('Cursor não corresponde à ordenação solicitada')
+    return payload['v']
@@ -0,0 +1,306 @@
+import asyncio
+import gzip
+import logging
+import os
+import re
+from datetime import date, datetime, timezone
+
+from controller import crud, exporter
+from fastapi.concurrency import run_in_threadpool
+from models.database import env_int
+from models.models import StockMovementHistory, StockSnapshot
+from sqlalchemy import MetaData, exists, inspect, select, text
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import Session
+
+logger = logging.getLogger(__name__)
+
+# Particionamento mensal do histórico de movimentação (somente PostgreSQL)
+PARTITION_MONTHS_AHEAD = env_int('PARTITION_MONTHS_AHEAD', 3)
+# Meses completos mantidos no banco antes de arquivar uma partição; 0 mantém tudo
+PARTITION_RETENTION_MONTHS = env_int('PARTITION_RETENTION_MONTHS', 0)
+PARTITION_ARCHIVE_DIR = os.getenv('PARTITION_ARCHIVE_DIR', 'archive')
+PARTITION_MAINTENANCE_INTERVAL = env_int('PARTITION_MAINTENANCE_INTERVAL', 86400)
+
+TABLE_NAME = StockMovementHistory.__tablename__
+PARTITION_PATTERN = re.compile(rf'^{TABLE_NAME}_p(\d{{4}})_(\d{{2}})$')
+
+
+def supports_partitioning(engine):
+    """Check whether the database supports native range partitioning.
+
+    Args:
+        engine (Engine): The database engine or connection.
+
+    Returns:
+        bool: True on PostgreSQL.
+    """
+    return engine.dialect.name == 'postgresql'
+
+
+def add_months(month: date, months: int):
+    """Get the first day of the month ``months`` after the month of ``month``.
+
+    Args:
+        month (date): Any day of the reference month.
+        months (int): The number of months to add; negative to go back.
+
+    Returns:
+        date: The first day of the resulting month.
+    """
+    index = month.year * 12 + month.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def partition_name(month: date):
+    """Get the name of the partition of a month.
+
+    Args:
+        month (date): The first day of the month.
+
+    Returns:
+        str: The partition table name.
+    """
+    return f'{TABLE_NAME}_p{month:%Y_%m}'
+
+
+def is_partitioned(connection):
+    """Check whether the movement history table is partitioned.
+
+    Args:
+        connection (Connection): The database connection.
+
+    Returns:
+        bool: True if the table exists and is partitioned.
+    """
+    return bool(
+        connection.scalar(
+            text(
+                'SELECT 1 FROM pg_partitioned_table p JOIN pg_class c ON c.oid = p.partrelid '
+                'WHERE c.relname = :name AND pg_table_is_visible(c.oid)'
+            ),
+            {'name': TABLE_NAME},
+        )
+    )
+
+
+def create_partitions(connection, first: date, last: date):
+    """Create the monthly partitions from one month through another and the default partition.
+
+    The default partition only receives rows outside every monthly range, which should
+    not happen while partitions are created ahead of time.
+
+    Args:
+        connection (Connection): The database connection, inside a transaction.
+        first (date): Any day of the first month.
+        last (date): Any day of the last month.
+
+    Returns:
+        list[str]: The names of the monthly partitions.
+    """
+    names = []
+    start = add_months(first, 0)
+    while start <= last:
+        end = add_months(start, 1)
+        name = partition_name(start)
+        connection.execute(
+            text(
+                f'CREATE TABLE IF NOT EXISTS {name} PARTITION OF {TABLE_NAME} '
+                f"FOR VALUES FROM ('{start} 00:00:00+00') TO ('{end} 00:00:00+00')"
+            )
+        )
+        names.append(name)
+        start = end
+    connection.execute(text(f'CREATE TABLE IF NOT EXISTS {TABLE_NAME}_default PARTITION OF {TABLE_NAME} DEFAULT'))
+    return names
+
+
+def convert_to_partitioned(connection, table, today: date = None):
+    """Convert an existing, unpartitioned movement history into a partitioned table.
+
+    The rows are copied into monthly partitions covering every movement, keeping their
+    IDs, and the sequence continues after the highest ID. Blocks writes to the history
+    until the transaction commits.
+
+    Args:
+        connection (Connection): The database connection, inside a transaction.
+        table (Table): The partitioned definition of the history, with the columns of both tables.
+        today (date): The reference day; defaults to the current UTC date.
+
+    Returns:
+        bool: True if the table was converted.
+    """
+    if not supports_partitioning(connection) or is_partitioned(connection):
+        return False
+    today = today or datetime.now(timezone.utc).date()
+    legacy = f'{TABLE_NAME}_legacy'
+    connection.execute(text(f'LOCK TABLE {TABLE_NAME} IN ACCESS EXCLUSIVE MODE'))
+    # Libera os nomes da tabela, da sequência, da chave primária e dos índices para a nova tabela
+    connection.execute(text(f'ALTER TABLE {TABLE_NAME} RENAME TO {legacy}'))
+    connection.execute(text(f'ALTER SEQUENCE IF EXISTS {TABLE_NAME}_id_seq RENAME TO {legacy}_id_seq'))
+    connection.execute(text(f'ALTER TABLE {legacy} RENAME CONSTRAINT {TABLE_NAME}_pkey TO {legacy}_pkey'))
+    for index in inspect(connection).get_indexes(legacy):
+        connection.execute(text(f'DROP INDEX {index["name"]}'))
+
+    table.create(connection)
+    first = connection.scalar(text(f'SELECT min(data) FROM {legacy}'))
+    first = min(first.astimezone(timezone.utc).date(), today) if first else today
+    create_partitions(connection, first, add_months(today, PARTITION_MONTHS_AHEAD))
+    columns = ', '.join(column.name for column in table.columns)
+    connection.execute(text(f'INSERT INTO {TABLE_NAME} ({columns}) SELECT {columns} FROM {legacy}'))
+    connection.execute(
+        text(
+            f"SELECT setval(pg_get_serial_sequence('{TABLE_NAME}', 'id'), "
+            f'(SELECT coalesce(max(id), 0) + 1 FROM {TABLE_NAME}), false)'
+        )
+    )
+    connection.execute(text(f'DROP TABLE {legacy}'))
+    return True
+
+
+def ensure_partitions(engine, today: date = None):
+    """Create the partitions of the current and upcoming months and the default partition.
+
+    Args:
+        engine (Engine): The database engine.
+        today (date): The reference day; defaults to the current UTC date.
+
+    Returns:
+        list[str]: The names of the monthly partitions that exist for the window.
+    """
+    if not supports_partitioning(engine):
+        return []
+    today = today or datetime.now(timezone.utc).date()
+    with engine.begin() as connection:
+        if not is_partitioned(connection):
+            return []
+        return create_partitions(connection, today, add_months(today, PARTITION_MONTHS_AHEAD))
+
+
+def list_partitions(engine):
+    """List the monthly partitions of the movement history.
+
+    Args:
+        engine (Engine): The database engine.
+
+    Returns:
+        list[dict]: The name, month and estimated number of rows of each partition, oldest first.
+    """
+    if not supports_partitioning(engine):
+        return []
+    with engine.connect() as connection:
+        rows = connection.execute(
+            text(
+                'SELECT c.relname, c.reltuples::bigint FROM pg_inherits i '
+                'JOIN pg_class c ON c.oid = i.inhrelid JOIN pg_class p ON p.oid = i.inhparent '
+                'WHERE p.relname = :name ORDER BY c.relname'
+            ),
+            {'name': TABLE_NAME},
+        ).all()
+    partitions = []
+    for name, estimated_rows in rows:
+        match = PARTITION_PATTERN.match(name)
+        month = date(int(match[1]), int(match[2]), 1) if match else None
+        partitions.append({'name': name, 'month': month, 'rows': max(estimated_rows, 0)})
+    return partitions
+
+
+def ensure_snapshot_at(engine, moment: datetime):
+    """Make sure a stock snapshot exists exactly at a moment.
+
+    Point-in-time queries after an archived partition start from this snapshot, so they
+    never need the archived movements.
+
+    Args:
+        engine (Engine): The database engine.
+        moment (datetime): The upper bound of the partition being archived.
+    """
+    with Session(engine, expire_on_commit=False) as db:
+        if not db.scalar(select(exists().where(StockSnapshot.data == moment))):
+            crud.create_snapshot(db, moment)
+
+
+def export_partition(engine, name: str, directory: str = PARTITION_ARCHIVE_DIR):
+    """Export the rows of a partition to a gzip-compressed CSV file.
+
+    The file is written under a temporary name and renamed when complete.
+
+    Args:
+        engine (Engine): The database engine.
+        name (str): The partition table name.
+        directory (str): The directory of the archive files.
+
+    Returns:
+        str: The path of the archive file.
+    """
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, f'{name}.csv.gz')
+    partition = StockMovementHistory.__table__.to_metadata(MetaData(), name=name)
+    statement = select(*(partition.c[column.name] for column in crud.MOVEMENT_COLUMNS)).order_by(partition.c.id)
+    with gzip.open(f'{path}.tmp', 'wb') as file:
+        for chunk in exporter.stream_rows(lambda: Session(engine), statement, 'csv'):
+            file.write(chunk)
+    os.replace(f'{path}.tmp', path)
+    return path
+
+
+def archive_expired_partitions(engine, today: date = None, retention_months: int = PARTITION_RETENTION_MONTHS):
+    """Archive and drop the partitions older than the retention period.
+
+    Each expired partition is checkpointed by a snapshot at its upper bound, exported to
+    ``PARTITION_ARCHIVE_DIR``, detached and dropped. The reports keep the daily volumes
+    of archived months, but point-in-time queries before the retention cutoff are no
+    longer exact.
+
+    Args:
+        engine (Engine): The database engine.
+        today (date): The reference day; defaults to the current UTC date.
+        retention_months (int): The number of full months kept; 0 disables archiving.
+
+    Returns:
+        list[str]: The paths of the archive files written.
+    """
+    if not supports_partitioning(engine) or retention_months <= 0:
+        return []
+    today = today or datetime.now(timezone.utc).date()
+    cutoff = add_months(today, -retention_months)
+    archived = []
+    for partition in list_partitions(engine):
+        month = partition['month']
+        if month is None or add_months(month, 1) > cutoff:
+            continue
+        end = add_months(month, 1)
+        ensure_snapshot_at(engine, datetime(end.year, end.month, end.day, tzinfo=timezone.utc))
+        archived.append(export_partition(engine, partition['name']))
+        with engine.begin() as connection:
+            connection.execute(text(f'ALTER TABLE {TABLE_NAME} DETACH PARTITION {partition["name"]}'))
+            connection.execute(text(f'DROP TABLE {partition["name"]}'))
+    return archived
+
+
+def maintain_partitions(engine):
+    """Create the upcoming partitions and archive the expired ones.
+
+    Args:
+        engine (Engine): The database engine.
+
+    Returns:
+        dict: The partitions of the current window and the archive files written.
+    """
+    return {'partitions': ensure_partitions(engine), 'archived': archive_expired_partitions(engine)}
+
+
+async def run_periodic_maintenance(engine, interval: int = PARTITION_MAINTENANCE_INTERVAL):
+    """Maintain the partitions every ``interval`` seconds until cancelled, starting after the first interval.
+
+    Args:
+        engine (Engine): The database engine.
+        interval (int): The number of seconds between runs.
+    """
+    while True:
+        # As partições dos próximos meses já existem desde a migração; a primeira execução pode esperar
+        await asyncio.sleep(interval)
+        try:
+            await run_in_threadpool(maintain_partitions, engine)
+        except (SQLAlchemyError, OSError):
+            logger.exception('Falha na manutenção das partições do histórico de movimentação')
@@ -0,0 +1,45 @@
+import asyncio
+import logging
+
+from controller import crud
+from models.database import env_int, open_database
+from sqlalchemy.exc import SQLAlchemyError
+
+logger = logging.getLogger(__name__)
+
+# Intervalo entre as limpezas dos itens arquivados cuja remoção em segundo plano foi interrompida, em segundos;
+# 0 desativa
+PURGE_INTERVAL = env_int('PURGE_INTERVAL', 3600)
+
+
+async def purge_archived():
+    """Purge the archived items with its own session, using the configured database mode.
+
+    Returns:
+        int: The number of purged items.
+    """
+    async with open_database() as db:
+        return await db.run(crud.purge_archived_items)
+
+
+async def run_periodic_purge(interval: int = PURGE_INTERVAL):
+    """Purge the archived items every ``interval`` seconds until cancelled, starting after the first interval.
+
+    Archiving an item purges it in a background task; this loop finishes the purges
+    interrupted by a restart or a failure. Each worker runs the loop, and
+    :func:`controller.crud.purge_item` locks the item, so concurrent purges of the same
+    item wait for each other instead of deleting the same movements.
+
+    Args:
+        interval (int): The number of seconds between runs.
+    """
+    while True:
+        # Aguarda antes da primeira execução para que a inicialização não acesse o banco
+        await asyncio.sleep(interval)
+        try:
+            purged = await purge_archived()
+        except SQLAlchemyError:
+            logger.exception('Falha na limpeza dos itens arquivados')
+            continue
+        if purged:
+            logger.info('%d item(ns) arquivado(s) removido(s)', purged)
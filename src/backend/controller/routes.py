@@ -1,92 +1,331 @@
-from typing import List
+from typing import Annotated, List, Literal, Optional
 
-from controller import crud
-from fastapi import APIRouter, Depends, HTTPException
-from models.database import get_db
-from schemas.schema import ItemCreate, ItemResponse, ItemUpdate, MovementHistoryResponse
-from sqlalchemy.orm import Session
+from controller import cache, crud, etag, exporter, importer, search, serialization, snapshots
+from fastapi import APIRouter, BackgroundTasks, Depends, Header, HTTPException, Query, Request, Response
+from fastapi.responses import StreamingResponse
+from models.database import Database, get_database, open_database
+from schemas.schema import (
+    DEFAULT_IMPORT_BATCH_SIZE,
+    DEFAULT_PAGE_SIZE,
+    MAX_IMPORT_BATCH_SIZE,
+    MAX_PAGE_SIZE,
+    DailyMovement,
+    DailyMovementQuery,
+    ImportReport,
+    ItemCreate,
+    ItemExportQuery,
+    ItemPage,
+    ItemQuery,
+    ItemResponse,
+    ItemStockResponse,
+    ItemUpdate,
+    LocationCreate,
+    LocationResponse,
+    LocationStockPage,
+    LocationStockQuery,
+    LocationValuation,
+    MovementBatch,
+    MovementBatchReport,
+    MovementCreate,
+    MovementExportQuery,
+    MovementHistoryResponse,
+    MovementPage,
+    MovementQuery,
+    SearchPage,
+    SearchQuery,
+    SnapshotResponse,
+    StockAsOfPage,
+    StockAsOfQuery,
+    TransferCreate,
+    TransferResponse,
+    ValuationReport,
+)
 
 router = APIRouter()
 
 
-@router.get('/items', response_model=List[ItemResponse])
-def read_items(db: Session = Depends(get_db)):
-    """Get all items.
+@router.get('/items', response_model=ItemPage)
+async def read_items(
+    query: Annotated[ItemQuery, Query()],
+    response: Response,
+    if_none_match: Optional[str] = Header(None),
+    db: Database = Depends(get_database),
+):
+    """Get a page of items.
 
     Args:
-        db (Session): The database session.
+        query (ItemQuery): The pagination, sorting and filter parameters.
+        response (Response): The response, used to set the ETag header.
+        if_none_match (Optional[str]): The ETags of the copies the client already has.
+        db (Database): The database session.
 
     Returns:
-        List[ItemResponse]: A list of all items.
+        ItemPage: The items in the page, possibly none, and the cursor for the next one, or 304 if unchanged.
+
+    Raises:
+        HTTPException: If the cursor is invalid.
+    """
+    key = await cache.run_blocking(cache.items_key, query)
+    try:
+        page = await cache.read_through(key, lambda: db.run(crud.load_items_page, query))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    current_etag = etag.page_etag(page['items'], page['next_cursor'])
+    if etag.none_match(if_none_match, current_etag):
+        return Response(status_code=304, headers={'ETag': current_etag})
+    response.headers['ETag'] = current_etag
+    return serialization.render(page, response)
+
+
+@router.post('/items/import', response_model=ImportReport)
+async def import_items(
+    request: Request,
+    format: Optional[Literal['csv', 'ndjson']] = None,
+    batch_size: int = Query(DEFAULT_IMPORT_BATCH_SIZE, ge=1, le=MAX_IMPORT_BATCH_SIZE),
+    db: Database = Depends(get_database),
+):
+    """Bulk import items from a CSV or NDJSON request body.
+
+    The body is read as a stream and inserted in batches, so memory use does not depend
+    on the size of the file.
+
+    Args:
+        request (Request): The request whose body holds the items.
+        format (Optional[str]): The input format; inferred from the Content-Type when omitted.
+        batch_size (int): The number of rows inserted per transaction.
+        db (Database): The database session.
+
+    Returns:
+        ImportReport: The number of inserted and rejected rows and the per-line errors.
+
+    Raises:
+        HTTPException: If the CSV header is invalid.
+    """
+    if format is None:
+        format = 'ndjson' if 'json' in request.headers.get('content-type', '') else 'csv'
+
+    async def insert_batch(items):
+        inserted = await db.run(crud.import_items, items)
+        await cache.run_blocking(cache.invalidate_items)
+        return inserted
+
+    try:
+        return await importer.import_items(request.stream(), format, batch_size, insert_batch)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@router.get('/items/search', response_model=SearchPage)
+async def search_items(
+    query: Annotated[SearchQuery, Query()], response: Response, db: Database = Depends(get_database)
+):
+    """Search items by product name, tolerating typos, best match first.
+
+    Args:
+        query (SearchQuery): The term and pagination parameters.
+        response (Response): The response, used to keep headers in the fast JSON mode.
+        db (Database): The database session.
+
+    Returns:
+        SearchPage: The matching items in the page and the cursor for the next one.
+
+    Raises:
+        HTTPException: If the cursor is invalid.
     """
-    items = crud.get_items(db)
-    if not items:
-        raise HTTPException(status_code=404, detail='Nenhum item encontrado')
-    return items
+    matches = await search.memory_matches(db, query.q)
+    try:
+        items, next_cursor = await db.run(crud.search_items, query, matches)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return serialization.render({'items': items, 'next_cursor': next_cursor}, response)
+
+
+@router.get('/items/as-of', response_model=StockAsOfPage)
+async def read_stock_as_of(query: Annotated[StockAsOfQuery, Query()], db: Database = Depends(get_database)):
+    """Get a page of the stock of the active items at a past moment.
+
+    The stock is reconstructed from the nearest earlier snapshot plus the movements after it.
+
+    Args:
+        query (StockAsOfQuery): The moment, filters and pagination parameters.
+        db (Database): The database session.
+
+    Returns:
+        StockAsOfPage: The items in the page with their stock at that moment.
+
+    Raises:
+        HTTPException: If the cursor is invalid.
+    """
+    try:
+        snapshot, items, next_cursor = await db.run(crud.get_stock_as_of, query)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {'at': query.at, 'snapshot': snapshot, 'items': items, 'next_cursor': next_cursor}
 
 
 @router.get('/items/{item_id}', response_model=ItemResponse)
-def read_item(item_id: int, db: Session = Depends(get_db)):
+async def read_item(
+    item_id: int,
+    response: Response,
+    if_none_match: Optional[str] = Header(None),
+    db: Database = Depends(get_database),
+):
     """Get an item by ID.
 
     Args:
         item_id (int): The item ID.
-        db (Session): The database session.
+        response (Response): The response, used to set the ETag header.
+        if_none_match (Optional[str]): The ETags of the copies the client already has.
+        db (Database): The database session.
 
     Returns:
-        ItemResponse: The item with the given ID.
+        ItemResponse: The item with the given ID, or 304 if unchanged.
 
     Raises:
         HTTPException: If the item is not found.
     """
-    item = crud.get_item(db, item_id)
+    item = await cache.read_through(cache.item_key(item_id), lambda: db.run(crud.load_item, item_id))
     if item is None:
         raise HTTPException(status_code=404, detail='Item não encontrado')
+
+    current_etag = etag.item_etag(item['id'], item['versao'])
+    if etag.none_match(if_none_match, current_etag):
+        return Response(status_code=304, headers={'ETag': current_etag})
+    response.headers['ETag'] = current_etag
     return item
 
 
 @router.post('/items', response_model=ItemResponse)
-def create_item(item: ItemCreate, db: Session = Depends(get_db)):
+async def create_item(item: ItemCreate, db: Database = Depends(get_database)):
     """Create a new item.
 
     Args:
         item (ItemCreate): The item data.
-        db (Session): The database session.
+        db (Database): The database session.
 
     Returns:
         ItemResponse: The created item.
     """
-    return crud.create_item(db, item)
+    new_item = await db.run(crud.create_item, item)
+    await cache.run_blocking(cache.invalidate_item, new_item.id)
+    return new_item
 
 
 @router.put('/items/{item_id}', response_model=ItemResponse)
-def update_item(item_id: int, item: ItemUpdate, db: Session = Depends(get_db)):
+async def update_item(
+    item_id: int,
+    item: ItemUpdate,
+    response: Response,
+    if_match: Optional[str] = Header(None),
+    db: Database = Depends(get_database),
+):
     """Update an existing item.
 
+    With an ``If-Match`` header the update is only applied if the item was not changed
+    since the client read it (optimistic concurrency).
+
     Args:
         item_id (int): The item ID.
         item (ItemUpdate): The updated item data.
-        db (Session): The database session.
+        response (Response): The response, used to set the ETag header.
+        if_match (Optional[str]): The ETag of the item version the update is based on.
+        db (Database): The database session.
 
     Returns:
         ItemResponse: The updated item.
 
     Raises:
-        HTTPException: If the item is not found.
+        HTTPException: If the item is not found, was changed since the ETag in If-Match or
+            the default location does not hold enough stock for a reduction.
     """
-    updated_item = crud.update_item(db, item_id, item)
+    try:
+        updated_item = await db.run(crud.update_item, item_id, item, etag.expected_version(if_match, item_id))
+    except crud.StockError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=412, detail=str(e))
     if updated_item is None:
         raise HTTPException(status_code=404, detail='Item não encontrado')
+    await cache.run_blocking(cache.invalidate_item, item_id)
+    response.headers['ETag'] = etag.item_etag(updated_item.id, updated_item.versao)
     return updated_item
 
 
+@router.post('/items/{item_id}/movements', response_model=MovementHistoryResponse)
+async def create_movement(item_id: int, movement: MovementCreate, db: Database = Depends(get_database)):
+    """Apply a stock movement to an item.
+
+    Args:
+        item_id (int): The item ID.
+        movement (MovementCreate): The movement data.
+        db (Database): The database session.
+
+    Returns:
+        MovementHistoryResponse: The created movement record.
+
+    Raises:
+        HTTPException: If the item or the location is not found or the stock at the location would become negative.
+    """
+    try:
+        new_movement = await db.run(crud.apply_movement, item_id, movement)
+    except crud.LocationNotFound as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    if new_movement is None:
+        raise HTTPException(status_code=404, detail='Item não encontrado')
+    await cache.run_blocking(cache.invalidate_item, item_id)
+    return new_movement
+
+
+@router.get('/items/{item_id}/stock', response_model=ItemStockResponse)
+async def read_item_stock(item_id: int, db: Database = Depends(get_database)):
+    """Get the stock of an item at each location.
+
+    Args:
+        item_id (int): The item ID.
+        db (Database): The database session.
+
+    Returns:
+        ItemStockResponse: The total stock and the stock at each location.
+
+    Raises:
+        HTTPException: If the item is not found.
+    """
+    stock = await db.run(crud.get_item_stock, item_id)
+    if stock is None:
+        raise HTTPException(status_code=404, detail='Item não encontrado')
+    return stock
+
+
+async def purge_item_task(item_id: int):
+    """Purge an archived item in the background with its own session.
+
+    Args:
+        item_id (int): The archived item ID.
+    """
+    async with open_database() as db:
+        await db.run(crud.purge_item, item_id)
+
+
 @router.delete('/items/{item_id}', response_model=ItemResponse)
-def delete_item(item_id: int, db: Session = Depends(get_db)):
+async def delete_item(
+    item_id: int,
+    background_tasks: BackgroundTasks,
+    archive: bool = False,
+    db: Database = Depends(get_database),
+):
     """Delete an item by ID.
 
+    With ``archive=true`` the item is only archived and the response returns at once;
+    the item and its movement history are purged afterwards in a background task.
+
     Args:
         item_id (int): The item ID.
-        db (Session): The database session.
+        background_tasks (BackgroundTasks): The tasks run after the response is sent.
+        archive (bool): Whether to archive the item and purge it in the background.
+        db (Database): The database session.
 
     Returns:
         ItemResponse: The deleted item.
@@ -94,27 +333,267 @@ def delete_item(item_id: int, db: Session = Depends(get_db)):
     Raises:
         HTTPException: If the item is not found.
     """
-    deleted_item = crud.delete_item(db, item_id)
+    if archive:
+        deleted_item = await db.run(crud.archive_item, item_id)
+        if deleted_item is not None:
+            background_tasks.add_task(purge_item_task, item_id)
+    else:
+        deleted_item = await db.run(crud.delete_item, item_id)
     if deleted_item is None:
         raise HTTPException(status_code=404, detail='Item não encontrado')
+    await cache.run_blocking(cache.invalidate_item, item_id)
     return deleted_item
 
 
-@router.get('/movements/{product_id}', response_model=List[MovementHistoryResponse])
-def get_product_movement_history(product_id: int, db: Session = Depends(get_db)):
-    """Get the movement history for a product.
+@router.post('/movements/batch', response_model=MovementBatchReport)
+async def apply_movement_batch(batch: MovementBatch, db: Database = Depends(get_database)):
+    """Apply a batch of stock movements in a single transaction.
 
     Args:
-        product_id (int): The product ID.
-        db (Session): The database session.
+        batch (MovementBatch): The movements and the failure mode.
+        db (Database): The database session.
+
+    Returns:
+        MovementBatchReport: The number of applied and failed lines and the rejected lines.
+
+    Raises:
+        HTTPException: If any line fails in 'all_or_nothing' mode.
+    """
+    report = await db.run(crud.apply_movement_batch, batch)
+    if report['applied']:
+        for produto_id in {line.produto_id for line in batch.lines}:
+            await cache.run_blocking(cache.invalidate_item, produto_id)
+    if report['failed'] and batch.mode == 'all_or_nothing':
+        raise HTTPException(status_code=409, detail=report)
+    return report
+
+
+@router.post('/transfers', response_model=TransferResponse)
+async def transfer_stock(transfer: TransferCreate, db: Database = Depends(get_database)):
+    """Transfer stock of an item between two locations, writing the paired SAIDA and ENTRADA atomically.
+
+    Args:
+        transfer (TransferCreate): The item, locations and quantity.
+        db (Database): The database session.
 
     Returns:
-        List[MovementHistoryResponse]: A list of movement history records for the product.
+        TransferResponse: The SAIDA and the ENTRADA movement records.
 
     Raises:
-        HTTPException: If no movements are found for the product.
+        HTTPException: If the item or a location is not found or the origin does not hold enough stock.
     """
-    movements = crud.get_product_movement_history(db, product_id)
+    try:
+        movements = await db.run(crud.transfer_stock, transfer)
+    except crud.LocationNotFound as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=409, detail=str(e))
     if movements is None:
-        raise HTTPException(status_code=404, detail='Nenhum historico de movimento encontrado para este produto')
-    return movements
+        raise HTTPException(status_code=404, detail='Item não encontrado')
+    saida, entrada = movements
+    return {'saida': saida, 'entrada': entrada}
+
+
+@router.get('/locations', response_model=List[LocationResponse])
+async def read_locations(db: Database = Depends(get_database)):
+    """Get every stock location.
+
+    Args:
+        db (Database): The database session.
+
+    Returns:
+        List[LocationResponse]: The locations, ordered by ID.
+    """
+    return await db.run(crud.get_locations)
+
+
+@router.post('/locations', response_model=LocationResponse)
+async def create_location(location: LocationCreate, db: Database = Depends(get_database)):
+    """Create a new stock location.
+
+    Args:
+        location (LocationCreate): The location data.
+        db (Database): The database session.
+
+    Returns:
+        LocationResponse: The created location.
+
+    Raises:
+        HTTPException: If a location with the same name already exists.
+    """
+    try:
+        return await db.run(crud.create_location, location)
+    except ValueError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+
+
+@router.get('/locations/{local_id}/stock', response_model=LocationStockPage)
+async def read_location_stock(
+    local_id: int,
+    query: Annotated[LocationStockQuery, Query()],
+    response: Response,
+    db: Database = Depends(get_database),
+):
+    """Get a page of the items with stock at a location.
+
+    Args:
+        local_id (int): The location ID.
+        query (LocationStockQuery): The pagination parameters.
+        response (Response): The response, used to keep headers in the fast JSON mode.
+        db (Database): The database session.
+
+    Returns:
+        LocationStockPage: The items in the page and the cursor for the next one.
+
+    Raises:
+        HTTPException: If the cursor is invalid or the location is not found.
+    """
+    try:
+        page = await db.run(crud.get_location_stock, local_id, query)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if page is None:
+        raise HTTPException(status_code=404, detail='Local não encontrado')
+    items, next_cursor = page
+    return serialization.render({'items': items, 'next_cursor': next_cursor}, response)
+
+
+@router.get('/movements/{product_id}', response_model=MovementPage)
+async def get_product_movement_history(
+    product_id: int,
+    query: Annotated[MovementQuery, Query()],
+    response: Response,
+    db: Database = Depends(get_database),
+):
+    """Get a page of the movement history for a product.
+
+    Args:
+        product_id (int): The product ID.
+        query (MovementQuery): The pagination and filter parameters.
+        response (Response): The response, used to keep headers in the fast JSON mode.
+        db (Database): The database session.
+
+    Returns:
+        MovementPage: The movements in the page, possibly none, and the cursor for the next one.
+
+    Raises:
+        HTTPException: If the cursor is invalid.
+    """
+    try:
+        movements, next_cursor = await db.run(crud.get_product_movement_history, product_id, query)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return serialization.render({'movements': movements, 'next_cursor': next_cursor}, response)
+
+
+@router.get('/export/items')
+async def export_items(query: Annotated[ItemExportQuery, Query()]):
+    """Export every item matching the filters as a streamed NDJSON or CSV file.
+
+    Args:
+        query (ItemExportQuery): The filter parameters and the export format.
+
+    Returns:
+        StreamingResponse: The exported items, ordered by ID.
+    """
+    return StreamingResponse(
+        exporter.export_stream(crud.export_items_statement(query), query.format),
+        media_type=exporter.MEDIA_TYPES[query.format],
+        headers=exporter.export_headers('items', query.format),
+    )
+
+
+@router.get('/export/movements')
+async def export_movements(query: Annotated[MovementExportQuery, Query()]):
+    """Export every movement matching the filters as a streamed NDJSON or CSV file.
+
+    Args:
+        query (MovementExportQuery): The product, date and type filters and the export format.
+
+    Returns:
+        StreamingResponse: The exported movements.
+    """
+    return StreamingResponse(
+        exporter.export_stream(crud.export_movements_statement(query), query.format),
+        media_type=exporter.MEDIA_TYPES[query.format],
+        headers=exporter.export_headers('movements', query.format),
+    )
+
+
+@router.get('/reports/valuation', response_model=ValuationReport)
+async def read_valuation_report(db: Database = Depends(get_database)):
+    """Get the stock valuation, potential revenue and margin, in total and by unit of measure.
+
+    Args:
+        db (Database): The database session.
+
+    Returns:
+        ValuationReport: The valuation report.
+    """
+    return await db.run(crud.get_valuation_report)
+
+
+@router.get('/reports/locations', response_model=List[LocationValuation])
+async def read_location_report(db: Database = Depends(get_database)):
+    """Get the stock valuation, potential revenue and margin at each location.
+
+    Args:
+        db (Database): The database session.
+
+    Returns:
+        List[LocationValuation]: The totals of each location.
+    """
+    return await db.run(crud.get_location_report)
+
+
+@router.get('/reports/movements/daily', response_model=List[DailyMovement])
+async def read_daily_movements(query: Annotated[DailyMovementQuery, Query()], db: Database = Depends(get_database)):
+    """Get the quantities received and issued per day.
+
+    Args:
+        query (DailyMovementQuery): The range of days.
+        db (Database): The database session.
+
+    Returns:
+        List[DailyMovement]: The volumes of each day with movements.
+    """
+    return await db.run(crud.get_daily_movements, query)
+
+
+@router.post('/reports/rebuild', response_model=ValuationReport)
+async def rebuild_reports(db: Database = Depends(get_database)):
+    """Recompute the report summary tables from the items and the movement history.
+
+    Args:
+        db (Database): The database session.
+
+    Returns:
+        ValuationReport: The rebuilt valuation report.
+    """
+    return await db.run(crud.rebuild_summaries)
+
+
+@router.post('/snapshots', response_model=SnapshotResponse)
+async def create_snapshot():
+    """Checkpoint the stock of every active item now, minus the configured grace period.
+
+    Returns:
+        SnapshotResponse: The created snapshot.
+    """
+    return await snapshots.take_snapshot()
+
+
+@router.get('/snapshots', response_model=List[SnapshotResponse])
+async def read_snapshots(
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE), db: Database = Depends(get_database)
+):
+    """Get the most recent stock snapshots.
+
+    Args:
+        limit (int): The maximum number of snapshots.
+        db (Database): The database session.
+
+    Returns:
+        List[SnapshotResponse]: The snapshots, most recent first.
+    """
+    return await db.run(crud.get_snapshots, limit)
@@ -0,0 +1,235 @@
+import bisect
+import re
+import threading
+
+from fastapi.concurrency import run_in_threadpool
+from models.database import Database
+from models.models import Item, SearchGeneration
+from sqlalchemy import Float, cast, or_, select, update
+from sqlalchemy.orm import Session
+
+# Similaridade mínima entre trigramas, igual ao padrão de pg_trgm.similarity_threshold
+SIMILARITY_THRESHOLD = 0.3
+
+WORD_PATTERN = re.compile(r'\w+')
+
+
+def like_pattern(term: str):
+    """Escape a search term for a LIKE pattern using backslash as the escape character.
+
+    Args:
+        term (str): The search term.
+
+    Returns:
+        str: The term with ``%``, ``_`` and ``\\`` escaped.
+    """
+    return term.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+
+
+def trigrams(text: str):
+    """Extract the trigrams of a text the same way as pg_trgm.
+
+    Each word is lowercased and padded with two spaces before and one after.
+
+    Args:
+        text (str): The text.
+
+    Returns:
+        set[str]: The trigrams.
+    """
+    result = set()
+    for word in WORD_PATTERN.findall(text.lower()):
+        padded = f'  {word} '
+        result.update(padded[i : i + 3] for i in range(len(padded) - 2))
+    return result
+
+
+def similarity(left: set, right: set):
+    """Get the trigram similarity of two trigram sets, as ``similarity()`` in pg_trgm.
+
+    Args:
+        left (set[str]): The trigrams of the first text.
+        right (set[str]): The trigrams of the second text.
+
+    Returns:
+        float: The shared trigrams divided by the distinct trigrams, between 0 and 1.
+    """
+    union = len(left | right)
+    return len(left & right) / union if union else 0.0
+
+
+def trigram_search_statement(term: str):
+    """Build the PostgreSQL search over product names.
+
+    Matches names that contain the term or are similar to it, ordered by trigram
+    distance (``<->``) so the GiST trigram index returns the best matches first.
+
+    Args:
+        term (str): The search term.
+
+    Returns:
+        tuple: The select statement over the item columns and the distance expression.
+    """
+    ranking = Item.produto.op('<->')(term)
+    distance = cast(ranking, Float)
+    statement = (
+        select(Item.id, Item.produto, Item.unidade_medida, Item.estoque, distance.label('distance'))
+        .where(
+            Item.arquivado_em.is_(None),
+            or_(Item.produto.op('%')(term), Item.produto.ilike(f'%{like_pattern(term)}%', escape='\\')),
+        )
+        .order_by(ranking, Item.id)
+    )
+    return statement, distance
+
+
+def uses_trigram_index(db: Session):
+    """Check whether the database searches with pg_trgm instead of the in-memory index.
+
+    Args:
+        db (Session): The database session.
+
+    Returns:
+        bool: True on PostgreSQL.
+    """
+    return db.get_bind().dialect.name == 'postgresql'
+
+
+def current_generation(db: Session):
+    """Get the search generation, or None when the database searches with pg_trgm.
+
+    Args:
+        db (Session): The database session.
+
+    Returns:
+        int: The number of product name changes committed so far.
+    """
+    if uses_trigram_index(db):
+        return None
+    return db.scalar(select(SearchGeneration.geracao).where(SearchGeneration.id == 1))
+
+
+def active_names(db: Session):
+    """Get the product names indexed by the in-memory search.
+
+    Args:
+        db (Session): The database session.
+
+    Returns:
+        list[tuple]: The ``(item ID, product name)`` of every active item.
+    """
+    return db.execute(select(Item.id, Item.produto).where(Item.arquivado_em.is_(None))).all()
+
+
+class MemoryIndex:
+    """In-memory search index over product names, for databases without pg_trgm.
+
+    Names are kept sorted for prefix lookups and in a trigram posting list for
+    substring and typo-tolerant lookups. The index is rebuilt whenever the search
+    generation stored in the database moves past the one it was built at, so writes
+    committed by any worker are seen on the next search (see :func:`invalidate`).
+
+    Attributes:
+        generation (int): The search generation the index was built at, or None if never built.
+        contents (tuple): The lowercased product name of each item ID, the trigrams of each
+            name, the ``(lowercased name, item ID)`` pairs in order and the item IDs of each
+            trigram; replaced at once so searches never see a partial rebuild.
+    """
+
+    def __init__(self):
+        self.generation = None
+        self.contents = ({}, {}, [], {})
+        self.lock = threading.Lock()
+
+    def rebuild(self, rows, generation: int):
+        """Replace the index contents, unless a newer generation was already built.
+
+        Args:
+            rows (list[tuple]): The ``(item ID, product name)`` of every active item.
+            generation (int): The search generation read before the rows.
+        """
+        names = {item_id: produto.lower() for item_id, produto in rows}
+        name_trigrams = {item_id: trigrams(name) for item_id, name in names.items()}
+        postings = {}
+        for item_id, item_trigrams in name_trigrams.items():
+            for trigram in item_trigrams:
+                postings.setdefault(trigram, set()).add(item_id)
+        sorted_names = sorted((name, item_id) for item_id, name in names.items())
+        with self.lock:
+            # Uma reconstrução mais lenta, iniciada antes, não sobrescreve uma mais recente
+            if self.generation is not None and self.generation > generation:
+                return
+            self.contents = (names, name_trigrams, sorted_names, postings)
+            self.generation = generation
+
+    def search(self, term: str):
+        """Rank the items matching a term.
+
+        Args:
+            term (str): The search term.
+
+        Returns:
+            list[tuple]: The ``(distance, item ID)`` of every match, best first.
+        """
+        names, name_trigrams, sorted_names, postings = self.contents
+        needle = term.lower()
+        query_trigrams = trigrams(needle)
+        candidates = set()
+        for trigram in query_trigrams:
+            candidates |= postings.get(trigram, set())
+        # Prefixos curtos não formam trigramas suficientes
+        position = bisect.bisect_left(sorted_names, (needle,))
+        while position < len(sorted_names) and sorted_names[position][0].startswith(needle):
+            candidates.add(sorted_names[position][1])
+            position += 1
+        if len(needle) < 3:
+            candidates |= {item_id for item_id, name in names.items() if needle in name}
+
+        matches = []
+        for item_id in candidates:
+            name = names[item_id]
+            score = similarity(name_trigrams[item_id], query_trigrams)
+            if needle in name or score >= SIMILARITY_THRESHOLD:
+                matches.append((1.0 - score, item_id))
+        matches.sort()
+        return matches
+
+
+memory_index = MemoryIndex()
+
+
+async def memory_matches(db: Database, term: str):
+    """Rank the items matching a term with the in-memory index, rebuilding it first if names changed.
+
+    The queries go through the database session and the index work through the
+    threadpool, so neither blocks the event loop.
+
+    Args:
+        db (Database): The database session.
+        term (str): The search term.
+
+    Returns:
+        list[tuple]: The ``(distance, item ID)`` of every match, best first, or None when
+            the database searches with pg_trgm.
+    """
+    generation = await db.run(current_generation)
+    if generation is None:
+        return None
+    if memory_index.generation != generation:
+        await run_in_threadpool(memory_index.rebuild, await db.run(active_names), generation)
+    return await run_in_threadpool(memory_index.search, term)
+
+
+def invalidate(db: Session):
+    """Bump the search generation after product names changed, in the transaction of the change.
+
+    Other workers see the new generation once the transaction commits and rebuild their
+    index on the next search. Does nothing on PostgreSQL, where the search reads the
+    items table directly.
+
+    Args:
+        db (Session): The database session.
+    """
+    if uses_trigram_index(db):
+        return
+    db.execute(update(SearchGeneration).where(SearchGeneration.id == 1).values(geracao=SearchGeneration.geracao + 1))
@@ -0,0 +1,44 @@
+import orjson
+from fastapi import Response
+from models.database import env_bool
+
+# Modo rápido: listas são serializadas direto para bytes com orjson, sem validação Pydantic por linha
+FAST_JSON = env_bool('FAST_JSON', True)
+
+
+class ORJSONResponse(Response):
+    """JSON response rendered with orjson."""
+
+    media_type = 'application/json'
+
+    def render(self, content):
+        """Serialize the content to JSON bytes.
+
+        Args:
+            content: The content to serialize.
+
+        Returns:
+            bytes: The JSON document.
+        """
+        # Datas em UTC terminam em 'Z', como na serialização do Pydantic
+        return orjson.dumps(content, option=orjson.OPT_UTC_Z)
+
+
+def render(content, response: Response):
+    """Render a list endpoint payload according to the serialization mode.
+
+    In fast mode the payload is returned as an :class:`ORJSONResponse`, bypassing the
+    route's ``response_model`` validation; otherwise it is returned unchanged for
+    FastAPI to validate and encode.
+
+    Args:
+        content (dict): The payload, already made of plain values.
+        response (Response): The injected response whose headers must be kept.
+
+    Returns:
+        The response or the payload.
+    """
+    if not FAST_JSON:
+        return content
+    headers = {key: value for key, value in response.headers.items() if key != 'content-length'}
+    return ORJSONResponse(content, headers=headers)
@@ -0,0 +1,54 @@
+import asyncio
+import logging
+from datetime import datetime, timedelta, timezone
+
+from controller import crud
+from models.database import env_int, open_database
+from sqlalchemy.exc import SQLAlchemyError
+
+logger = logging.getLogger(__name__)
+
+# Intervalo entre snapshots automáticos do estoque, em segundos; 0 desativa
+SNAPSHOT_INTERVAL = env_int('SNAPSHOT_INTERVAL', 86400)
+# Atraso do instante capturado, para que as transações iniciadas antes dele já tenham sido confirmadas
+SNAPSHOT_GRACE = env_int('SNAPSHOT_GRACE', 300)
+
+
+def snapshot_cutoff():
+    """Get the moment a snapshot taken now captures.
+
+    Returns:
+        datetime: The current time minus ``SNAPSHOT_GRACE`` seconds.
+    """
+    return datetime.now(timezone.utc) - timedelta(seconds=SNAPSHOT_GRACE)
+
+
+async def take_snapshot(min_interval: int = 0):
+    """Take a snapshot with its own session.
+
+    Args:
+        min_interval (int): The minimum number of seconds since the previous snapshot.
+
+    Returns:
+        StockSnapshot: The created snapshot, or None if a recent one already exists.
+    """
+    async with open_database() as db:
+        return await db.run(crud.create_snapshot, snapshot_cutoff(), min_interval)
+
+
+async def run_periodic_snapshots(interval: int = SNAPSHOT_INTERVAL):
+    """Take a snapshot every ``interval`` seconds until cancelled, starting after the first interval.
+
+    Each worker runs the loop, but a snapshot is skipped when another worker has taken
+    one within the interval.
+
+    Args:
+        interval (int): The number of seconds between snapshots.
+    """
+    while True:
+        # Aguarda antes da primeira execução para que a inicialização não acesse o banco
+        await asyncio.sleep(interval)
+        try:
+            await take_snapshot(min_interval=interval)
+        except SQLAlchemyError:
+            logger.exception('Falha ao gerar o snapshot do estoque')
@@ -0,0 +1,243 @@
+from collections import defaultdict
+
+from models.database import env_int
+from models.models import DailyMovementSummary, Item, StockMovementHistory, ValuationSummary
+from sqlalchemy import Date, delete, func, insert, select
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+
+# Número de linhas por grupo nas tabelas de resumo; reduz a disputa por uma mesma linha
+SUMMARY_SHARDS = env_int('SUMMARY_SHARDS', 16)
+
+UPSERT_DIALECTS = {
+    'postgresql': postgresql.insert,
+    'sqlite': sqlite.insert,
+}
+
+
+def shard_of(item_id: int):
+    """Get the summary shard of an item.
+
+    Args:
+        item_id (int): The item ID.
+
+    Returns:
+        int: The shard.
+    """
+    return item_id % SUMMARY_SHARDS
+
+
+def increment_statement(db: Session, model, keys: tuple, increments: tuple, **values):
+    """Build an INSERT that adds its values to the existing row with the same key instead of failing.
+
+    Args:
+        db (Session): The database session.
+        model (type): The model of the table.
+        keys (tuple): The primary key column names.
+        increments (tuple): The names of the columns added to the existing row.
+        **values: Column values of the INSERT, such as SQL expressions.
+
+    Returns:
+        Insert: The upsert statement.
+
+    Raises:
+        ValueError: If the database does not support upserts.
+    """
+    try:
+        insert_ = UPSERT_DIALECTS[db.get_bind().dialect.name]
+    except KeyError:
+        raise ValueError('As tabelas de resumo exigem PostgreSQL ou SQLite')
+    table = model.__table__
+    statement = insert_(table).values(**values)
+    return statement.on_conflict_do_update(
+        index_elements=list(keys),
+        set_={name: table.c[name] + statement.excluded[name] for name in increments},
+    )
+
+
+def upsert_increments(db: Session, model, keys: tuple, rows: list[dict], **values):
+    """Add values to summary rows, creating the rows that do not exist yet.
+
+    Args:
+        db (Session): The database session.
+        model (type): The summary model.
+        keys (tuple): The primary key column names.
+        rows (list[dict]): The keys and increments of each row.
+        **values: Column values shared by every row, such as SQL expressions.
+
+    Raises:
+        ValueError: If the database does not support upserts.
+    """
+    increments = tuple(name for name in rows[0] if name not in keys)
+    db.execute(increment_statement(db, model, keys, increments, **values), rows)
+
+
+class SummaryDelta:
+    """Changes to the summary tables accumulated during a transaction.
+
+    Changes are grouped by summary row and written by :meth:`apply` just before the
+    commit, in primary key order, so concurrent transactions never lock summary rows
+    in opposite orders.
+
+    Attributes:
+        valuation (dict): The increments of each valuation row.
+        movements (dict): The increments of each daily movement row; the day is None for today.
+    """
+
+    def __init__(self):
+        self.valuation = defaultdict(lambda: [0, 0.0, 0.0, 0.0])
+        self.movements = defaultdict(lambda: [0.0, 0])
+
+    def add_item(self, item_id: int, unidade_medida, estoque: float, custo_medio, valor_venda, itens: int = 1):
+        """Add stock of an item to the valuation.
+
+        Args:
+            item_id (int): The item ID.
+            unidade_medida (UoMType): The unit of measure.
+            estoque (float): The stock quantity added; negative to remove stock.
+            custo_medio (float): The average cost.
+            valor_venda (float): The sale value.
+            itens (int): The change in the number of items.
+        """
+        totals = self.valuation[(unidade_medida, shard_of(item_id))]
+        totals[0] += itens
+        totals[1] += estoque
+        totals[2] += estoque * (custo_medio or 0)
+        totals[3] += estoque * (valor_venda or 0)
+
+    def remove_item(self, item_id: int, unidade_medida, estoque: float, custo_medio, valor_venda):
+        """Remove an item and its stock from the valuation.
+
+        Args:
+            item_id (int): The item ID.
+            unidade_medida (UoMType): The unit of measure.
+            estoque (float): The stock quantity.
+            custo_medio (float): The average cost.
+            valor_venda (float): The sale value.
+        """
+        self.add_item(item_id, unidade_medida, -estoque, custo_medio, valor_venda, itens=-1)
+
+    def add_movement(self, produto_id: int, movimentacao, quantidade: float, movimentos: int = 1, dia=None):
+        """Add movements to the daily volumes.
+
+        Args:
+            produto_id (int): The product ID.
+            movimentacao (MovementType): The type of movement.
+            quantidade (float): The quantity moved; negative to remove movements.
+            movimentos (int): The change in the number of movements.
+            dia (date): The day of the movements, or None for the current database date.
+        """
+        totals = self.movements[(dia, movimentacao, shard_of(produto_id))]
+        totals[0] += quantidade
+        totals[1] += movimentos
+
+    def remove_movements(self, db: Session, *criteria):
+        """Remove from the daily volumes the movements about to be deleted.
+
+        Transfer legs never entered the daily volumes and are left out.
+
+        Args:
+            db (Session): The database session.
+            *criteria: The WHERE criteria of the movements.
+        """
+        dia = func.date(StockMovementHistory.data, type_=Date)
+        shard = StockMovementHistory.produto_id % SUMMARY_SHARDS
+        rows = db.execute(
+            select(
+                dia, StockMovementHistory.movimentacao, shard, func.sum(StockMovementHistory.quantidade), func.count()
+            )
+            .where(*criteria, StockMovementHistory.transferencia.is_(False))
+            .group_by(dia, StockMovementHistory.movimentacao, shard)
+        )
+        for day, movimentacao, shard_id, quantidade, movimentos in rows:
+            totals = self.movements[(day, movimentacao, shard_id)]
+            totals[0] -= quantidade
+            totals[1] -= movimentos
+
+    def apply(self, db: Session):
+        """Write the accumulated changes to the summary tables.
+
+        Args:
+            db (Session): The database session, inside the transaction of the changes.
+        """
+        if self.valuation:
+            rows = [
+                {
+                    'unidade_medida': unidade_medida,
+                    'shard': shard,
+                    'itens': itens,
+                    'estoque': estoque,
+                    'valor_estoque': valor_estoque,
+                    'receita_potencial': receita_potencial,
+                }
+                for (unidade_medida, shard), (itens, estoque, valor_estoque, receita_potencial) in sorted(
+                    self.valuation.items(), key=lambda entry: (entry[0][0].value, entry[0][1])
+                )
+            ]
+            upsert_increments(db, ValuationSummary, ('unidade_medida', 'shard'), rows)
+
+        today = [key for key in self.movements if key[0] is None]
+        dated = [key for key in self.movements if key[0] is not None]
+        for keys, values in ((dated, {}), (today, {'dia': func.current_date()})):
+            if not keys:
+                continue
+            rows = [
+                {
+                    **({'dia': dia} if dia is not None else {}),
+                    'movimentacao': movimentacao,
+                    'shard': shard,
+                    'quantidade': self.movements[(dia, movimentacao, shard)][0],
+                    'movimentos': self.movements[(dia, movimentacao, shard)][1],
+                }
+                for dia, movimentacao, shard in sorted(keys, key=lambda key: (key[0] or 0, key[1].value, key[2]))
+            ]
+            upsert_increments(db, DailyMovementSummary, ('dia', 'movimentacao', 'shard'), rows, **values)
+
+
+def rebuild(db: Session):
+    """Recompute the summary tables from the items and the movement history.
+
+    Used to fill the tables of an existing database and to discard any drift. Transfer
+    legs do not change the stock of the item and stay out of the daily volumes.
+
+    Args:
+        db (Session): The database session.
+    """
+    shard = (Item.id % SUMMARY_SHARDS).label('shard')
+    custo = func.coalesce(Item.custo_medio, 0)
+    venda = func.coalesce(Item.valor_venda, 0)
+    db.execute(delete(ValuationSummary))
+    db.execute(
+        insert(ValuationSummary).from_select(
+            ['unidade_medida', 'shard', 'itens', 'estoque', 'valor_estoque', 'receita_potencial'],
+            select(
+                Item.unidade_medida,
+                shard,
+                func.count(),
+                func.sum(Item.estoque),
+                func.sum(Item.estoque * custo),
+                func.sum(Item.estoque * venda),
+            )
+            .where(Item.arquivado_em.is_(None))
+            .group_by(Item.unidade_medida, shard),
+        )
+    )
+
+    dia = func.date(StockMovementHistory.data, type_=Date)
+    movement_shard = StockMovementHistory.produto_id % SUMMARY_SHARDS
+    db.execute(delete(DailyMovementSummary))
+    db.execute(
+        insert(DailyMovementSummary).from_select(
+            ['dia', 'movimentacao', 'shard', 'quantidade', 'movimentos'],
+            select(
+                dia,
+                StockMovementHistory.movimentacao,
+                movement_shard,
+                func.sum(StockMovementHistory.quantidade),
+                func.count(),
+            )
+            .where(StockMovementHistory.transferencia.is_(False))
+            .group_by(dia, StockMovementHistory.movimentacao, movement_shard),
+        )
+    )
+    db.commit()
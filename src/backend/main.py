@@ -1,10 +1,69 @@
-from controller.routes import router
-from fastapi import FastAPI
-from models.database import Base, engine
+import asyncio
+import math
+from contextlib import asynccontextmanager, suppress
 
-# Criação das tabelas no banco de dados
-Base.metadata.create_all(bind=engine)
+from controller import monitoring, partitions, purge, routes, snapshots
+from fastapi import FastAPI, Request
+from fastapi.encoders import jsonable_encoder
+from fastapi.exceptions import RequestValidationError
+from fastapi.responses import JSONResponse
+from models.database import engine, env_int
+from monitoring import profiler
+from monitoring.metrics import MetricsMiddleware, request_metrics
 
-app = FastAPI()
+# O esquema do banco é criado e atualizado pelas migrações (python -m migrations upgrade), não na inicialização
 
-app.include_router(router, prefix='/api', tags=['inventory'])
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Run the periodic stock snapshots, partition maintenance and archived item purge while the application is up.
+
+    Startup makes no database round trips: the engines connect on the first request.
+
+    Args:
+        app (FastAPI): The application.
+    """
+    tasks = []
+    if snapshots.SNAPSHOT_INTERVAL > 0:
+        tasks.append(asyncio.create_task(snapshots.run_periodic_snapshots()))
+    if partitions.supports_partitioning(engine) and partitions.PARTITION_MAINTENANCE_INTERVAL > 0:
+        tasks.append(asyncio.create_task(partitions.run_periodic_maintenance(engine)))
+    if purge.PURGE_INTERVAL > 0:
+        tasks.append(asyncio.create_task(purge.run_periodic_purge()))
+    yield
+    for task in tasks:
+        task.cancel()
+        with suppress(asyncio.CancelledError):
+            await task
+
+
+# Requisições com esta quantidade de instruções SQL ou mais são registradas no log (indício de N+1); 0 desativa
+REQUEST_STATEMENTS_WARNING = env_int('REQUEST_STATEMENTS_WARNING', 50)
+
+app = FastAPI(lifespan=lifespan)
+if profiler.PROFILE_ENABLED:
+    app.add_middleware(profiler.ProfilerMiddleware)
+app.add_middleware(MetricsMiddleware, metrics=request_metrics, statements_warning=REQUEST_STATEMENTS_WARNING)
+
+
+@app.exception_handler(RequestValidationError)
+async def validation_exception_handler(request: Request, exc: RequestValidationError):
+    """Report validation errors like FastAPI does, also when the rejected input is NaN or infinite.
+
+    The JSON parser accepts the ``NaN`` and ``Infinity`` literals, which the schemas
+    reject but which cannot be written back in a JSON response.
+
+    Args:
+        request (Request): The request.
+        exc (RequestValidationError): The validation error.
+
+    Returns:
+        JSONResponse: The 422 response with the validation errors.
+    """
+    errors = jsonable_encoder(exc.errors(), custom_encoder={float: lambda v: v if math.isfinite(v) else str(v)})
+    return JSONResponse(status_code=422, content={'detail': errors})
+
+
+app.include_router(routes.router, prefix='/api', tags=['inventory'])
+app.include_router(monitoring.router, prefix='/api', tags=['monitoring'])
+app.include_router(monitoring.metrics_router, tags=['monitoring'])
@@ -0,0 +1,34 @@
+import argparse
+
+from migrations.runner import migrate, migration_status
+from migrations.versions import MIGRATIONS
+from models.database import engine
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        prog='python -m migrations',
+        description='Aplica as migrações versionadas do banco de dados configurado em DATABASE_URL.',
+    )
+    commands = parser.add_subparsers(dest='command', required=True)
+    upgrade = commands.add_parser('upgrade', help='Aplica as migrações pendentes')
+    upgrade.add_argument('--target', type=int, default=None, help='Última versão aplicada (padrão: todas)')
+    commands.add_parser('status', help='Lista as migrações e indica as já aplicadas')
+    args = parser.parse_args()
+
+    try:
+        if args.command == 'status':
+            for known in migration_status(engine, MIGRATIONS):
+                state = 'aplicada' if known['aplicada'] else 'pendente'
+                print(f'{known["versao"]:04d} {known["nome"]}: {state}')
+            return
+        applied = migrate(
+            engine, MIGRATIONS, args.target, report=lambda pending: print(f'{pending.versao:04d} {pending.nome}')
+        )
+        print(f'{len(applied)} migração(ões) aplicada(s)')
+    finally:
+        engine.dispose()
+
+
+if __name__ == '__main__':
+    main()
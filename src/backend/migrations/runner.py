@@ -0,0 +1,140 @@
+from contextlib import contextmanager
+
+from sqlalchemy import Column, DateTime, Integer, MetaData, String, Table, func, insert, select, text
+
+metadata = MetaData()
+
+# Versões aplicadas ao banco; cada migração é registrada na mesma transação em que é executada
+schema_migrations = Table(
+    'schema_migrations',
+    metadata,
+    Column('versao', Integer, primary_key=True),
+    Column('nome', String, nullable=False),
+    Column('aplicada_em', DateTime(timezone=True), server_default=func.now(), nullable=False),
+)
+
+# Chave do advisory lock do PostgreSQL que serializa execuções simultâneas das migrações
+MIGRATION_LOCK_KEY = 726100
+
+
+class Migration:
+    """A versioned change to the database schema.
+
+    Every migration must be idempotent: it checks what already exists before changing
+    anything, so it can run on a database created by any earlier version of the
+    application, including one where part of the change was made by hand.
+
+    Attributes:
+        versao (int): The version, applied in ascending order.
+        nome (str): A short name for the change.
+        upgrade (callable): Applies the change; receives the connection, inside a transaction.
+    """
+
+    def __init__(self, versao: int, nome: str, upgrade):
+        self.versao = versao
+        self.nome = nome
+        self.upgrade = upgrade
+
+
+def applied_versions(connection):
+    """Get the versions already applied to the database.
+
+    Args:
+        connection (Connection): The database connection.
+
+    Returns:
+        set[int]: The applied versions.
+    """
+    schema_migrations.create(connection, checkfirst=True)
+    return set(connection.scalars(select(schema_migrations.c.versao)))
+
+
+def pending_migrations(connection, migrations: list, target: int = None):
+    """Get the migrations not applied yet, in order.
+
+    Args:
+        connection (Connection): The database connection.
+        migrations (list[Migration]): The known migrations.
+        target (int): The last version to include; None includes every migration.
+
+    Returns:
+        list[Migration]: The pending migrations.
+    """
+    applied = applied_versions(connection)
+    return [
+        pending
+        for pending in sorted(migrations, key=lambda known: known.versao)
+        if pending.versao not in applied and (target is None or pending.versao <= target)
+    ]
+
+
+@contextmanager
+def migration_lock(engine):
+    """Hold a lock that keeps other processes from migrating the same database.
+
+    On PostgreSQL it is a session advisory lock held on a dedicated connection; other
+    databases rely on their own write locks.
+
+    Args:
+        engine (Engine): The database engine.
+    """
+    if engine.dialect.name != 'postgresql':
+        yield
+        return
+    with engine.connect() as connection:
+        connection.execute(text('SELECT pg_advisory_lock(:key)'), {'key': MIGRATION_LOCK_KEY})
+        connection.commit()
+        try:
+            yield
+        finally:
+            connection.execute(text('SELECT pg_advisory_unlock(:key)'), {'key': MIGRATION_LOCK_KEY})
+            connection.commit()
+
+
+def migrate(engine, migrations: list, target: int = None, report=None):
+    """Apply the pending migrations, each in its own transaction.
+
+    Safe to run from several processes at once: the pending list is read again after
+    the lock is acquired, so a migration applied by another process is skipped.
+
+    Args:
+        engine (Engine): The database engine.
+        migrations (list[Migration]): The known migrations.
+        target (int): The last version to apply; None applies every migration.
+        report (callable): Called with each migration before it runs.
+
+    Returns:
+        list[Migration]: The migrations applied.
+    """
+    applied = []
+    with migration_lock(engine):
+        with engine.begin() as connection:
+            pending = pending_migrations(connection, migrations, target)
+        for pending_migration in pending:
+            if report is not None:
+                report(pending_migration)
+            with engine.begin() as connection:
+                pending_migration.upgrade(connection)
+                connection.execute(
+                    insert(schema_migrations).values(versao=pending_migration.versao, nome=pending_migration.nome)
+                )
+            applied.append(pending_migration)
+    return applied
+
+
+def migration_status(engine, migrations: list):
+    """Get the state of every known migration.
+
+    Args:
+        engine (Engine): The database engine.
+        migrations (list[Migration]): The known migrations.
+
+    Returns:
+        list[dict]: The version, name and whether each migration was applied, in order.
+    """
+    with engine.begin() as connection:
+        applied = applied_versions(connection)
+    return [
+        {'versao': known.versao, 'nome': known.nome, 'aplicada': known.versao in applied}
+        for known in sorted(migrations, key=lambda known: known.versao)
+    ]
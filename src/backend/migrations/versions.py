@@ -0,0 +1,417 @@
+from controller import partitions
+from controller.summary import SUMMARY_SHARDS
+from migrations.runner import Migration
+from sqlalchemy import (
+    Boolean,
+    CheckConstraint,
+    Column,
+    Date,
+    DateTime,
+    Enum,
+    Float,
+    ForeignKey,
+    Index,
+    Integer,
+    MetaData,
+    PrimaryKeyConstraint,
+    String,
+    Table,
+    false,
+    func,
+    inspect,
+    text,
+)
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.schema import CreateColumn
+
+# As definições abaixo são cópias congeladas do esquema na versão de cada migração; nunca importe os modelos aqui,
+# pois eles descrevem o esquema atual e mudariam o que uma migração já publicada cria
+UOM_TYPES = ('LITRO', 'METRO', 'QUILOGRAMA', 'METRO_CUBICO', 'QUANTIDADE')
+MOVEMENT_TYPES = ('ENTRADA', 'SAIDA')
+
+
+def has_column(connection, table: str, name: str):
+    """Check whether a table of the database has a column.
+
+    Args:
+        connection (Connection): The database connection.
+        table (str): The table name.
+        name (str): The column name.
+
+    Returns:
+        bool: True if the column exists.
+    """
+    return any(column['name'] == name for column in inspect(connection).get_columns(table))
+
+
+def add_column(connection, table: str, column: Column):
+    """Add a column, with its default and CHECK constraint, to a table of the database if it is missing.
+
+    Args:
+        connection (Connection): The database connection.
+        table (str): The table name.
+        column (Column): The column definition.
+    """
+    if has_column(connection, table, column.name):
+        return
+    Table(table, MetaData(), column)
+    definition = CreateColumn(column).compile(dialect=connection.dialect)
+    connection.execute(text(f'ALTER TABLE {table} ADD COLUMN {definition}'))
+
+
+def rebuild_sqlite_table(connection, table: Table):
+    """Recreate a SQLite table with a new definition, keeping its rows.
+
+    SQLite cannot change the default or the foreign keys of an existing column, so the
+    table is renamed, created again and filled from the old one.
+
+    Args:
+        connection (Connection): The database connection, inside a transaction.
+        table (Table): The new definition, with the same columns as the existing table.
+    """
+    old = f'{table.name}_old'
+    connection.execute(text(f'ALTER TABLE {table.name} RENAME TO {old}'))
+    # Os índices mantêm o nome ao renomear a tabela e seriam recriados com os mesmos nomes
+    for index in inspect(connection).get_indexes(old):
+        connection.execute(text(f'DROP INDEX {index["name"]}'))
+    table.create(connection)
+    columns = ', '.join(column.name for column in table.columns)
+    connection.execute(text(f'INSERT INTO {table.name} ({columns}) SELECT {columns} FROM {old}'))
+    connection.execute(text(f'DROP TABLE {old}'))
+
+
+def create_initial_tables(connection):
+    """Create the items and movement history tables as the first version of the application did.
+
+    Databases created before the migrations already have them and are left alone.
+
+    Args:
+        connection (Connection): The database connection, inside a transaction.
+    """
+    metadata = MetaData()
+    Table(
+        'items',
+        metadata,
+        Column('id', Integer, primary_key=True, index=True),
+        Column('produto', String, index=True, nullable=False),
+        Column('unidade_medida', Enum(*UOM_TYPES, name='uomtype'), nullable=False),
+        Column('custo_medio', Float, CheckConstraint('custo_medio >= 0', name='average_cost_positive')),
+        Column('valor_venda', Float, CheckConstraint('valor_venda >= 0', name='sale_value_positive')),
+        Column('estoque', Float, CheckConstraint('estoque >= 0', name='stock_positive'), nullable=False),
+    )
+    Table(
+        'stock_movements_history',
+        metadata,
+        Column('id', Integer, primary_key=True, index=True),
+        Column('data', DateTime(timezone=True), nullable=False),
+        Column('movimentacao', Enum(*MOVEMENT_TYPES, name='movementtype'), nullable=False),
+        Column('produto_id', Integer, ForeignKey('items.id'), nullable=False),
+        Column('quantidade', Float, CheckConstraint('quantidade > 0', name='quantity_greater_zero'), nullable=False),
+        Column(
+            'estoque_final', Float, CheckConstraint('estoque_final >= 0', name='final_stock_positive'), nullable=False
+        ),
+    )
+    metadata.create_all(connection, checkfirst=True)
+
+
+def add_history_default_and_cascade(connection):
+    """Default the movement date to the database time and delete the history of an item together with the item.
+
+    Args:
+        connection (Connection): The database connection, inside a transaction.
+    """
+    data = next(
+        column for column in inspect(connection).get_columns('stock_movements_history') if column['name'] == 'data'
+    )
+    cascades = all(
+        foreign_key['options'].get('ondelete') == 'CASCADE'
+        for foreign_key in inspect(connection).get_foreign_keys('stock_movements_history')
+        if foreign_key['referred_table'] == 'items'
+    )
+    if data['default'] is not None and cascades:
+        return
+    if connection.dialect.name == 'postgresql':
+        connection.execute(text('ALTER TABLE stock_movements_history ALTER COLUMN data SET DEFAULT now()'))
+        for foreign_key in inspect(connection).get_foreign_keys('stock_movements_history'):
+            if foreign_key['referred_table'] != 'items' or foreign_key['options'].get('ondelete') == 'CASCADE':
+                continue
+            connection.execute(text(f'ALTER TABLE stock_movements_history DROP CONSTRAINT {foreign_key["name"]}'))
+            connection.execute(
+                text(
+                    f'ALTER TABLE stock_movements_history ADD CONSTRAINT {foreign_key["name"]} '
+                    'FOREIGN KEY (produto_id) REFERENCES items (id) ON DELETE CASCADE'
+                )
+            )
+        return
+
+    metadata = MetaData()
+    Table('items', metadata, Column('id', Integer, primary_key=True))
+    history = Table(
+        'stock_movements_history',
+        metadata,
+        Column('id', Integer, primary_key=True, index=True),
+        Column('data', DateTime(timezone=True), server_default=func.now(), nullable=False),
+        Column('movimentacao', Enum(*MOVEMENT_TYPES, name='movementtype'), nullable=False),
+        Column('produto_id', Integer, ForeignKey('items.id', ondelete='CASCADE'), nullable=False),
+        Column('quantidade', Float, CheckConstraint('quantidade > 0', name='quantity_greater_zero'), nullable=False),
+        Column(
+            'estoque_final', Float, CheckConstraint('estoque_final >= 0', name='final_stock_positive'), nullable=False
+        ),
+    )
+    rebuild_sqlite_table(connection, history)
+
+
+def add_item_columns(connection):
+    """Add the archiving timestamp and the version of the items.
+
+    Args:
+        connection (Connection): The database connection, inside a transaction.
+    """
+    add_column(connection, 'items', Column('arquivado_em', DateTime(timezone=True), nullable=True))
+    add_column(connection, 'items', Column('versao', Integer, nullable=False, server_default='1'))
+
+
+def add_history_indexes(connection):
+    """Add the indexes of the paginated history and of the movements of a period.
+
+    Args:
+        connection (Connection): The database connection, inside a transaction.
+    """
+    history = Table(
+        'stock_movements_history',
+        MetaData(),
+        Column('id', Integer),
+        Column('data', DateTime(timezone=True)),
+        Column('produto_id', Integer),
+    )
+    Index('ix_stock_movements_history_produto_data_id', history.c.produto_id, history.c.data, history.c.id).create(
+        connection, checkfirst=True
+    )
+    Index('ix_stock_movements_history_data', history.c.data).create(connection, checkfirst=True)
+
+
+def create_summary_tables(connection):
+    """Create the summary tables of the reports and fill them from the existing data.
+
+    Args:
+        connection (Connection): The database connection, inside a transaction.
+    """
+    if inspect(connection).has_table('valuation_summary'):
+        return
+    metadata = MetaData()
+    Table(
+        'valuation_summary',
+        metadata,
+        Column('unidade_medida', Enum(*UOM_TYPES, name='uomtype'), primary_key=True),
+        Column('shard', Integer, primary_key=True),
+        Column('itens', Integer, nullable=False),
+        Column('estoque', Float, nullable=False),
+        Column('valor_estoque', Float, nullable=False),
+        Column('receita_potencial', Float, nullable=False),
+    )
+    Table(
+        'daily_movement_summary',
+        metadata,
+        Column('dia', Date, primary_key=True),
+        Column('movimentacao', Enum(*MOVEMENT_TYPES, name='movementtype'), primary_key=True),
+        Column('shard', Integer, primary_key=True),
+        Column('quantidade', Float, nullable=False),
+        Column('movimentos', Integer, nullable=False),
+    )
+    metadata.create_all(connection, checkfirst=True)
+    connection.execute(
+        text(
+            'INSERT INTO valuation_summary (unidade_medida, shard, itens, estoque, valor_estoque, receita_potencial) '
+            'SELECT unidade_medida, id % :shards, count(*), sum(estoque), sum(estoque * coalesce(custo_medio, 0)), '
+            'sum(estoque * coalesce(valor_venda, 0)) FROM items WHERE arquivado_em IS NULL '
+            'GROUP BY 1, 2'
+        ),
+        {'shards': SUMMARY_SHARDS},
+    )
+    connection.execute(
+        text(
+            'INSERT INTO daily_movement_summary (dia, movimentacao, shard, quantidade, movimentos) '
+            'SELECT date(data), movimentacao, produto_id % :shards, sum(quantidade), count(*) '
+            'FROM stock_movements_history GROUP BY 1, 2, 3'
+        ),
+        {'shards': SUMMARY_SHARDS},
+    )
+
+
+def create_snapshot_tables(connection):
+    """Create the stock snapshot tables.
+
+    Args:
+        connection (Connection): The database connection, inside a transaction.
+    """
+    metadata = MetaData()
+    Table('items', metadata, Column('id', Integer, primary_key=True))
+    snapshots = Table(
+        'stock_snapshots',
+        metadata,
+        Column('id', Integer, primary_key=True, index=True),
+        Column('data', DateTime(timezone=True), nullable=False, index=True),
+        Column('itens', Integer, nullable=False),
+    )
+    snapshot_items = Table(
+        'stock_snapshot_items',
+        metadata,
+        Column('snapshot_id', Integer, ForeignKey('stock_snapshots.id', ondelete='CASCADE'), primary_key=True),
+        Column('produto_id', Integer, ForeignKey('items.id', ondelete='CASCADE'), primary_key=True),
+        Column('estoque', Float, nullable=False),
+    )
+    metadata.create_all(connection, tables=[snapshots, snapshot_items], checkfirst=True)
+
+
+def add_movement_unit_cost(connection):
+    """Add the unit cost of the inbound movements.
+
+    Args:
+        connection (Connection): The database connection, inside a transaction.
+    """
+    add_column(
+        connection,
+        'stock_movements_history',
+        Column(
+            'custo_unitario', Float, CheckConstraint('custo_unitario >= 0', name='unit_cost_positive'), nullable=True
+        ),
+    )
+
+
+def add_product_search(connection):
+    """Add the trigram index of the product search on PostgreSQL and the search generation counter.
+
+    Creating the pg_trgm extension requires permission to do so.
+
+    Args:
+        connection (Connection): The database connection, inside a transaction.
+    """
+    if connection.dialect.name == 'postgresql':
+        connection.execute(text('CREATE EXTENSION IF NOT EXISTS pg_trgm'))
+        items = Table('items', MetaData(), Column('produto', String))
+        Index(
+            'ix_items_produto_trgm',
+            items.c.produto,
+            postgresql_using='gist',
+            postgresql_ops={'produto': 'gist_trgm_ops'},
+        ).create(connection, checkfirst=True)
+    if inspect(connection).has_table('search_generation'):
+        return
+    Table(
+        'search_generation',
+        MetaData(),
+        Column('id', Integer, primary_key=True, autoincrement=False),
+        Column('geracao', Integer, nullable=False),
+    ).create(connection)
+    connection.execute(text('INSERT INTO search_generation (id, geracao) VALUES (1, 0)'))
+
+
+def partition_history(connection):
+    """Convert the movement history of a PostgreSQL database into a table partitioned by month on ``data``.
+
+    PostgreSQL requires the partition key in the primary key, so the table gets
+    ``PRIMARY KEY (id, data)``; ``id`` stays unique because it comes from a single
+    sequence. Copies every movement in one transaction, during which the history is
+    locked.
+
+    Args:
+        connection (Connection): The database connection, inside a transaction.
+    """
+    if not partitions.supports_partitioning(connection):
+        return
+    metadata = MetaData()
+    Table('items', metadata, Column('id', Integer, primary_key=True))
+    history = Table(
+        'stock_movements_history',
+        metadata,
+        Column('id', Integer, autoincrement=True, nullable=False),
+        Column('data', DateTime(timezone=True), server_default=func.now(), nullable=False),
+        Column(
+            'movimentacao', postgresql.ENUM(*MOVEMENT_TYPES, name='movementtype', create_type=False), nullable=False
+        ),
+        Column('produto_id', Integer, ForeignKey('items.id', ondelete='CASCADE'), nullable=False),
+        Column('quantidade', Float, CheckConstraint('quantidade > 0', name='quantity_greater_zero'), nullable=False),
+        Column(
+            'estoque_final', Float, CheckConstraint('estoque_final >= 0', name='final_stock_positive'), nullable=False
+        ),
+        Column(
+            'custo_unitario', Float, CheckConstraint('custo_unitario >= 0', name='unit_cost_positive'), nullable=True
+        ),
+        PrimaryKeyConstraint('id', 'data'),
+        Index('ix_stock_movements_history_id', 'id'),
+        Index('ix_stock_movements_history_produto_data_id', 'produto_id', 'data', 'id'),
+        Index('ix_stock_movements_history_data', 'data'),
+        postgresql_partition_by='RANGE (data)',
+    )
+    partitions.convert_to_partitioned(connection, history)
+
+
+def add_locations(connection):
+    """Add the stock locations, the stock of each item by location and the location of the movements.
+
+    The default location is created with the table and receives the stock of every
+    existing item and every existing movement. Adding the history columns with
+    constant defaults does not rewrite the history; on PostgreSQL the new foreign key
+    is validated with one scan of the history.
+
+    Args:
+        connection (Connection): The database connection, inside a transaction.
+    """
+    metadata = MetaData()
+    Table('items', metadata, Column('id', Integer, primary_key=True))
+    locations = Table(
+        'locations',
+        metadata,
+        Column('id', Integer, primary_key=True, index=True),
+        Column('nome', String, unique=True, nullable=False),
+    )
+    item_stocks = Table(
+        'item_stocks',
+        metadata,
+        Column('produto_id', Integer, ForeignKey('items.id', ondelete='CASCADE'), primary_key=True),
+        Column('local_id', Integer, ForeignKey('locations.id'), primary_key=True),
+        Column('estoque', Float, CheckConstraint('estoque >= 0', name='stock_positive'), nullable=False),
+        Index('ix_item_stocks_local_id_produto_id_estoque', 'local_id', 'produto_id', 'estoque'),
+    )
+    if not inspect(connection).has_table('locations'):
+        locations.create(connection)
+        connection.execute(text("INSERT INTO locations (id, nome) VALUES (1, 'Principal')"))
+        if connection.dialect.name == 'postgresql':
+            # O local padrão é inserido com ID explícito; a sequência continua depois dele
+            connection.execute(text("SELECT setval(pg_get_serial_sequence('locations', 'id'), 1)"))
+
+    add_column(connection, 'stock_movements_history', Column('local_id', Integer, nullable=False, server_default='1'))
+    add_column(
+        connection, 'stock_movements_history', Column('transferencia', Boolean, nullable=False, server_default=false())
+    )
+    # O SQLite não aplica chaves estrangeiras nesta aplicação; só o PostgreSQL recebe a constraint
+    if connection.dialect.name == 'postgresql' and not any(
+        foreign_key['referred_table'] == 'locations'
+        for foreign_key in inspect(connection).get_foreign_keys('stock_movements_history')
+    ):
+        connection.execute(
+            text(
+                'ALTER TABLE stock_movements_history ADD CONSTRAINT stock_movements_history_local_id_fkey '
+                'FOREIGN KEY (local_id) REFERENCES locations (id)'
+            )
+        )
+
+    if not inspect(connection).has_table('item_stocks'):
+        item_stocks.create(connection)
+        connection.execute(
+            text('INSERT INTO item_stocks (produto_id, local_id, estoque) SELECT id, 1, estoque FROM items')
+        )
+
+
+MIGRATIONS = [
+    Migration(1, 'tabelas_iniciais', create_initial_tables),
+    Migration(2, 'data_padrao_e_cascata_do_historico', add_history_default_and_cascade),
+    Migration(3, 'arquivamento_e_versao_dos_itens', add_item_columns),
+    Migration(4, 'indices_do_historico', add_history_indexes),
+    Migration(5, 'tabelas_de_resumo', create_summary_tables),
+    Migration(6, 'snapshots_do_estoque', create_snapshot_tables),
+    Migration(7, 'custo_unitario_das_movimentacoes', add_movement_unit_cost),
+    Migration(8, 'busca_por_trigramas', add_product_search),
+    Migration(9, 'particionamento_do_historico', partition_history),
+    Migration(10, 'estoque_por_local', add_locations),
+]
@@ -1,14 +1,174 @@
 import os
+import uuid
+from contextlib import asynccontextmanager
 
+from fastapi.concurrency import run_in_threadpool
+from monitoring.pool import PoolMetrics, instrumented_pool
+from monitoring.queries import QueryMetrics, instrument_engine
 from sqlalchemy import create_engine
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.compiler import compiles
 from sqlalchemy.orm import DeclarativeBase, sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+from sqlalchemy.sql.functions import now
 
 DATABASE_URL = os.getenv('DATABASE_URL')
 if not DATABASE_URL:
     raise ValueError('A variável de ambiente DATABASE_URL não está definida')
 
-engine = create_engine(DATABASE_URL)
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+# Modo de acesso ao banco: 'sync' (psycopg2 no threadpool) ou 'async' (asyncpg no event loop)
+DATABASE_MODE = os.getenv('DATABASE_MODE', 'sync').lower()
+if DATABASE_MODE not in ('sync', 'async'):
+    raise ValueError("A variável de ambiente DATABASE_MODE deve ser 'sync' ou 'async'")
+
+
+def env_int(name: str, default: int):
+    """Read an integer from an environment variable.
+
+    Args:
+        name (str): The variable name.
+        default (int): The value used when the variable is not set.
+
+    Returns:
+        int: The variable value.
+
+    Raises:
+        ValueError: If the variable is not a valid integer.
+    """
+    value = os.getenv(name)
+    if value is None or value == '':
+        return default
+    try:
+        return int(value)
+    except ValueError:
+        raise ValueError(f'A variável de ambiente {name} deve ser um número inteiro')
+
+
+def env_bool(name: str, default: bool):
+    """Read a boolean from an environment variable.
+
+    Args:
+        name (str): The variable name.
+        default (bool): The value used when the variable is not set.
+
+    Returns:
+        bool: True for '1', 'true', 'yes' or 'on', False otherwise.
+    """
+    value = os.getenv(name)
+    if value is None or value == '':
+        return default
+    return value.strip().lower() in ('1', 'true', 'yes', 'on')
+
+
+# Configuração do pool de conexões
+DB_POOL_SIZE = env_int('DB_POOL_SIZE', 5)
+DB_MAX_OVERFLOW = env_int('DB_MAX_OVERFLOW', 10)
+DB_POOL_TIMEOUT = env_int('DB_POOL_TIMEOUT', 30)
+DB_POOL_RECYCLE = env_int('DB_POOL_RECYCLE', -1)
+DB_POOL_PRE_PING = env_bool('DB_POOL_PRE_PING', False)
+# Compatibilidade com PgBouncer em modo transaction: desativa prepared statements do asyncpg
+DB_PGBOUNCER = env_bool('DB_PGBOUNCER', False)
+# Consultas a partir desta duração (ms) são registradas no log com os parâmetros; 0 desativa
+SLOW_QUERY_MS = env_int('SLOW_QUERY_MS', 200)
+
+ASYNC_DRIVERS = {
+    'postgresql': 'postgresql+asyncpg',
+    'sqlite': 'sqlite+aiosqlite',
+}
+
+
+def to_async_url(url: str):
+    """Convert a synchronous database URL to its async driver equivalent.
+
+    Args:
+        url (str): The synchronous database URL.
+
+    Returns:
+        str: The database URL using an async driver.
+    """
+    parsed = make_url(url)
+    drivername = ASYNC_DRIVERS.get(parsed.get_backend_name(), parsed.drivername)
+    return parsed.set(drivername=drivername).render_as_string(hide_password=False)
+
+
+def pool_options(pool_class):
+    """Get the engine keyword arguments for the configured connection pool.
+
+    Args:
+        pool_class (type): The queue pool class to instrument.
+
+    Returns:
+        dict: The pool keyword arguments for ``create_engine``.
+    """
+    return {
+        'poolclass': instrumented_pool(pool_class, PoolMetrics()),
+        'pool_size': DB_POOL_SIZE,
+        'max_overflow': DB_MAX_OVERFLOW,
+        'pool_timeout': DB_POOL_TIMEOUT,
+        'pool_recycle': DB_POOL_RECYCLE,
+        'pool_pre_ping': DB_POOL_PRE_PING,
+    }
+
+
+def pgbouncer_connect_args(url: str):
+    """Get the driver arguments that disable prepared statements for PgBouncer.
+
+    Args:
+        url (str): The database URL.
+
+    Returns:
+        dict: The connect arguments, empty when not needed.
+    """
+    if not DB_PGBOUNCER or make_url(url).get_driver_name() != 'asyncpg':
+        return {}
+    return {
+        'statement_cache_size': 0,
+        'prepared_statement_cache_size': 0,
+        'prepared_statement_name_func': lambda: f'__asyncpg_{uuid.uuid4()}__',
+    }
+
+
+engine = create_engine(DATABASE_URL, **pool_options(QueuePool))
+# Os handlers serializam os objetos fora da sessão, então eles não expiram no commit
+SessionLocal = sessionmaker(autocommit=False, autoflush=False, expire_on_commit=False, bind=engine)
+
+async_engine = None
+AsyncSessionLocal = None
+if DATABASE_MODE == 'async':
+    from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+    ASYNC_DATABASE_URL = os.getenv('ASYNC_DATABASE_URL') or to_async_url(DATABASE_URL)
+    async_engine = create_async_engine(
+        ASYNC_DATABASE_URL,
+        connect_args=pgbouncer_connect_args(ASYNC_DATABASE_URL),
+        **pool_options(AsyncAdaptedQueuePool),
+    )
+    AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+
+# Engine ativo, cujo pool é exposto nas estatísticas
+active_engine = async_engine.sync_engine if async_engine is not None else engine
+
+# Tempo e quantidade das instruções SQL de ambos os engines, expostos em /metrics
+query_metrics = QueryMetrics()
+for instrumented in {engine, active_engine}:
+    instrument_engine(instrumented, query_metrics, SLOW_QUERY_MS / 1000)
+
+
+@compiles(now, 'sqlite')
+def sqlite_now(element, compiler, **kw):
+    """Render ``func.now()`` on SQLite in the same text format SQLAlchemy uses for DateTime.
+
+    The default CURRENT_TIMESTAMP has no fractional seconds, so values written by the
+    database would not compare correctly with values bound by SQLAlchemy.
+
+    Args:
+        element (now): The function element.
+        compiler (SQLCompiler): The SQL compiler.
+
+    Returns:
+        str: The SQLite expression for the current timestamp.
+    """
+    return "strftime('%Y-%m-%d %H:%M:%f000', 'now')"
 
 
 class Base(DeclarativeBase):
@@ -17,14 +177,75 @@ class Base(DeclarativeBase):
     pass
 
 
-def get_db():
-    """Get a new database session.
+class Database:
+    """Database session of the configured mode, used by the route handlers.
+
+    The handlers are the same in both modes: they call the synchronous functions of
+    ``controller.crud`` through :meth:`run`, which never blocks the event loop.
+
+    Attributes:
+        session (Session | AsyncSession): The database session.
+    """
+
+    def __init__(self, session):
+        self.session = session
+
+    async def run(self, function, *args, **kwargs):
+        """Run a function that takes a synchronous session as its first argument.
+
+        Args:
+            function (Callable): The function, such as one of ``controller.crud``.
+            *args: The remaining positional arguments of the function.
+            **kwargs: The keyword arguments of the function.
+
+        Returns:
+            The value returned by the function.
+        """
+        raise NotImplementedError
+
+
+class SyncDatabase(Database):
+    """Database session of the sync mode: each call runs with psycopg2 in the threadpool."""
+
+    async def run(self, function, *args, **kwargs):
+        """Run the function in the threadpool."""
+        return await run_in_threadpool(function, self.session, *args, **kwargs)
+
+
+class AsyncDatabase(Database):
+    """Database session of the async mode: each call runs through ``AsyncSession.run_sync``.
+
+    The queries are the same as in sync mode, but the I/O is done by asyncpg on the event loop.
+    """
+
+    async def run(self, function, *args, **kwargs):
+        """Run the function in the session's greenlet."""
+        return await self.session.run_sync(function, *args, **kwargs)
+
+
+@asynccontextmanager
+async def open_database():
+    """Open a database session of the configured mode, for requests and background tasks.
 
     Yields:
-        Session: A new database session.
+        Database: A new database session.
     """
-    db = SessionLocal()
+    if DATABASE_MODE == 'async':
+        async with AsyncSessionLocal() as session:
+            yield AsyncDatabase(session)
+        return
+    session = SessionLocal()
     try:
-        yield db
+        yield SyncDatabase(session)
     finally:
-        db.close()
+        await run_in_threadpool(session.close)
+
+
+async def get_database():
+    """Get a new database session of the configured mode.
+
+    Yields:
+        Database: A new database session.
+    """
+    async with open_database() as database:
+        yield database
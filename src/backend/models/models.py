@@ -1,9 +1,28 @@
 import enum
 
 from models.database import Base
-from sqlalchemy import CheckConstraint, Column, DateTime, Enum, Float, ForeignKey, Integer, String
+from sqlalchemy import (
+    Boolean,
+    CheckConstraint,
+    Column,
+    Date,
+    DateTime,
+    Enum,
+    Float,
+    ForeignKey,
+    Index,
+    Integer,
+    String,
+    false,
+    func,
+)
 from sqlalchemy.orm import relationship
 
+# Local criado pela migração dos locais; recebe o estoque dos itens anteriores aos locais
+# e as movimentações em que nenhum local é informado
+DEFAULT_LOCATION_ID = 1
+DEFAULT_LOCATION_NAME = 'Principal'
+
 
 class UoMType(enum.Enum):
     """Enumeration for unit of measure types."""
@@ -32,9 +51,20 @@ class Item(Base):
         custo_medio (int): The average cost.
         valor_venda (int): The sale value.
         estoque (int): The stock quantity.
+        arquivado_em (DateTime): When the item was archived for deletion, or None if active.
+        versao (int): The item version, incremented on every change.
     """
 
     __tablename__ = 'items'
+    # Índice de trigramas do PostgreSQL para a busca por nome: atende ILIKE '%termo%', similaridade e ordenação por distância
+    __table_args__ = (
+        Index(
+            'ix_items_produto_trgm',
+            'produto',
+            postgresql_using='gist',
+            postgresql_ops={'produto': 'gist_trgm_ops'},
+        ).ddl_if(dialect='postgresql'),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     produto = Column(String, index=True, nullable=False)
@@ -48,6 +78,11 @@ class Item(Base):
         CheckConstraint('valor_venda >= 0', name='sale_value_positive'),
     )
     estoque = Column(Float, CheckConstraint('estoque >= 0', name='stock_positive'), nullable=False)
+    arquivado_em = Column(DateTime(timezone=True), nullable=True)
+    versao = Column(Integer, nullable=False, default=1, server_default='1')
+
+    # O ORM incrementa a versão em cada UPDATE; atualizações em massa devem incrementá-la explicitamente
+    __mapper_args__ = {'version_id_col': versao}
 
     def to_dict(self):
         """Convert the item to a dictionary.
@@ -62,9 +97,55 @@ class Item(Base):
             'custo_medio': self.custo_medio,
             'valor_venda': self.valor_venda,
             'estoque': self.estoque,
+            'versao': self.versao,
         }
 
 
+class Location(Base):
+    """Model for stock locations, such as warehouses.
+
+    Attributes:
+        id (int): The location ID.
+        nome (str): The location name.
+    """
+
+    __tablename__ = 'locations'
+
+    id = Column(Integer, primary_key=True, index=True)
+    nome = Column(String, unique=True, nullable=False)
+
+    def to_dict(self):
+        """Convert the location to a dictionary.
+
+        Returns:
+            dict: The location as a dictionary.
+        """
+        return {'id': self.id, 'nome': self.nome}
+
+
+class ItemStock(Base):
+    """Model for the stock of an item at a location.
+
+    ``Item.estoque`` is the sum of the stock of the item at every location. Movements
+    change the row of their location, so movements and transfers in different
+    locations never update the same stock row.
+
+    Attributes:
+        produto_id (int): The product ID.
+        local_id (int): The location ID.
+        estoque (float): The stock quantity at the location.
+    """
+
+    __tablename__ = 'item_stocks'
+    # A chave primária atende o estoque de um item em todos os locais; este índice atende o estoque de um local
+    # e os totais por local sem ler a tabela
+    __table_args__ = (Index('ix_item_stocks_local_id_produto_id_estoque', 'local_id', 'produto_id', 'estoque'),)
+
+    produto_id = Column(Integer, ForeignKey('items.id', ondelete='CASCADE'), primary_key=True)
+    local_id = Column(Integer, ForeignKey('locations.id'), primary_key=True)
+    estoque = Column(Float, CheckConstraint('estoque >= 0', name='stock_positive'), nullable=False)
+
+
 class StockMovementHistory(Base):
     """Model for stock movement history.
 
@@ -73,23 +154,38 @@ class StockMovementHistory(Base):
         data (DateTime): The date of the movement.
         movimentacao (Enum): The type of movement.
         produto_id (int): The product ID.
+        local_id (int): The location where the stock moved.
         quantidade (int): The quantity moved.
-        estoque_final (int): The final stock quantity.
+        estoque_final (int): The final stock quantity at the location.
+        custo_unitario (float): The unit cost of an ENTRADA, or None if not informed.
+        transferencia (bool): Whether the movement is a leg of a transfer between locations.
         produto (relationship): The related product.
     """
 
     __tablename__ = 'stock_movements_history'
+    # Atende o histórico paginado por produto, filtrado por data e ordenado por (data, id)
+    # O índice por data atende a reconstrução do estoque em uma data, que lê todas as movimentações de um intervalo
+    __table_args__ = (
+        Index('ix_stock_movements_history_produto_data_id', 'produto_id', 'data', 'id'),
+        Index('ix_stock_movements_history_data', 'data'),
+    )
+    # Busca valores gerados pelo banco (id, data) via RETURNING no próprio INSERT
+    __mapper_args__ = {'eager_defaults': True}
 
     id = Column(Integer, primary_key=True, index=True)
-    data = Column(DateTime(timezone=True), nullable=False)
+    data = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
     movimentacao = Column(Enum(MovementType), nullable=False)
-    produto_id = Column(Integer, ForeignKey('items.id'), nullable=False)
+    produto_id = Column(Integer, ForeignKey('items.id', ondelete='CASCADE'), nullable=False)
+    local_id = Column(Integer, ForeignKey('locations.id'), nullable=False, server_default=str(DEFAULT_LOCATION_ID))
     quantidade = Column(Float, CheckConstraint('quantidade > 0', name='quantity_greater_zero'), nullable=False)
     estoque_final = Column(
         Float,
         CheckConstraint('estoque_final >= 0', name='final_stock_positive'),
         nullable=False,
     )
+    custo_unitario = Column(Float, CheckConstraint('custo_unitario >= 0', name='unit_cost_positive'), nullable=True)
+    # As transferências não alteram o estoque total e ficam fora dos resumos diários de entradas e saídas
+    transferencia = Column(Boolean, nullable=False, server_default=false())
 
     produto = relationship('Item')
 
@@ -104,6 +200,100 @@ class StockMovementHistory(Base):
             'data': self.data,
             'movimentacao': self.movimentacao.value,
             'produto_id': self.produto_id,
+            'local_id': self.local_id,
             'quantidade': self.quantidade,
             'estoque_final': self.estoque_final,
+            'custo_unitario': self.custo_unitario,
+            'transferencia': self.transferencia,
         }
+
+
+class ValuationSummary(Base):
+    """Model for the stock valuation of active items, maintained incrementally on every write.
+
+    The totals of each unit of measure are split in shards by item ID, so concurrent
+    writes on different items rarely update the same row; reports sum the shards.
+
+    Attributes:
+        unidade_medida (Enum): The unit of measure.
+        shard (int): The shard, ``item_id % SUMMARY_SHARDS``.
+        itens (int): The number of items.
+        estoque (float): The total stock quantity.
+        valor_estoque (float): The total of ``estoque * custo_medio``.
+        receita_potencial (float): The total of ``estoque * valor_venda``.
+    """
+
+    __tablename__ = 'valuation_summary'
+
+    unidade_medida = Column(Enum(UoMType), primary_key=True)
+    shard = Column(Integer, primary_key=True)
+    itens = Column(Integer, nullable=False, default=0)
+    estoque = Column(Float, nullable=False, default=0)
+    valor_estoque = Column(Float, nullable=False, default=0)
+    receita_potencial = Column(Float, nullable=False, default=0)
+
+
+class DailyMovementSummary(Base):
+    """Model for the daily movement volumes, maintained incrementally on every movement.
+
+    Attributes:
+        dia (Date): The day of the movements.
+        movimentacao (Enum): The type of movement.
+        shard (int): The shard, ``produto_id % SUMMARY_SHARDS``.
+        quantidade (float): The total quantity moved.
+        movimentos (int): The number of movements.
+    """
+
+    __tablename__ = 'daily_movement_summary'
+
+    dia = Column(Date, primary_key=True)
+    movimentacao = Column(Enum(MovementType), primary_key=True)
+    shard = Column(Integer, primary_key=True)
+    quantidade = Column(Float, nullable=False, default=0)
+    movimentos = Column(Integer, nullable=False, default=0)
+
+
+class StockSnapshot(Base):
+    """Model for a checkpoint of the stock of every active item.
+
+    Attributes:
+        id (int): The snapshot ID.
+        data (DateTime): The moment the stock was captured; it includes every movement up to it.
+        itens (int): The number of items in the snapshot.
+    """
+
+    __tablename__ = 'stock_snapshots'
+
+    id = Column(Integer, primary_key=True, index=True)
+    data = Column(DateTime(timezone=True), nullable=False, index=True)
+    itens = Column(Integer, nullable=False, default=0)
+
+
+class StockSnapshotItem(Base):
+    """Model for the stock of an item in a snapshot.
+
+    Attributes:
+        snapshot_id (int): The snapshot ID.
+        produto_id (int): The product ID.
+        estoque (float): The stock quantity at the moment of the snapshot.
+    """
+
+    __tablename__ = 'stock_snapshot_items'
+
+    snapshot_id = Column(Integer, ForeignKey('stock_snapshots.id', ondelete='CASCADE'), primary_key=True)
+    produto_id = Column(Integer, ForeignKey('items.id', ondelete='CASCADE'), primary_key=True)
+    estoque = Column(Float, nullable=False)
+
+
+class SearchGeneration(Base):
+    """Model for the counter of product name changes, a single row read by the in-memory search index.
+
+    Attributes:
+        id (int): The row ID, always 1.
+        geracao (int): Incremented in the same transaction as every write that changes the active product names.
+    """
+
+    __tablename__ = 'search_generation'
+
+    id = Column(Integer, primary_key=True)
+    geracao = Column(Integer, nullable=False, default=0)
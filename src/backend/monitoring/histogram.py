@@ -0,0 +1,54 @@
+import threading
+
+# Limites (em segundos) dos buckets padrão, de 1 ms a 10 s
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class Histogram:
+    """Thread-safe cumulative histogram with fixed buckets.
+
+    Attributes:
+        buckets (tuple): The upper bounds of the buckets, in ascending order.
+        counts (list): The number of observations per bucket (last one is +Inf).
+        total (float): The sum of all observed values.
+        count (int): The number of observations.
+    """
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.total = 0.0
+        self.count = 0
+        self.lock = threading.Lock()
+
+    def observe(self, value: float):
+        """Record an observation.
+
+        Args:
+            value (float): The observed value.
+        """
+        index = len(self.buckets)
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                index = i
+                break
+        with self.lock:
+            self.counts[index] += 1
+            self.total += value
+            self.count += 1
+
+    def snapshot(self):
+        """Get the current state of the histogram.
+
+        Returns:
+            dict: The cumulative count per bucket upper bound, the sum and the count.
+        """
+        with self.lock:
+            counts = list(self.counts)
+            total, count = self.total, self.count
+
+        cumulative, running = {}, 0
+        for bound, bucket_count in zip([*map(str, self.buckets), '+Inf'], counts):
+            running += bucket_count
+            cumulative[bound] = running
+        return {'buckets': cumulative, 'sum': total, 'count': count}
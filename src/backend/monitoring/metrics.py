@@ -0,0 +1,307 @@
+import logging
+import threading
+import time
+from collections import defaultdict
+
+from monitoring.histogram import Histogram
+from monitoring.queries import finish_request, start_request
+
+logger = logging.getLogger(__name__)
+
+# Buckets da quantidade de instruções SQL por requisição
+STATEMENT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100, 200)
+UNMATCHED_ROUTE = 'unmatched'
+
+
+class RouteMetrics:
+    """Metrics of the requests to a route.
+
+    Attributes:
+        latency (Histogram): The time to send the complete response, in seconds.
+        statements (Histogram): The number of SQL statements per request.
+        db_time (Histogram): The time spent in the database per request, in seconds.
+        responses (defaultdict): The number of responses per status code.
+    """
+
+    def __init__(self):
+        self.latency = Histogram()
+        self.statements = Histogram(STATEMENT_BUCKETS)
+        self.db_time = Histogram()
+        self.responses = defaultdict(int)
+
+
+class RequestMetrics:
+    """Metrics of every route, keyed by method and route template.
+
+    Attributes:
+        routes (dict): The metrics of each ``(method, route)``.
+    """
+
+    def __init__(self):
+        self.routes = {}
+        self.lock = threading.Lock()
+
+    def route(self, method: str, route: str):
+        """Get the metrics of a route, creating them on first use.
+
+        Args:
+            method (str): The HTTP method.
+            route (str): The route template, such as ``/api/items/{item_id}``.
+
+        Returns:
+            RouteMetrics: The route metrics.
+        """
+        key = (method, route)
+        metrics = self.routes.get(key)
+        if metrics is None:
+            with self.lock:
+                metrics = self.routes.setdefault(key, RouteMetrics())
+        return metrics
+
+    def count_response(self, metrics: RouteMetrics, status: int):
+        """Count a response of a route.
+
+        Args:
+            metrics (RouteMetrics): The route metrics.
+            status (int): The response status code.
+        """
+        with self.lock:
+            metrics.responses[status] += 1
+
+    def snapshot(self):
+        """Get the metrics of every route, ordered by method and route.
+
+        Returns:
+            list[tuple]: The method, route, metrics and a copy of the response counts of each route.
+        """
+        with self.lock:
+            return [
+                (method, route, metrics, dict(metrics.responses))
+                for (method, route), metrics in sorted(self.routes.items(), key=lambda entry: entry[0])
+            ]
+
+
+class MetricsMiddleware:
+    """ASGI middleware that measures every HTTP request.
+
+    Records the latency until the last byte of the response, including streamed
+    bodies, and the number and duration of the SQL statements issued meanwhile.
+    Requests issuing more than ``statements_warning`` statements are logged, which
+    points out N+1 query patterns.
+
+    Attributes:
+        app (ASGIApp): The wrapped application.
+        metrics (RequestMetrics): The metrics to record into.
+        statements_warning (int): The number of statements from which a request is logged; 0 disables the log.
+    """
+
+    def __init__(self, app, metrics: RequestMetrics, statements_warning: int = 0):
+        self.app = app
+        self.metrics = metrics
+        self.statements_warning = statements_warning
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            await self.app(scope, receive, send)
+            return
+
+        started = time.perf_counter()
+        stats, token = start_request()
+        status = 500
+        recorded = False
+
+        def record():
+            nonlocal recorded
+            if recorded:
+                return
+            recorded = True
+            # O roteador do FastAPI guarda a rota encontrada no escopo
+            route = getattr(scope.get('route'), 'path', UNMATCHED_ROUTE)
+            metrics = self.metrics.route(scope['method'], route)
+            metrics.latency.observe(time.perf_counter() - started)
+            metrics.statements.observe(stats.statements)
+            metrics.db_time.observe(stats.duration)
+            self.metrics.count_response(metrics, status)
+            if 0 < self.statements_warning <= stats.statements:
+                logger.warning(
+                    'Requisição com %d instruções SQL (%.1f ms no banco): %s %s',
+                    stats.statements,
+                    stats.duration * 1000,
+                    scope['method'],
+                    route,
+                )
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message['type'] == 'http.response.start':
+                status = message['status']
+            await send(message)
+            if message['type'] == 'http.response.body' and not message.get('more_body', False):
+                record()
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            record()
+            finish_request(token)
+
+
+def escape_label(value):
+    """Escape a label value for the Prometheus text format.
+
+    Args:
+        value: The label value.
+
+    Returns:
+        str: The escaped value.
+    """
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def format_labels(labels: dict):
+    """Format labels for the Prometheus text format.
+
+    Args:
+        labels (dict): The label names and values.
+
+    Returns:
+        str: The labels between braces, or an empty string without labels.
+    """
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{name}="{escape_label(value)}"' for name, value in labels.items()) + '}'
+
+
+class PrometheusWriter:
+    """Writer of metrics in the Prometheus text exposition format.
+
+    Attributes:
+        lines (list): The lines written so far.
+    """
+
+    def __init__(self):
+        self.lines = []
+        self.declared = set()
+
+    def declare(self, name: str, kind: str, help_text: str):
+        """Write the HELP and TYPE lines of a metric once.
+
+        Args:
+            name (str): The metric name.
+            kind (str): The metric type: ``counter``, ``gauge`` or ``histogram``.
+            help_text (str): The metric description.
+        """
+        if name in self.declared:
+            return
+        self.declared.add(name)
+        self.lines.append(f'# HELP {name} {help_text}')
+        self.lines.append(f'# TYPE {name} {kind}')
+
+    def sample(self, name: str, kind: str, help_text: str, value, labels: dict = None):
+        """Write a counter or gauge sample.
+
+        Args:
+            name (str): The metric name.
+            kind (str): The metric type.
+            help_text (str): The metric description.
+            value (float): The value.
+            labels (dict): The labels of the sample.
+        """
+        self.declare(name, kind, help_text)
+        self.lines.append(f'{name}{format_labels(labels)} {value}')
+
+    def histogram(self, name: str, help_text: str, snapshot: dict, labels: dict = None):
+        """Write the buckets, sum and count of a histogram.
+
+        Args:
+            name (str): The metric name.
+            help_text (str): The metric description.
+            snapshot (dict): The histogram state, as returned by ``Histogram.snapshot``.
+            labels (dict): The labels of the samples.
+        """
+        self.declare(name, 'histogram', help_text)
+        labels = labels or {}
+        for bound, count in snapshot['buckets'].items():
+            self.lines.append(f'{name}_bucket{format_labels({**labels, "le": bound})} {count}')
+        self.lines.append(f'{name}_sum{format_labels(labels)} {snapshot["sum"]}')
+        self.lines.append(f'{name}_count{format_labels(labels)} {snapshot["count"]}')
+
+    def render(self):
+        """Get the document.
+
+        Returns:
+            str: The metrics in the Prometheus text format.
+        """
+        return '\n'.join(self.lines) + '\n'
+
+
+def write_request_metrics(writer: PrometheusWriter, metrics: RequestMetrics):
+    """Write the request metrics of every route.
+
+    Args:
+        writer (PrometheusWriter): The writer.
+        metrics (RequestMetrics): The request metrics.
+    """
+    routes = metrics.snapshot()
+    for method, route, _, responses in routes:
+        labels = {'method': method, 'route': route}
+        for status, count in sorted(responses.items()):
+            writer.sample(
+                'http_requests_total', 'counter', 'Requisições HTTP respondidas.', count, {**labels, 'status': status}
+            )
+    # As amostras de uma métrica precisam ficar juntas no documento
+    for name, attribute, help_text in (
+        ('http_request_duration_seconds', 'latency', 'Tempo até o fim da resposta.'),
+        ('http_request_db_statements', 'statements', 'Instruções SQL por requisição.'),
+        ('http_request_db_seconds', 'db_time', 'Tempo no banco de dados por requisição.'),
+    ):
+        for method, route, route_metrics, _ in routes:
+            histogram = getattr(route_metrics, attribute)
+            writer.histogram(name, help_text, histogram.snapshot(), {'method': method, 'route': route})
+
+
+def write_query_metrics(writer: PrometheusWriter, metrics):
+    """Write the SQL statement metrics.
+
+    Args:
+        writer (PrometheusWriter): The writer.
+        metrics (QueryMetrics): The statement metrics.
+    """
+    writer.histogram('db_statement_duration_seconds', 'Duração de cada instrução SQL.', metrics.duration.snapshot())
+    writer.sample('db_slow_statements_total', 'counter', 'Instruções SQL lentas.', metrics.slow_statements)
+    writer.sample('db_statement_errors_total', 'counter', 'Instruções SQL com erro.', metrics.errors)
+
+
+def write_pool_metrics(writer: PrometheusWriter, status: dict):
+    """Write the connection pool state and timings.
+
+    Args:
+        writer (PrometheusWriter): The writer.
+        status (dict): The pool status, as returned by ``pool_status``.
+    """
+    for key in ('size', 'checked_out', 'idle', 'overflow'):
+        if key in status:
+            writer.sample(f'db_pool_{key}', 'gauge', f'Conexões do pool ({key}).', status[key])
+    if 'timeouts' in status:
+        writer.sample('db_pool_timeouts_total', 'counter', 'Esperas por conexão que expiraram.', status['timeouts'])
+        for key, help_text in (
+            ('wait_time_seconds', 'Espera por uma conexão livre no pool.'),
+            ('checkout_latency_seconds', 'Tempo total para obter uma conexão.'),
+        ):
+            writer.histogram(f'db_pool_{key}', help_text, status[key])
+
+
+def write_cache_metrics(writer: PrometheusWriter, status: dict):
+    """Write the item cache counters.
+
+    Args:
+        writer (PrometheusWriter): The writer.
+        status (dict): The cache status, as returned by ``cache_status``.
+    """
+    labels = {'backend': status['backend']}
+    writer.sample('cache_entries', 'gauge', 'Entradas no cache de itens.', status['entries'], labels)
+    for key in ('hits', 'misses', 'evictions', 'invalidations'):
+        writer.sample(f'cache_{key}_total', 'counter', f'Contador do cache de itens ({key}).', status[key], labels)
+
+
+request_metrics = RequestMetrics()
@@ -0,0 +1,87 @@
+import time
+
+from monitoring.histogram import Histogram
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+
+
+class PoolMetrics:
+    """Connection pool metrics.
+
+    Attributes:
+        wait_time (Histogram): Time spent waiting for a free connection in the pool queue.
+        checkout_latency (Histogram): Total time to check out a connection, including
+            opening new connections and pre-ping.
+        timeouts (int): The number of checkouts that failed with a pool timeout.
+    """
+
+    def __init__(self):
+        self.wait_time = Histogram()
+        self.checkout_latency = Histogram()
+        self.timeouts = 0
+
+
+def instrumented_pool(pool_class, metrics: PoolMetrics):
+    """Build a pool class that records checkout timings.
+
+    The metrics are kept on the class so they survive ``Pool.recreate()``.
+
+    Args:
+        pool_class (type): The queue pool class to extend.
+        metrics (PoolMetrics): The metrics to record into.
+
+    Returns:
+        type: The instrumented pool class.
+    """
+
+    def connect(self):
+        start = time.perf_counter()
+        try:
+            return pool_class.connect(self)
+        finally:
+            self.metrics.checkout_latency.observe(time.perf_counter() - start)
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            return pool_class._do_get(self)
+        except PoolTimeoutError:
+            self.metrics.timeouts += 1
+            raise
+        finally:
+            self.metrics.wait_time.observe(time.perf_counter() - start)
+
+    return type(
+        f'Instrumented{pool_class.__name__}',
+        (pool_class,),
+        {'metrics': metrics, 'connect': connect, '_do_get': _do_get},
+    )
+
+
+def pool_status(pool):
+    """Get the current state and metrics of a connection pool.
+
+    Args:
+        pool (Pool): The connection pool.
+
+    Returns:
+        dict: The pool size, checked-out, idle and overflow connections, and the timing histograms.
+    """
+    status = {'pool': type(pool).__name__}
+    if isinstance(pool, (QueuePool, AsyncAdaptedQueuePool)):
+        status.update(
+            size=pool.size(),
+            checked_out=pool.checkedout(),
+            idle=pool.checkedin(),
+            overflow=max(pool.overflow(), 0),
+            max_overflow=pool._max_overflow,
+            timeout=pool.timeout(),
+        )
+    metrics = getattr(pool, 'metrics', None)
+    if metrics is not None:
+        status.update(
+            timeouts=metrics.timeouts,
+            wait_time_seconds=metrics.wait_time.snapshot(),
+            checkout_latency_seconds=metrics.checkout_latency.snapshot(),
+        )
+    return status
@@ -0,0 +1,281 @@
+import cProfile
+import itertools
+import json
+import logging
+import os
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from datetime import datetime, timezone
+
+from fastapi.concurrency import run_in_threadpool
+from models.database import env_bool, env_int
+
+logger = logging.getLogger(__name__)
+
+# Perfilamento sob demanda; desativado por padrão, sem custo algum quando desligado
+PROFILE_ENABLED = env_bool('PROFILE_ENABLED', False)
+# Cabeçalho que pede o perfil de uma requisição: 'sampling' (ou '1') ou 'cprofile'
+PROFILE_HEADER = os.getenv('PROFILE_HEADER', 'X-Profile').lower()
+# Perfila automaticamente uma a cada N requisições, com o amostrador; 0 desativa
+PROFILE_SAMPLE_EVERY = env_int('PROFILE_SAMPLE_EVERY', 0)
+PROFILE_DIR = os.getenv('PROFILE_DIR', 'profiles')
+# Intervalo entre amostras das pilhas e duração máxima da amostragem de uma requisição
+PROFILE_INTERVAL_MS = env_int('PROFILE_INTERVAL_MS', 10)
+PROFILE_MAX_SECONDS = env_int('PROFILE_MAX_SECONDS', 30)
+# Arquivos mantidos em PROFILE_DIR; os mais antigos são removidos
+PROFILE_MAX_FILES = env_int('PROFILE_MAX_FILES', 200)
+
+MODES = {'1': 'sampling', 'true': 'sampling', 'sampling': 'sampling', 'cprofile': 'cprofile'}
+# Funções em que uma thread está apenas esperando trabalho; essas amostras são descartadas
+IDLE_FRAMES = {
+    ('threading.py', 'wait'),
+    ('threading.py', '_wait_for_tstate_lock'),
+    ('selectors.py', 'select'),
+    ('queue.py', 'get'),
+}
+UNSAFE_CHARACTERS = re.compile(r'[^A-Za-z0-9]+')
+
+
+def frame_label(code):
+    """Get the label of a function in the profiles.
+
+    Args:
+        code (CodeType): The code object of the function.
+
+    Returns:
+        str: The function name with its file and first line.
+    """
+    return f'{code.co_name} ({code.co_filename}:{code.co_firstlineno})'
+
+
+class StackSampler:
+    """Sampling profiler that records the Python stacks of every busy thread.
+
+    A background thread reads the current frame of each thread every ``interval``
+    seconds, so the cost depends on the interval and not on the code being profiled.
+    Threads waiting for work are skipped; other requests running at the same time
+    also appear in the samples, each in its own thread.
+
+    Attributes:
+        interval (float): The time between samples, in seconds.
+        max_duration (float): The time after which sampling stops, in seconds.
+        samples (Counter): The number of samples of each ``(thread name, stack)``, the stack root first.
+    """
+
+    def __init__(self, interval: float, max_duration: float):
+        self.interval = interval
+        self.max_duration = max_duration
+        self.samples = Counter()
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self.run, name='stack-sampler', daemon=True)
+
+    def start(self):
+        """Start sampling."""
+        self.thread.start()
+
+    def stop(self):
+        """Stop sampling and wait for the sampler thread."""
+        self.stopped.set()
+        self.thread.join()
+
+    def run(self):
+        """Sample the stacks until stopped or ``max_duration`` elapses."""
+        own = threading.get_ident()
+        deadline = time.monotonic() + self.max_duration
+        while not self.stopped.wait(self.interval) and time.monotonic() < deadline:
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                if ident == own:
+                    continue
+                top = frame.f_code
+                if (os.path.basename(top.co_filename), top.co_name) in IDLE_FRAMES:
+                    continue
+                stack = []
+                while frame is not None:
+                    stack.append(frame_label(frame.f_code))
+                    frame = frame.f_back
+                self.samples[(f'{names.get(ident, "thread")} {ident}', tuple(reversed(stack)))] += 1
+
+    def collapsed(self):
+        """Format the samples as collapsed stacks, as read by flamegraph.pl and speedscope.
+
+        Returns:
+            str: One ``thread;frame;...;frame count`` line per distinct stack.
+        """
+        lines = [';'.join((thread, *stack)) + f' {count}' for (thread, stack), count in self.samples.items()]
+        return '\n'.join(sorted(lines)) + '\n'
+
+    def speedscope(self, name: str):
+        """Format the samples as a speedscope document, with one sampled profile per thread.
+
+        Args:
+            name (str): The name of the document.
+
+        Returns:
+            dict: The speedscope document.
+        """
+        frames, indexes, profiles = [], {}, {}
+        for (thread, stack), count in sorted(self.samples.items()):
+            sample = []
+            for label in stack:
+                if label not in indexes:
+                    indexes[label] = len(frames)
+                    frames.append({'name': label})
+                sample.append(indexes[label])
+            profile = profiles.setdefault(thread, {'samples': [], 'weights': []})
+            profile['samples'].append(sample)
+            profile['weights'].append(count * self.interval)
+        return {
+            '$schema': 'https://www.speedscope.app/file-format-schema.json',
+            'name': name,
+            'exporter': 'inventory_crud',
+            'activeProfileIndex': 0,
+            'shared': {'frames': frames},
+            'profiles': [
+                {
+                    'type': 'sampled',
+                    'name': thread,
+                    'unit': 'seconds',
+                    'startValue': 0,
+                    'endValue': sum(profile['weights']),
+                    'samples': profile['samples'],
+                    'weights': profile['weights'],
+                }
+                for thread, profile in profiles.items()
+            ],
+        }
+
+
+def prune(directory: str, max_files: int):
+    """Remove the oldest files of a directory beyond a limit.
+
+    Args:
+        directory (str): The directory.
+        max_files (int): The number of files kept.
+    """
+    paths = [os.path.join(directory, name) for name in os.listdir(directory)]
+    paths.sort(key=os.path.getmtime, reverse=True)
+    for path in paths[max_files:]:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+def save_sampling(sampler: StackSampler, directory: str, name: str):
+    """Write the samples of a request as collapsed stacks and as a speedscope document.
+
+    Args:
+        sampler (StackSampler): The stopped sampler.
+        directory (str): The profile directory.
+        name (str): The base file name.
+    """
+    os.makedirs(directory, exist_ok=True)
+    with open(os.path.join(directory, f'{name}.collapsed.txt'), 'w') as file:
+        file.write(sampler.collapsed())
+    with open(os.path.join(directory, f'{name}.speedscope.json'), 'w') as file:
+        json.dump(sampler.speedscope(name), file)
+    prune(directory, PROFILE_MAX_FILES)
+
+
+def save_cprofile(profile: cProfile.Profile, directory: str, name: str):
+    """Write the statistics of a request in the pstats format (snakeviz, gprof2dot).
+
+    Args:
+        profile (cProfile.Profile): The disabled profiler.
+        directory (str): The profile directory.
+        name (str): The base file name.
+    """
+    os.makedirs(directory, exist_ok=True)
+    profile.dump_stats(os.path.join(directory, f'{name}.prof'))
+    prune(directory, PROFILE_MAX_FILES)
+
+
+class ProfilerMiddleware:
+    """ASGI middleware that profiles selected requests.
+
+    A request is profiled when it carries the ``PROFILE_HEADER`` header or when it is
+    the N-th since the last automatic profile (``PROFILE_SAMPLE_EVERY``). The profile
+    spans the whole request, from the dependencies (such as the ``get_database`` checkout) to
+    the last byte of the serialized response, and its base file name is returned in
+    the ``X-Profile-File`` response header.
+
+    The sampling mode is the one meant for production: its cost is bounded by the
+    sampling interval and by ``PROFILE_MAX_SECONDS``. The ``cprofile`` mode is
+    deterministic and much slower, and only sees the event loop thread, not the
+    database work done in the thread pool. Only one request is profiled at a time; requests
+    that ask for a profile while another is running are served without one.
+
+    Attributes:
+        app (ASGIApp): The wrapped application.
+        directory (str): The directory of the profile files.
+    """
+
+    def __init__(self, app, directory: str = PROFILE_DIR):
+        self.app = app
+        self.directory = directory
+        self.lock = threading.Lock()
+        self.counter = itertools.count(1)
+
+    def requested_mode(self, scope):
+        """Get the profiling mode of a request.
+
+        Args:
+            scope (dict): The ASGI scope.
+
+        Returns:
+            str: 'sampling', 'cprofile' or None if the request is not profiled.
+        """
+        for name, value in scope['headers']:
+            if name.decode('latin-1') == PROFILE_HEADER:
+                return MODES.get(value.decode('latin-1').strip().lower())
+        if PROFILE_SAMPLE_EVERY > 0 and next(self.counter) % PROFILE_SAMPLE_EVERY == 0:
+            return 'sampling'
+        return None
+
+    async def __call__(self, scope, receive, send):
+        mode = self.requested_mode(scope) if scope['type'] == 'http' else None
+        if mode is None or not self.lock.acquire(blocking=False):
+            await self.app(scope, receive, send)
+            return
+
+        started = datetime.now(timezone.utc)
+        path = UNSAFE_CHARACTERS.sub('_', scope['path']).strip('_') or 'root'
+        name = f'{started:%Y%m%dT%H%M%S%f}-{scope["method"]}-{path}'[:150]
+
+        async def send_wrapper(message):
+            if message['type'] == 'http.response.start':
+                message = {**message, 'headers': [*message.get('headers', []), (b'x-profile-file', name.encode())]}
+            await send(message)
+
+        try:
+            if mode == 'cprofile':
+                profile = cProfile.Profile()
+                try:
+                    profile.enable()
+                except ValueError:
+                    # Outro profiler (um depurador, por exemplo) já está ativo no processo
+                    await self.app(scope, receive, send)
+                    return
+                try:
+                    await self.app(scope, receive, send_wrapper)
+                finally:
+                    profile.disable()
+                save, result = save_cprofile, profile
+            else:
+                sampler = StackSampler(PROFILE_INTERVAL_MS / 1000, PROFILE_MAX_SECONDS)
+                sampler.start()
+                try:
+                    await self.app(scope, receive, send_wrapper)
+                finally:
+                    sampler.stop()
+                save, result = save_sampling, sampler
+            try:
+                await run_in_threadpool(save, result, self.directory, name)
+            except OSError:
+                logger.exception('Falha ao gravar o perfil da requisição %s', name)
+        finally:
+            self.lock.release()
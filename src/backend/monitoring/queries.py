@@ -0,0 +1,117 @@
+import logging
+import time
+from contextvars import ContextVar
+
+from monitoring.histogram import Histogram
+from sqlalchemy import event
+
+logger = logging.getLogger(__name__)
+
+# Tamanho máximo dos parâmetros registrados no log de consultas lentas
+MAX_LOGGED_PARAMETERS = 1000
+
+
+class QueryStats:
+    """SQL statements executed while handling a request.
+
+    Attributes:
+        statements (int): The number of statements.
+        duration (float): The total time spent in the database, in seconds.
+    """
+
+    def __init__(self):
+        self.statements = 0
+        self.duration = 0.0
+
+
+class QueryMetrics:
+    """SQL statement metrics of an engine.
+
+    Attributes:
+        duration (Histogram): The duration of each statement, in seconds.
+        slow_statements (int): The number of statements over the slow query threshold.
+        errors (int): The number of statements that failed.
+    """
+
+    def __init__(self):
+        self.duration = Histogram()
+        self.slow_statements = 0
+        self.errors = 0
+
+
+# Estatísticas da requisição em andamento; o middleware cria uma instância por requisição
+current_stats: ContextVar[QueryStats] = ContextVar('current_stats', default=None)
+
+
+def start_request():
+    """Start counting the statements of the current request.
+
+    Returns:
+        tuple: The request statistics and the token that restores the previous context.
+    """
+    stats = QueryStats()
+    return stats, current_stats.set(stats)
+
+
+def finish_request(token):
+    """Stop counting the statements of the current request.
+
+    Args:
+        token (Token): The token returned by :func:`start_request`.
+    """
+    current_stats.reset(token)
+
+
+def format_parameters(parameters):
+    """Format statement parameters for the log, truncated to ``MAX_LOGGED_PARAMETERS`` characters.
+
+    Args:
+        parameters: The parameters passed to the driver.
+
+    Returns:
+        str: The parameters.
+    """
+    text = repr(parameters)
+    if len(text) > MAX_LOGGED_PARAMETERS:
+        text = f'{text[:MAX_LOGGED_PARAMETERS]}... ({len(text)} caracteres)'
+    return text
+
+
+def instrument_engine(engine, metrics: QueryMetrics, slow_query_seconds: float):
+    """Time every statement of an engine and log the slow ones.
+
+    The duration of each statement is added to the statistics of the current request,
+    if any, and to the engine metrics. For an ``AsyncEngine`` pass its ``sync_engine``.
+
+    Args:
+        engine (Engine): The engine to instrument.
+        metrics (QueryMetrics): The metrics to record into.
+        slow_query_seconds (float): The duration from which a statement is logged with
+            its parameters; 0 or less disables the log.
+    """
+
+    # Uma conexão executa uma instrução por vez; o início de cada uma substitui o da anterior
+    @event.listens_for(engine, 'before_cursor_execute')
+    def before_cursor_execute(connection, cursor, statement, parameters, context, executemany):
+        connection.info['query_started'] = time.perf_counter()
+
+    @event.listens_for(engine, 'after_cursor_execute')
+    def after_cursor_execute(connection, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - connection.info['query_started']
+        metrics.duration.observe(elapsed)
+        stats = current_stats.get()
+        if stats is not None:
+            stats.statements += 1
+            stats.duration += elapsed
+        if 0 < slow_query_seconds <= elapsed:
+            metrics.slow_statements += 1
+            logger.warning(
+                'Consulta lenta (%.1f ms): %s | parâmetros: %s',
+                elapsed * 1000,
+                statement,
+                format_parameters(parameters),
+            )
+
+    @event.listens_for(engine, 'handle_error')
+    def handle_error(context):
+        metrics.errors += 1
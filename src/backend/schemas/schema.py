@@ -1,8 +1,24 @@
-from datetime import datetime
-from typing import Optional, Union
+from datetime import date, datetime
+from typing import List, Literal, Optional, Union
 
-from models.models import MovementType, UoMType
-from pydantic import BaseModel, ConfigDict, Field, PositiveFloat, PositiveInt, field_validator
+from models.models import DEFAULT_LOCATION_ID, MovementType, UoMType
+from pydantic import (
+    BaseModel,
+    ConfigDict,
+    Field,
+    NonNegativeFloat,
+    PositiveFloat,
+    PositiveInt,
+    field_validator,
+    model_validator,
+)
+
+DEFAULT_PAGE_SIZE = 50
+DEFAULT_SEARCH_SIZE = 10
+MAX_PAGE_SIZE = 500
+DEFAULT_IMPORT_BATCH_SIZE = 1000
+MAX_IMPORT_BATCH_SIZE = 10000
+MAX_MOVEMENT_BATCH_LINES = 1000
 
 
 class ItemSchema(BaseModel):
@@ -13,14 +29,14 @@ class ItemSchema(BaseModel):
         unidade_medida (Literal): The unit of measure.
         custo_medio (PositiveFloat): The average cost.
         valor_venda (PositiveFloat): The sale value.
-        estoque (PositiveFloat): The stock quantity.
+        estoque (NonNegativeFloat): The stock quantity.
     """
 
     produto: str
     unidade_medida: UoMType
-    custo_medio: PositiveFloat = Field(..., ge=0)
-    valor_venda: PositiveFloat = Field(..., ge=0)
-    estoque: PositiveFloat = Field(..., ge=0)
+    custo_medio: PositiveFloat = Field(..., ge=0, allow_inf_nan=False)
+    valor_venda: PositiveFloat = Field(..., ge=0, allow_inf_nan=False)
+    estoque: NonNegativeFloat = Field(..., ge=0, allow_inf_nan=False)
 
     @field_validator('produto')
     def produto_must_not_be_empty(cls, v):
@@ -54,14 +70,14 @@ class ItemUpdate(ItemSchema):
         unidade_medida (Optional[Literal]): The unit of measure.
         custo_medio (Optional[PositiveFloat]): The average cost.
         valor_venda (Optional[PositiveFloat]): The sale value.
-        estoque (Optional[PositiveFloat]): The stock quantity.
+        estoque (Optional[NonNegativeFloat]): The stock quantity.
     """
 
     produto: Optional[str]
     unidade_medida: Optional[UoMType]
-    custo_medio: Optional[PositiveFloat] = Field(None, ge=0)
-    valor_venda: Optional[PositiveFloat] = Field(None, ge=0)
-    estoque: Optional[PositiveFloat] = Field(None, ge=0)
+    custo_medio: Optional[PositiveFloat] = Field(None, ge=0, allow_inf_nan=False)
+    valor_venda: Optional[PositiveFloat] = Field(None, ge=0, allow_inf_nan=False)
+    estoque: Optional[NonNegativeFloat] = Field(None, ge=0, allow_inf_nan=False)
 
 
 class ItemResponse(ItemSchema):
@@ -69,10 +85,70 @@ class ItemResponse(ItemSchema):
 
     Attributes:
         id (int): The item ID.
+        versao (int): The item version, also sent as the ETag.
     """
 
     model_config = ConfigDict(from_attributes=True)
     id: int
+    versao: int
+
+
+class ItemFilter(BaseModel):
+    """Schema for item filter query parameters.
+
+    Attributes:
+        produto (Optional[str]): Prefix the product name must start with.
+        unidade_medida (Optional[UoMType]): The unit of measure.
+        estoque_min (Optional[float]): The minimum stock quantity.
+        estoque_max (Optional[float]): The maximum stock quantity.
+        low_stock (Optional[float]): Only items with stock below this threshold.
+    """
+
+    model_config = ConfigDict(frozen=True, extra='forbid')
+
+    produto: Optional[str] = None
+    unidade_medida: Optional[UoMType] = None
+    estoque_min: Optional[float] = Field(None, ge=0)
+    estoque_max: Optional[float] = Field(None, ge=0)
+    low_stock: Optional[float] = Field(None, gt=0)
+
+
+class ItemQuery(ItemFilter):
+    """Schema for item listing query parameters.
+
+    Attributes:
+        limit (int): The maximum number of items per page.
+        after (Optional[str]): The cursor returned by the previous page.
+        sort (Literal): The column used to order the items.
+        order (Literal): The sort direction.
+    """
+
+    limit: int = Field(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE)
+    after: Optional[str] = None
+    sort: Literal['id', 'produto'] = 'id'
+    order: Literal['asc', 'desc'] = 'asc'
+
+
+class ItemExportQuery(ItemFilter):
+    """Schema for item export query parameters.
+
+    Attributes:
+        format (Literal): The export format.
+    """
+
+    format: Literal['ndjson', 'csv'] = 'ndjson'
+
+
+class ItemPage(BaseModel):
+    """Schema for a page of items.
+
+    Attributes:
+        items (List[ItemResponse]): The items in the page.
+        next_cursor (Optional[str]): The cursor for the next page, or None if this is the last page.
+    """
+
+    items: List[ItemResponse]
+    next_cursor: Optional[str] = None
 
 
 class MovementHistorySchema(BaseModel):
@@ -82,15 +158,21 @@ class MovementHistorySchema(BaseModel):
         data (datetime): The movement date.
         movimentacao (Literal): The movement type.
         produto_id (int): The item ID.
+        local_id (int): The location where the stock moved.
         quantidade (PositiveFloat): The quantity.
-        estoque_final (PositiveFloat): The final stock quantity.
+        estoque_final (NonNegativeFloat): The final stock quantity at the location.
+        custo_unitario (Optional[NonNegativeFloat]): The unit cost of an ENTRADA, if informed.
+        transferencia (bool): Whether the movement is a leg of a transfer between locations.
     """
 
     data: datetime
     movimentacao: MovementType
     produto_id: int
+    local_id: int
     quantidade: PositiveFloat = Field(..., ge=0)
-    estoque_final: PositiveFloat = Field(..., ge=0)
+    estoque_final: NonNegativeFloat = Field(..., ge=0)
+    custo_unitario: Optional[NonNegativeFloat] = None
+    transferencia: bool = False
 
 
 class MovementHistoryResponse(MovementHistorySchema):
@@ -102,3 +184,537 @@ class MovementHistoryResponse(MovementHistorySchema):
 
     model_config = ConfigDict(from_attributes=True)
     id: int
+
+
+class MovementFilter(BaseModel):
+    """Schema for movement filter query parameters.
+
+    Attributes:
+        from_ (Optional[datetime]): Only movements at or after this moment (query parameter ``from``).
+        to (Optional[datetime]): Only movements before this moment.
+        movimentacao (Optional[MovementType]): Only movements of this type.
+        local_id (Optional[int]): Only movements at this location.
+    """
+
+    model_config = ConfigDict(frozen=True, extra='forbid', populate_by_name=True)
+
+    from_: Optional[datetime] = Field(None, alias='from')
+    to: Optional[datetime] = None
+    movimentacao: Optional[MovementType] = None
+    local_id: Optional[int] = None
+
+
+class MovementQuery(MovementFilter):
+    """Schema for movement history query parameters.
+
+    Attributes:
+        limit (int): The maximum number of movements per page.
+        after (Optional[str]): The cursor returned by the previous page.
+        order (Literal): The chronological direction.
+    """
+
+    limit: int = Field(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE)
+    after: Optional[str] = None
+    order: Literal['asc', 'desc'] = 'asc'
+
+
+class MovementExportQuery(MovementFilter):
+    """Schema for movement export query parameters.
+
+    Attributes:
+        produto_id (Optional[int]): Only movements of this product.
+        format (Literal): The export format.
+    """
+
+    produto_id: Optional[int] = None
+    format: Literal['ndjson', 'csv'] = 'ndjson'
+
+
+class MovementPage(BaseModel):
+    """Schema for a page of movements.
+
+    Attributes:
+        movements (List[MovementHistoryResponse]): The movements in the page.
+        next_cursor (Optional[str]): The cursor for the next page, or None if this is the last page.
+    """
+
+    movements: List[MovementHistoryResponse]
+    next_cursor: Optional[str] = None
+
+
+class MovementCreate(BaseModel):
+    """Schema for a stock movement request.
+
+    The quantity is either signed (positive for ENTRADA, negative for SAIDA) or
+    positive together with an explicit movement type. An ENTRADA may carry the unit
+    cost of the received goods, which updates the item's weighted average cost.
+
+    Attributes:
+        quantidade (float): The quantity to move.
+        movimentacao (Optional[MovementType]): The movement type.
+        custo_unitario (Optional[NonNegativeFloat]): The unit cost of an ENTRADA.
+        local_id (int): The location whose stock moves; defaults to the default location.
+    """
+
+    # NaN e infinito passariam pelas verificações de sinal abaixo e corromperiam o estoque
+    quantidade: float = Field(..., allow_inf_nan=False)
+    movimentacao: Optional[MovementType] = None
+    custo_unitario: Optional[NonNegativeFloat] = Field(None, allow_inf_nan=False)
+    local_id: int = DEFAULT_LOCATION_ID
+
+    @model_validator(mode='after')
+    def check_quantidade(self):
+        """Validate the quantity against the movement type.
+
+        Returns:
+            MovementCreate: The validated movement.
+
+        Raises:
+            ValueError: If the quantity is zero, negative with an explicit movement type,
+                or if a unit cost is given for a SAIDA.
+        """
+        if self.quantidade == 0:
+            raise ValueError('Quantidade não pode ser zero')
+        if self.movimentacao is not None and self.quantidade < 0:
+            raise ValueError('Quantidade deve ser positiva quando a movimentação é informada')
+        if self.custo_unitario is not None and self.delta < 0:
+            raise ValueError('Custo unitário só pode ser informado em entradas')
+        return self
+
+    @property
+    def delta(self):
+        """Get the signed stock change.
+
+        Returns:
+            float: The quantity to add to the stock (negative for SAIDA).
+        """
+        if self.movimentacao == MovementType.SAIDA:
+            return -self.quantidade
+        return self.quantidade
+
+
+class ImportLineError(BaseModel):
+    """Schema for an import error.
+
+    Attributes:
+        line (int): The line of the input where the error happened.
+        error (str): The error message.
+    """
+
+    line: int
+    error: str
+
+
+class ImportReport(BaseModel):
+    """Schema for the bulk import report.
+
+    Attributes:
+        inserted (int): The number of inserted items.
+        failed (int): The number of rejected lines.
+        errors (List[ImportLineError]): The first errors found, by line.
+    """
+
+    inserted: int
+    failed: int
+    errors: List[ImportLineError]
+
+
+class MovementLine(MovementCreate):
+    """Schema for a line of a batch stock movement.
+
+    Attributes:
+        produto_id (int): The item ID.
+    """
+
+    produto_id: int
+
+
+class MovementBatch(BaseModel):
+    """Schema for a batch of stock movements, such as a picking or receiving list.
+
+    Attributes:
+        lines (List[MovementLine]): The movements, applied in order.
+        mode (Literal): 'all_or_nothing' rejects the whole batch if any line fails,
+            'best_effort' applies the valid lines and reports the others.
+    """
+
+    lines: List[MovementLine] = Field(..., min_length=1, max_length=MAX_MOVEMENT_BATCH_LINES)
+    mode: Literal['all_or_nothing', 'best_effort'] = 'all_or_nothing'
+
+
+class MovementLineError(BaseModel):
+    """Schema for a rejected batch movement line.
+
+    Attributes:
+        line (int): The 1-based position of the line in the batch.
+        produto_id (int): The item ID.
+        error (str): The error message.
+    """
+
+    line: int
+    produto_id: int
+    error: str
+
+
+class MovementBatchReport(BaseModel):
+    """Schema for the batch stock movement report.
+
+    Attributes:
+        applied (int): The number of applied lines.
+        failed (int): The number of rejected lines.
+        errors (List[MovementLineError]): The rejected lines.
+    """
+
+    applied: int
+    failed: int
+    errors: List[MovementLineError]
+
+
+class LocationCreate(BaseModel):
+    """Schema for creating a stock location.
+
+    Attributes:
+        nome (str): The location name.
+    """
+
+    nome: str
+
+    @field_validator('nome')
+    def nome_must_not_be_empty(cls, v):
+        """Validate that the location name is not empty.
+
+        Args:
+            v (str): The location name.
+
+        Returns:
+            str: The name without surrounding spaces.
+
+        Raises:
+            ValueError: If the location name is empty.
+        """
+        if not v.strip():
+            raise ValueError('Nome do local não pode ser vazio')
+        return v.strip()
+
+
+class LocationResponse(LocationCreate):
+    """Schema for location response.
+
+    Attributes:
+        id (int): The location ID.
+    """
+
+    model_config = ConfigDict(from_attributes=True)
+    id: int
+
+
+class LocationStock(BaseModel):
+    """Schema for the stock of an item at a location.
+
+    Attributes:
+        local_id (int): The location ID.
+        nome (str): The location name.
+        estoque (float): The stock quantity at the location.
+    """
+
+    local_id: int
+    nome: str
+    estoque: float
+
+
+class ItemStockResponse(BaseModel):
+    """Schema for the stock of an item by location.
+
+    Attributes:
+        produto_id (int): The item ID.
+        estoque (float): The total stock of the item.
+        locais (List[LocationStock]): The stock at each location that ever held the item.
+    """
+
+    produto_id: int
+    estoque: float
+    locais: List[LocationStock]
+
+
+class LocationStockQuery(BaseModel):
+    """Schema for location stock query parameters.
+
+    Attributes:
+        limit (int): The maximum number of items per page.
+        after (Optional[str]): The cursor returned by the previous page.
+    """
+
+    model_config = ConfigDict(frozen=True, extra='forbid')
+
+    limit: int = Field(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE)
+    after: Optional[str] = None
+
+
+class LocationStockItem(BaseModel):
+    """Schema for the stock of an item in a location stock page.
+
+    Attributes:
+        produto_id (int): The item ID.
+        produto (str): The product name.
+        unidade_medida (UoMType): The unit of measure.
+        estoque (float): The stock quantity at the location.
+    """
+
+    produto_id: int
+    produto: str
+    unidade_medida: UoMType
+    estoque: float
+
+
+class LocationStockPage(BaseModel):
+    """Schema for a page of the stock of a location.
+
+    Attributes:
+        items (List[LocationStockItem]): The items with stock at the location, ordered by ID.
+        next_cursor (Optional[str]): The cursor for the next page, or None if this is the last page.
+    """
+
+    items: List[LocationStockItem]
+    next_cursor: Optional[str] = None
+
+
+class TransferCreate(BaseModel):
+    """Schema for a stock transfer between two locations.
+
+    Attributes:
+        produto_id (int): The item ID.
+        origem_id (int): The location the stock leaves.
+        destino_id (int): The location the stock enters.
+        quantidade (PositiveFloat): The quantity to transfer.
+    """
+
+    produto_id: int
+    origem_id: int
+    destino_id: int
+    quantidade: PositiveFloat = Field(..., allow_inf_nan=False)
+
+    @model_validator(mode='after')
+    def check_locations(self):
+        """Validate that the transfer moves the stock to another location.
+
+        Returns:
+            TransferCreate: The validated transfer.
+
+        Raises:
+            ValueError: If the origin and the destination are the same location.
+        """
+        if self.origem_id == self.destino_id:
+            raise ValueError('Origem e destino devem ser locais diferentes')
+        return self
+
+
+class TransferResponse(BaseModel):
+    """Schema for the movements written by a stock transfer.
+
+    Attributes:
+        saida (MovementHistoryResponse): The SAIDA movement at the origin.
+        entrada (MovementHistoryResponse): The ENTRADA movement at the destination.
+    """
+
+    saida: MovementHistoryResponse
+    entrada: MovementHistoryResponse
+
+
+class ValuationTotals(BaseModel):
+    """Schema for stock valuation totals.
+
+    Attributes:
+        itens (int): The number of active items.
+        valor_estoque (float): The total of ``estoque * custo_medio``.
+        receita_potencial (float): The total of ``estoque * valor_venda``.
+        margem (float): The potential margin, ``receita_potencial - valor_estoque``.
+        margem_percentual (Optional[float]): The margin as a fraction of the potential revenue.
+    """
+
+    itens: int
+    valor_estoque: float
+    receita_potencial: float
+    margem: float
+    margem_percentual: Optional[float]
+
+
+class ValuationGroup(ValuationTotals):
+    """Schema for the stock valuation of a unit of measure.
+
+    Attributes:
+        unidade_medida (UoMType): The unit of measure.
+        estoque (float): The total stock quantity.
+    """
+
+    unidade_medida: UoMType
+    estoque: float
+
+
+class ValuationReport(BaseModel):
+    """Schema for the stock valuation report.
+
+    Attributes:
+        total (ValuationTotals): The totals of all active items.
+        por_unidade_medida (List[ValuationGroup]): The totals by unit of measure.
+    """
+
+    total: ValuationTotals
+    por_unidade_medida: List[ValuationGroup]
+
+
+class LocationValuation(ValuationTotals):
+    """Schema for the stock valuation of a location.
+
+    Attributes:
+        local_id (int): The location ID.
+        nome (str): The location name.
+        estoque (float): The total stock quantity at the location.
+    """
+
+    local_id: int
+    nome: str
+    estoque: float
+
+
+class DailyMovementQuery(BaseModel):
+    """Schema for daily movement report query parameters.
+
+    Attributes:
+        from_ (Optional[date]): The first day of the report (query parameter ``from``).
+        to (Optional[date]): The last day of the report, inclusive.
+    """
+
+    model_config = ConfigDict(frozen=True, extra='forbid', populate_by_name=True)
+
+    from_: Optional[date] = Field(None, alias='from')
+    to: Optional[date] = None
+
+
+class DailyMovement(BaseModel):
+    """Schema for the movement volumes of a day.
+
+    Attributes:
+        dia (date): The day.
+        entrada (float): The total quantity received.
+        saida (float): The total quantity issued.
+        movimentos (int): The number of movements.
+    """
+
+    dia: date
+    entrada: float
+    saida: float
+    movimentos: int
+
+
+class StockAsOfQuery(BaseModel):
+    """Schema for point-in-time stock query parameters.
+
+    Attributes:
+        at (datetime): The moment the stock is reconstructed for.
+        produto (Optional[str]): Prefix the product name must start with.
+        unidade_medida (Optional[UoMType]): The unit of measure.
+        limit (int): The maximum number of items per page.
+        after (Optional[str]): The cursor returned by the previous page.
+    """
+
+    model_config = ConfigDict(frozen=True, extra='forbid')
+
+    at: datetime
+    produto: Optional[str] = None
+    unidade_medida: Optional[UoMType] = None
+    limit: int = Field(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE)
+    after: Optional[str] = None
+
+
+class StockAsOfItem(BaseModel):
+    """Schema for the stock of an item at a point in time.
+
+    Attributes:
+        id (int): The item ID.
+        produto (str): The product name.
+        unidade_medida (UoMType): The unit of measure.
+        estoque (float): The stock quantity at that moment.
+    """
+
+    id: int
+    produto: str
+    unidade_medida: UoMType
+    estoque: float
+
+
+class StockAsOfPage(BaseModel):
+    """Schema for a page of point-in-time stock.
+
+    Attributes:
+        at (datetime): The moment the stock was reconstructed for.
+        snapshot (Optional[datetime]): The moment of the snapshot the reconstruction started from.
+        items (List[StockAsOfItem]): The items in the page.
+        next_cursor (Optional[str]): The cursor of the next page, or None on the last page.
+    """
+
+    at: datetime
+    snapshot: Optional[datetime]
+    items: List[StockAsOfItem]
+    next_cursor: Optional[str]
+
+
+class SearchQuery(BaseModel):
+    """Schema for product search query parameters.
+
+    Attributes:
+        q (str): The search term.
+        limit (int): The maximum number of items per page.
+        after (Optional[str]): The cursor returned by the previous page.
+    """
+
+    model_config = ConfigDict(frozen=True, extra='forbid')
+
+    q: str = Field(..., min_length=1, max_length=200)
+    limit: int = Field(DEFAULT_SEARCH_SIZE, ge=1, le=MAX_PAGE_SIZE)
+    after: Optional[str] = None
+
+
+class SearchResult(BaseModel):
+    """Schema for an item found by the product search.
+
+    Attributes:
+        id (int): The item ID.
+        produto (str): The product name.
+        unidade_medida (UoMType): The unit of measure.
+        estoque (float): The stock quantity.
+        score (float): The similarity between the name and the term, from 0 to 1.
+    """
+
+    id: int
+    produto: str
+    unidade_medida: UoMType
+    estoque: float
+    score: float
+
+
+class SearchPage(BaseModel):
+    """Schema for a page of search results.
+
+    Attributes:
+        items (List[SearchResult]): The items in the page, best match first.
+        next_cursor (Optional[str]): The cursor of the next page, or None on the last page.
+    """
+
+    items: List[SearchResult]
+    next_cursor: Optional[str]
+
+
+class SnapshotResponse(BaseModel):
+    """Schema for a stock snapshot.
+
+    Attributes:
+        id (int): The snapshot ID.
+        data (datetime): The moment the stock was captured.
+        itens (int): The number of items in the snapshot.
+    """
+
+    model_config = ConfigDict(from_attributes=True)
+
+    id: int
+    data: datetime
+    itens: int
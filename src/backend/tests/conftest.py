@@ -0,0 +1,98 @@
+import os
+import tempfile
+
+# A aplicação lê a configuração na importação; sem TEST_DATABASE_URL o banco de testes é um SQLite temporário
+DATABASE_PATH = os.path.join(tempfile.mkdtemp(prefix='inventory-tests-'), 'inventory.db')
+os.environ['DATABASE_URL'] = os.getenv('TEST_DATABASE_URL') or f'sqlite:///{DATABASE_PATH}'
+os.environ['DATABASE_MODE'] = os.getenv('TEST_DATABASE_MODE', 'sync')
+os.environ['CACHE_BACKEND'] = 'memory'
+os.environ['PURGE_INTERVAL'] = '0'
+os.environ['SNAPSHOT_INTERVAL'] = '0'
+os.environ['SNAPSHOT_GRACE'] = '0'
+os.environ['PARTITION_MAINTENANCE_INTERVAL'] = '0'
+os.environ['PARTITION_ARCHIVE_DIR'] = os.path.join(os.path.dirname(DATABASE_PATH), 'archive')
+
+import pytest
+from controller import cache, search
+from fastapi.testclient import TestClient
+from main import app
+from migrations.runner import migrate
+from migrations.versions import MIGRATIONS
+from models.database import SessionLocal, async_engine, engine
+from sqlalchemy import MetaData, text
+
+
+def drop_schema():
+    """Drop every table of the test database, including those the current models do not know."""
+    if engine.dialect.name == 'postgresql':
+        with engine.begin() as connection:
+            connection.execute(text('DROP SCHEMA public CASCADE'))
+            connection.execute(text('CREATE SCHEMA public'))
+        return
+    metadata = MetaData()
+    metadata.reflect(bind=engine)
+    metadata.drop_all(bind=engine)
+
+
+@pytest.fixture(autouse=True)
+def database():
+    """Recreate the schema with the migrations and empty the cache and the search index before each test."""
+    drop_schema()
+    migrate(engine, MIGRATIONS)
+    cache.cache = cache.create_cache('memory')
+    search.memory_index = search.MemoryIndex()
+    yield
+    engine.dispose()
+
+
+@pytest.fixture
+def empty_database():
+    """Drop the schema created by the migrations, for tests that migrate the database themselves."""
+    # O PostgreSQL pode falhar ao remover a extensão pg_trgm em uma sessão que a criou; o esquema é apagado em uma nova
+    engine.dispose()
+    drop_schema()
+
+
+@pytest.fixture
+def postgresql():
+    """Skip the test unless the tests run on PostgreSQL."""
+    if engine.dialect.name != 'postgresql':
+        pytest.skip('requer PostgreSQL em TEST_DATABASE_URL')
+
+
+@pytest.fixture
+def client():
+    """Get a client of the application."""
+    with TestClient(app) as test_client:
+        yield test_client
+        if async_engine is not None:
+            # As conexões do driver assíncrono pertencem ao event loop do cliente, encerrado ao sair do bloco
+            test_client.portal.call(async_engine.dispose)
+
+
+@pytest.fixture
+def db():
+    """Get a database session outside the requests."""
+    with SessionLocal() as session:
+        yield session
+
+
+@pytest.fixture
+def create_item(client):
+    """Get a function that creates an item through the API and returns it."""
+
+    def create(produto='Cimento', estoque=10.0, custo_medio=2.0, valor_venda=3.0, unidade_medida='quilograma'):
+        response = client.post(
+            '/api/items',
+            json={
+                'produto': produto,
+                'unidade_medida': unidade_medida,
+                'custo_medio': custo_medio,
+                'valor_venda': valor_venda,
+                'estoque': estoque,
+            },
+        )
+        assert response.status_code == 200, response.text
+        return response.json()
+
+    return create
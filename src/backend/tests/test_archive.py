@@ -0,0 +1,92 @@
+import threading
+import time
+
+from controller import crud, purge
+from models.database import SessionLocal
+from models.models import Item, StockMovementHistory
+from sqlalchemy import func, select
+
+
+def count(db, model, item_id):
+    column = model.id if model is Item else model.produto_id
+    return db.scalar(select(func.count()).select_from(model).where(column == item_id))
+
+
+def test_delete_removes_the_item_and_its_history(client, db, create_item):
+    item = create_item()
+    client.post(f'/api/items/{item["id"]}/movements', json={'quantidade': 2})
+
+    assert client.delete(f'/api/items/{item["id"]}').status_code == 200
+
+    assert count(db, Item, item['id']) == 0
+    assert count(db, StockMovementHistory, item['id']) == 0
+    assert client.delete(f'/api/items/{item["id"]}').status_code == 404
+
+
+def test_archive_hides_the_item_and_purges_it(client, db, create_item):
+    item = create_item()
+    client.post(f'/api/items/{item["id"]}/movements', json={'quantidade': 2})
+
+    response = client.delete(f'/api/items/{item["id"]}', params={'archive': 'true'})
+
+    assert response.status_code == 200
+    assert client.get(f'/api/items/{item["id"]}').status_code == 404
+    assert client.get('/api/items').json()['items'] == []
+    assert count(db, Item, item['id']) == 0
+    assert count(db, StockMovementHistory, item['id']) == 0
+
+
+def test_archived_items_receive_no_movements(client, db, create_item):
+    item = create_item(estoque=10.0)
+    crud.archive_item(db, item['id'])
+
+    assert client.post(f'/api/items/{item["id"]}/movements', json={'quantidade': 1}).status_code == 404
+    report = client.post(
+        '/api/movements/batch', json={'lines': [{'produto_id': item['id'], 'quantidade': 1}], 'mode': 'best_effort'}
+    ).json()
+    assert report['errors'] == [{'line': 1, 'produto_id': item['id'], 'error': 'Item não encontrado'}]
+    assert db.get(Item, item['id']).estoque == 10.0
+
+
+def test_interrupted_purge_is_resumed(client, db, create_item):
+    kept, archived = create_item(produto='Mantido'), create_item(produto='Arquivado')
+    client.post(f'/api/items/{archived["id"]}/movements', json={'quantidade': 2})
+    # Arquiva sem a remoção em segundo plano, como após uma reinicialização
+    crud.archive_item(db, archived['id'])
+
+    assert client.portal.call(purge.purge_archived) == 1
+    assert client.portal.call(purge.purge_archived) == 0
+
+    assert count(db, Item, archived['id']) == 0
+    assert count(db, StockMovementHistory, archived['id']) == 0
+    assert count(db, Item, kept['id']) == 1
+
+
+def test_purge_of_an_already_purged_item_does_nothing(db, create_item):
+    item = create_item()
+    crud.archive_item(db, item['id'])
+    crud.purge_item(db, item['id'])
+
+    assert crud.purge_item(db, item['id']) == 0
+
+
+def test_purge_waits_for_the_item_row_lock(postgresql, db, create_item):
+    item = create_item()
+    crud.archive_item(db, item['id'])
+    # Outra limpeza do mesmo item mantém a linha bloqueada
+    db.execute(select(Item.id).where(Item.id == item['id']).with_for_update())
+
+    def purge_item():
+        with SessionLocal() as session:
+            crud.purge_item(session, item['id'])
+
+    concurrent = threading.Thread(target=purge_item)
+    concurrent.start()
+    time.sleep(0.5)
+    assert concurrent.is_alive()
+    db.commit()
+    concurrent.join(timeout=10)
+
+    assert not concurrent.is_alive()
+    assert count(db, Item, item['id']) == 0
+    assert count(db, StockMovementHistory, item['id']) == 0
@@ -0,0 +1,54 @@
+import asyncio
+import re
+
+import pytest
+from models import database
+from sqlalchemy import text
+
+ASYNCPG_URL = 'postgresql+asyncpg://inventory@localhost:5432/inventory'
+
+
+def test_requests_return_their_connections_to_the_pool(client, create_item):
+    create_item()
+    client.get('/api/items')
+
+    stats = client.get('/api/pool/stats').json()
+
+    assert stats['size'] == database.DB_POOL_SIZE
+    assert stats['checked_out'] == 0
+
+
+def test_pgbouncer_connect_args_only_apply_to_asyncpg(monkeypatch):
+    assert database.pgbouncer_connect_args(ASYNCPG_URL) == {}
+
+    monkeypatch.setattr(database, 'DB_PGBOUNCER', True)
+    args = database.pgbouncer_connect_args(ASYNCPG_URL)
+
+    assert (args['statement_cache_size'], args['prepared_statement_cache_size']) == (0, 0)
+    assert args['prepared_statement_name_func']() != args['prepared_statement_name_func']()
+    assert database.pgbouncer_connect_args('postgresql+psycopg2://inventory@localhost:5432/inventory') == {}
+
+
+@pytest.mark.usefixtures('postgresql')
+def test_pgbouncer_connect_args_name_every_prepared_statement(monkeypatch):
+    from sqlalchemy.ext.asyncio import create_async_engine
+
+    monkeypatch.setattr(database, 'DB_PGBOUNCER', True)
+    url = database.to_async_url(database.DATABASE_URL)
+
+    async def prepared_statements():
+        async_engine = create_async_engine(url, connect_args=database.pgbouncer_connect_args(url))
+        try:
+            async with async_engine.connect() as connection:
+                for value in range(3):
+                    result = await connection.execute(text('SELECT CAST(:value AS integer)'), {'value': value})
+                    assert result.scalar() == value
+                return (await connection.execute(text('SELECT name FROM pg_prepared_statements'))).scalars().all()
+        finally:
+            await async_engine.dispose()
+
+    names = asyncio.run(prepared_statements())
+
+    # Nomes únicos evitam conflitos quando o PgBouncer troca a conexão do servidor entre transações
+    assert names
+    assert all(re.fullmatch(r'__asyncpg_[0-9a-f-]{36}__', name) for name in names)
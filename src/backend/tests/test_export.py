@@ -0,0 +1,43 @@
+import csv
+import io
+import json
+
+from controller import crud, exporter
+from models.database import SessionLocal
+from schemas.schema import ItemExportQuery
+
+
+def test_export_items_as_ndjson_with_the_listing_filters(client, create_item):
+    create_item(produto='Cimento')
+    create_item(produto='Areia', unidade_medida='metro_cubico')
+
+    response = client.get('/api/export/items', params={'unidade_medida': 'quilograma'})
+
+    assert response.headers['content-type'] == 'application/x-ndjson'
+    rows = [json.loads(line) for line in response.text.splitlines()]
+    assert [(row['produto'], row['unidade_medida']) for row in rows] == [('Cimento', 'quilograma')]
+
+
+def test_export_movements_as_csv(client, create_item):
+    cimento, areia = create_item(produto='Cimento'), create_item(produto='Areia')
+    client.post(f'/api/items/{cimento["id"]}/movements', json={'quantidade': -4.0})
+    client.post(f'/api/items/{areia["id"]}/movements', json={'quantidade': -1.0})
+
+    response = client.get(
+        '/api/export/movements', params={'format': 'csv', 'produto_id': cimento['id'], 'movimentacao': 'saida'}
+    )
+
+    assert response.headers['content-disposition'] == 'attachment; filename="movements.csv"'
+    rows = list(csv.DictReader(io.StringIO(response.text)))
+    assert [(row['movimentacao'], row['quantidade'], row['estoque_final']) for row in rows] == [('saida', '4.0', '6.0')]
+
+
+def test_export_is_written_in_chunks(create_item):
+    for number in range(5):
+        create_item(produto=f'Produto {number}')
+    statement = crud.export_items_statement(ItemExportQuery(format='csv'))
+
+    chunks = list(exporter.stream_rows(SessionLocal, statement, 'csv', chunk_size=2))
+
+    assert chunks[0].startswith(b'id,produto,')
+    assert [len(chunk.splitlines()) for chunk in chunks[1:]] == [2, 2, 1]
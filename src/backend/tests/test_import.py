@@ -0,0 +1,61 @@
+import asyncio
+
+from controller import importer
+from sqlalchemy.exc import IntegrityError
+
+CSV_HEADER = 'produto,unidade_medida,custo_medio,valor_venda,estoque\n'
+
+
+def import_csv(client, body, **params):
+    return client.post(
+        '/api/items/import', params=params, content=(CSV_HEADER + body).encode(), headers={'Content-Type': 'text/csv'}
+    )
+
+
+def test_import_inserts_items_and_reports_invalid_lines(client):
+    body = 'Cimento,quilograma,2,3,10\nAreia,galao,1,2,5\nBrita,quilograma,1,2,0\n'
+
+    report = import_csv(client, body, batch_size=2).json()
+
+    assert report['inserted'] == 2
+    assert report['failed'] == 1
+    assert [error['line'] for error in report['errors']] == [3]
+    items = client.get('/api/items', params={'sort': 'produto'}).json()['items']
+    assert [item['produto'] for item in items] == ['Brita', 'Cimento']
+
+
+def test_import_reads_empty_csv_fields_as_missing(client):
+    report = import_csv(client, 'Cimento,quilograma,,3,10\n').json()
+
+    assert report['inserted'] == 0
+    assert report['errors'][0]['error'].startswith('custo_medio:')
+    assert 'float' not in report['errors'][0]['error']
+
+
+def test_import_ndjson(client):
+    body = (
+        '{"produto": "Cimento", "unidade_medida": "quilograma", "custo_medio": 2, "valor_venda": 3, "estoque": 4}\n[]\n'
+    )
+
+    report = client.post('/api/items/import', content=body.encode(), headers={'Content-Type': 'application/x-ndjson'})
+
+    assert report.json()['inserted'] == 1
+    assert report.json()['errors'] == [{'line': 2, 'error': 'Cada linha deve ser um objeto JSON'}]
+
+
+def test_failed_batch_reports_only_its_bad_lines():
+    async def chunks():
+        yield (CSV_HEADER + 'Cimento,quilograma,2,3,10\nRuim,quilograma,2,3,10\nAreia,quilograma,1,2,5\n').encode()
+
+    async def insert_batch(items):
+        if any(item.produto == 'Ruim' for item in items):
+            raise IntegrityError('INSERT', {}, Exception('violação'))
+        return len(items)
+
+    report = asyncio.run(importer.import_items(chunks(), 'csv', 10, insert_batch))
+
+    assert report == {
+        'inserted': 2,
+        'failed': 1,
+        'errors': [{'line': 3, 'error': 'Erro ao inserir a linha: IntegrityError'}],
+    }
@@ -0,0 +1,135 @@
+import asyncio
+import threading
+
+from controller import cache, serialization
+
+ITEM = {'produto': 'Cimento', 'unidade_medida': 'quilograma', 'custo_medio': 2.0, 'valor_venda': 3.0, 'estoque': 10.0}
+
+
+def test_empty_page_is_not_an_error(client):
+    response = client.get('/api/items')
+
+    assert response.status_code == 200
+    assert response.json() == {'items': [], 'next_cursor': None}
+
+
+def test_keyset_pages_cover_every_item_once(client, create_item):
+    created = [create_item(produto=f'Produto {number:02d}')['id'] for number in range(7)]
+
+    for sort, order in (('id', 'asc'), ('id', 'desc'), ('produto', 'asc'), ('produto', 'desc')):
+        seen, cursor = [], None
+        while True:
+            params = {'limit': 3, 'sort': sort, 'order': order}
+            if cursor:
+                params['after'] = cursor
+            page = client.get('/api/items', params=params).json()
+            seen.extend(item['id'] for item in page['items'])
+            cursor = page['next_cursor']
+            if cursor is None:
+                break
+        assert sorted(seen) == created
+        assert len(seen) == len(set(seen))
+
+
+def test_cursor_of_another_sort_is_rejected(client, create_item):
+    for number in range(3):
+        create_item(produto=f'Produto {number}')
+    cursor = client.get('/api/items', params={'limit': 1}).json()['next_cursor']
+
+    response = client.get('/api/items', params={'limit': 1, 'sort': 'produto', 'after': cursor})
+
+    assert response.status_code == 400
+
+
+def test_item_reads_are_cached_until_a_write(client, create_item):
+    item = create_item()
+    client.get(f'/api/items/{item["id"]}')
+    client.get('/api/items')
+
+    assert client.get(f'/api/items/{item["id"]}').json() == item
+    client.get('/api/items')
+    assert client.get('/api/cache/stats').json()['hits'] == 2
+
+    client.post(f'/api/items/{item["id"]}/movements', json={'quantidade': 1})
+    assert client.get(f'/api/items/{item["id"]}').json()['estoque'] == 11.0
+    assert client.get('/api/items').json()['items'][0]['estoque'] == 11.0
+
+
+def test_blocking_cache_operations_run_off_the_event_loop(monkeypatch):
+    class BlockingCache(cache.MemoryCache):
+        blocking = True
+
+        def get(self, key):
+            threads.append(threading.current_thread())
+            return super().get(key)
+
+    threads = []
+    monkeypatch.setattr(cache, 'cache', BlockingCache())
+
+    async def load():
+        return 'valor'
+
+    assert asyncio.run(cache.read_through('chave', load)) == 'valor'
+    assert threads and threads[0] is not threading.main_thread()
+
+
+def test_memory_cache_is_not_the_default_with_several_workers():
+    assert cache.default_backend(1) == 'memory'
+    assert cache.default_backend(4) == 'none'
+
+
+def test_if_none_match_returns_304_until_the_item_changes(client, create_item):
+    item = create_item()
+    current = client.get(f'/api/items/{item["id"]}').headers['ETag']
+
+    assert client.get(f'/api/items/{item["id"]}', headers={'If-None-Match': current}).status_code == 304
+    assert client.get(f'/api/items/{item["id"]}', headers={'If-None-Match': f'W/{current}'}).status_code == 304
+
+    client.post(f'/api/items/{item["id"]}/movements', json={'quantidade': 1})
+    response = client.get(f'/api/items/{item["id"]}', headers={'If-None-Match': current})
+    assert response.status_code == 200
+    assert response.headers['ETag'] != current
+
+
+def test_list_etag_changes_after_a_write(client, create_item):
+    item = create_item()
+    current = client.get('/api/items').headers['ETag']
+
+    assert client.get('/api/items', headers={'If-None-Match': current}).status_code == 304
+
+    client.post(f'/api/items/{item["id"]}/movements', json={'quantidade': 1})
+    assert client.get('/api/items', headers={'If-None-Match': current}).status_code == 200
+
+
+def test_if_match_rejects_a_stale_update(client, create_item):
+    item = create_item()
+    stale = client.get(f'/api/items/{item["id"]}').headers['ETag']
+    response = client.put(f'/api/items/{item["id"]}', json={**ITEM, 'valor_venda': 4.0}, headers={'If-Match': stale})
+    assert response.status_code == 200
+    assert response.json()['versao'] == item['versao'] + 1
+
+    response = client.put(f'/api/items/{item["id"]}', json={**ITEM, 'valor_venda': 5.0}, headers={'If-Match': stale})
+
+    assert response.status_code == 412
+    assert client.get(f'/api/items/{item["id"]}').json()['valor_venda'] == 4.0
+
+
+def test_weak_if_match_never_matches(client, create_item):
+    item = create_item()
+    current = client.get(f'/api/items/{item["id"]}').headers['ETag']
+
+    response = client.put(f'/api/items/{item["id"]}', json=ITEM, headers={'If-Match': f'W/{current}'})
+
+    assert response.status_code == 412
+
+
+def test_fast_json_lists_match_the_validated_responses(client, create_item, monkeypatch):
+    item = create_item()
+    client.post(f'/api/items/{item["id"]}/movements', json={'quantidade': -1.5})
+    paths = ('/api/items', f'/api/movements/{item["id"]}')
+    fast = [client.get(path).json() for path in paths]
+
+    monkeypatch.setattr(serialization, 'FAST_JSON', False)
+    cache.cache = cache.create_cache('memory')
+
+    assert [client.get(path).json() for path in paths] == fast
@@ -0,0 +1,144 @@
+import pytest
+from controller import crud
+from models.database import SessionLocal, engine
+from models.models import DEFAULT_LOCATION_ID
+from schemas.schema import TransferCreate
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError
+
+
+@pytest.fixture
+def warehouse(client):
+    response = client.post('/api/locations', json={'nome': 'Depósito B'})
+    assert response.status_code == 200, response.text
+    return response.json()['id']
+
+
+def stock_by_location(client, item_id):
+    stock = client.get(f'/api/items/{item_id}/stock').json()
+    locations = {location['local_id']: location['estoque'] for location in stock['locais']}
+    # O estoque do item é sempre o total dos locais
+    assert stock['estoque'] == pytest.approx(sum(locations.values()))
+    return locations
+
+
+def test_location_names_are_unique(client, warehouse):
+    assert client.post('/api/locations', json={'nome': ' Depósito B '}).status_code == 409
+    assert client.post('/api/locations', json={'nome': '  '}).status_code == 422
+    assert [location['nome'] for location in client.get('/api/locations').json()] == ['Principal', 'Depósito B']
+
+
+def test_transfer_moves_stock_between_locations(client, create_item, warehouse):
+    item = create_item(estoque=10.0)
+
+    response = client.post(
+        '/api/transfers',
+        json={'produto_id': item['id'], 'origem_id': DEFAULT_LOCATION_ID, 'destino_id': warehouse, 'quantidade': 4},
+    )
+
+    assert response.status_code == 200
+    transfer = response.json()
+    assert (transfer['saida']['local_id'], transfer['saida']['estoque_final']) == (DEFAULT_LOCATION_ID, 6.0)
+    assert (transfer['entrada']['local_id'], transfer['entrada']['estoque_final']) == (warehouse, 4.0)
+    assert stock_by_location(client, item['id']) == {DEFAULT_LOCATION_ID: 6.0, warehouse: 4.0}
+    # A transferência não altera o total nem a versão do item
+    assert client.get(f'/api/items/{item["id"]}').json()['versao'] == item['versao']
+
+
+def test_transfer_fails_without_changes(client, create_item, warehouse):
+    item = create_item(estoque=2.0)
+    transfer = {'produto_id': item['id'], 'origem_id': DEFAULT_LOCATION_ID, 'destino_id': warehouse}
+
+    assert client.post('/api/transfers', json={**transfer, 'quantidade': 3}).status_code == 409
+    assert client.post('/api/transfers', json={**transfer, 'destino_id': 99, 'quantidade': 1}).status_code == 404
+    assert client.post('/api/transfers', json={**transfer, 'produto_id': 999, 'quantidade': 1}).status_code == 404
+    assert (
+        client.post('/api/transfers', json={**transfer, 'destino_id': DEFAULT_LOCATION_ID, 'quantidade': 1}).status_code
+        == 422
+    )
+    response = client.post(
+        '/api/transfers',
+        content=f'{{"produto_id": {item["id"]}, "origem_id": 1, "destino_id": {warehouse}, "quantidade": NaN}}',
+        headers={'Content-Type': 'application/json'},
+    )
+    assert response.status_code == 422
+    assert stock_by_location(client, item['id']) == {DEFAULT_LOCATION_ID: 2.0}
+
+
+def test_movements_and_batches_respect_the_location_stock(client, create_item, warehouse):
+    item = create_item(estoque=5.0)
+    client.post(f'/api/items/{item["id"]}/movements', json={'quantidade': 3, 'local_id': warehouse})
+
+    assert (
+        client.post(f'/api/items/{item["id"]}/movements', json={'quantidade': -4, 'local_id': warehouse}).status_code
+        == 409
+    )
+    assert client.post(f'/api/items/{item["id"]}/movements', json={'quantidade': 1, 'local_id': 99}).status_code == 404
+
+    report = client.post(
+        '/api/movements/batch',
+        json={
+            'mode': 'best_effort',
+            'lines': [
+                {'produto_id': item['id'], 'quantidade': -2, 'local_id': warehouse},
+                {'produto_id': item['id'], 'quantidade': -2, 'local_id': warehouse},
+                {'produto_id': item['id'], 'quantidade': -5},
+            ],
+        },
+    ).json()
+
+    assert (report['applied'], report['failed']) == (2, 1)
+    assert report['errors'][0]['line'] == 2
+    assert stock_by_location(client, item['id']) == {DEFAULT_LOCATION_ID: 0.0, warehouse: 1.0}
+    history = client.get(f'/api/movements/{item["id"]}', params={'local_id': warehouse}).json()['movements']
+    assert [movement['estoque_final'] for movement in history] == [3.0, 1.0]
+
+
+def test_location_report_splits_the_valuation(client, create_item, warehouse):
+    item = create_item(estoque=10.0, custo_medio=2.0, valor_venda=3.0)
+    client.post(
+        '/api/transfers',
+        json={'produto_id': item['id'], 'origem_id': DEFAULT_LOCATION_ID, 'destino_id': warehouse, 'quantidade': 4},
+    )
+
+    report = {row['local_id']: row for row in client.get('/api/reports/locations').json()}
+
+    assert report[DEFAULT_LOCATION_ID]['estoque'] == 6.0
+    assert report[warehouse]['valor_estoque'] == pytest.approx(8.0)
+    total = client.get('/api/reports/valuation').json()['total']
+    assert sum(row['valor_estoque'] for row in report.values()) == pytest.approx(total['valor_estoque'])
+
+
+def test_transfers_stay_out_of_the_daily_report(client, create_item, warehouse):
+    item = create_item(estoque=10.0)
+    client.post(
+        '/api/transfers',
+        json={'produto_id': item['id'], 'origem_id': DEFAULT_LOCATION_ID, 'destino_id': warehouse, 'quantidade': 4},
+    )
+
+    (day,) = client.get('/api/reports/movements/daily').json()
+
+    assert (day['entrada'], day['saida'], day['movimentos']) == (10.0, 0.0, 1)
+    client.post('/api/reports/rebuild')
+    assert client.get('/api/reports/movements/daily').json() == [day]
+    # Remover o item desconta do resumo apenas as movimentações que entraram nele
+    client.delete(f'/api/items/{item["id"]}')
+    assert client.get('/api/reports/movements/daily').json() == []
+
+
+def test_transfers_only_wait_for_item_deletions(postgresql, create_item, warehouse):
+    item = create_item(estoque=10.0)
+    transfer = TransferCreate(produto_id=item['id'], origem_id=DEFAULT_LOCATION_ID, destino_id=warehouse, quantidade=1)
+
+    with engine.connect() as holder, SessionLocal() as db:
+        db.execute(text("SET lock_timeout = '1s'"))
+        # Uma movimentação em andamento atualiza a linha do item, sem alterar a chave
+        holder.execute(text('UPDATE items SET versao = versao + 1 WHERE id = :id'), {'id': item['id']})
+        assert crud.transfer_stock(db, transfer) is not None
+        holder.rollback()
+
+        # Uma exclusão bloqueia a linha com FOR UPDATE, que conflita com o FOR KEY SHARE da transferência
+        holder.execute(text('SELECT id FROM items WHERE id = :id FOR UPDATE'), {'id': item['id']})
+        with pytest.raises(OperationalError, match='lock timeout'):
+            crud.transfer_stock(db, transfer)
+        holder.rollback()
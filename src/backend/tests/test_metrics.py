@@ -0,0 +1,44 @@
+import re
+
+import pytest
+from models import database
+from sqlalchemy import text
+from sqlalchemy.exc import DBAPIError
+
+
+def metric(document, name, **labels):
+    """Get the value of a sample of the Prometheus document, 0 when it is missing."""
+    rendered = ','.join(f'{key}="{value}"' for key, value in labels.items())
+    sample = f'{name}{{{rendered}}}' if labels else name
+    match = re.search(rf'^{re.escape(sample)} (\S+)$', document, re.M)
+    return float(match.group(1)) if match else 0.0
+
+
+def test_metrics_count_requests_and_their_statements(client, create_item):
+    item = create_item()
+    route = {'method': 'GET', 'route': '/items/{item_id}'}
+    # As métricas são globais ao processo e acumulam as requisições dos outros testes
+    before = client.get('/metrics').text
+    client.get(f'/api/items/{item["id"]}')
+    client.get('/api/items/999')
+
+    after = client.get('/metrics').text
+
+    def increase(name, **labels):
+        return metric(after, name, **route, **labels) - metric(before, name, **route, **labels)
+
+    assert increase('http_requests_total', status=200) == 1
+    assert increase('http_requests_total', status=404) == 1
+    assert increase('http_request_duration_seconds_count') == 2
+    assert increase('http_request_db_statements_sum') >= 2
+    assert metric(after, 'db_statement_duration_seconds_count') > 0
+
+
+def test_failed_statements_raise_their_own_error():
+    errors = database.query_metrics.errors
+
+    with pytest.raises(DBAPIError):
+        with database.engine.connect() as connection:
+            connection.execute(text('SELECT * FROM tabela_inexistente'))
+
+    assert database.query_metrics.errors == errors + 1
@@ -0,0 +1,112 @@
+import threading
+
+from controller import partitions
+from migrations.runner import MIGRATION_LOCK_KEY, migrate, migration_status
+from migrations.versions import MIGRATIONS
+from models.database import Base, engine
+from sqlalchemy import create_engine, inspect, text
+
+# Dados gravados pela primeira versão da aplicação, antes das migrações seguintes
+LEGACY_ROWS = (
+    'INSERT INTO items (id, produto, unidade_medida, custo_medio, valor_venda, estoque) '
+    "VALUES (1, 'Cimento', 'QUILOGRAMA', 2.0, 3.0, 10.0)",
+    'INSERT INTO stock_movements_history (id, data, movimentacao, produto_id, quantidade, estoque_final) '
+    "VALUES (1, '2026-01-05 00:00:00+00:00', 'ENTRADA', 1, 10.0, 10.0)",
+)
+
+
+def upgrade_legacy_database(database_engine):
+    """Create the first version of the schema with data and apply the remaining migrations."""
+    migrate(database_engine, MIGRATIONS, target=1)
+    with database_engine.begin() as connection:
+        for statement in LEGACY_ROWS:
+            connection.execute(text(statement))
+    migrate(database_engine, MIGRATIONS)
+
+
+def assert_upgraded(database_engine):
+    """Check the data of :func:`upgrade_legacy_database` after the migrations."""
+    with database_engine.begin() as connection:
+        assert connection.execute(text('SELECT versao FROM items')).scalar() == 1
+        assert connection.execute(text('SELECT itens, estoque FROM valuation_summary')).all() == [(1, 10.0)]
+        assert connection.execute(text('SELECT quantidade, movimentos FROM daily_movement_summary')).all() == [
+            (10.0, 1)
+        ]
+        assert connection.execute(text('SELECT geracao FROM search_generation')).scalar() == 0
+        # O estoque e o histórico anteriores aos locais ficam no local padrão, e novos locais seguem a sequência
+        assert connection.execute(text('SELECT produto_id, local_id, estoque FROM item_stocks')).all() == [(1, 1, 10.0)]
+        assert connection.execute(text('SELECT local_id, transferencia FROM stock_movements_history')).all() == [
+            (1, False)
+        ]
+        connection.execute(text("INSERT INTO locations (nome) VALUES ('Depósito B')"))
+        assert connection.execute(text('SELECT id, nome FROM locations ORDER BY id')).all() == [
+            (1, 'Principal'),
+            (2, 'Depósito B'),
+        ]
+        # A data das novas movimentações vem do banco
+        connection.execute(
+            text(
+                'INSERT INTO stock_movements_history (movimentacao, produto_id, quantidade, estoque_final) '
+                "VALUES ('SAIDA', 1, 4.0, 6.0)"
+            )
+        )
+        assert connection.execute(text('SELECT count(data) FROM stock_movements_history')).scalar() == 2
+
+
+def test_migrations_are_idempotent(tmp_path):
+    new_engine = create_engine(f'sqlite:///{tmp_path / "new.db"}')
+
+    assert len(migrate(new_engine, MIGRATIONS)) == len(MIGRATIONS)
+    assert migrate(new_engine, MIGRATIONS) == []
+    assert all(known['aplicada'] for known in migration_status(new_engine, MIGRATIONS))
+
+
+def test_migrated_schema_matches_the_models():
+    inspector = inspect(engine)
+
+    for table in Base.metadata.sorted_tables:
+        columns = {column['name'] for column in inspector.get_columns(table.name)}
+        assert columns == set(table.columns.keys()), table.name
+        indexes = {index['name'] for index in inspector.get_indexes(table.name)}
+        # Índices restritos a um dialeto, como o de trigramas do PostgreSQL, só existem nele
+        expected = {
+            index.name
+            for index in table.indexes
+            if index._ddl_if is None or index._ddl_if.dialect == engine.dialect.name
+        }
+        assert expected <= indexes, table.name
+
+
+def test_migrations_upgrade_a_legacy_sqlite_database(tmp_path):
+    legacy_engine = create_engine(f'sqlite:///{tmp_path / "legacy.db"}')
+
+    upgrade_legacy_database(legacy_engine)
+
+    assert_upgraded(legacy_engine)
+
+
+def test_migrations_partition_a_legacy_postgresql_history(postgresql, empty_database):
+    upgrade_legacy_database(engine)
+
+    assert_upgraded(engine)
+    with engine.connect() as connection:
+        assert partitions.is_partitioned(connection)
+    names = [partition['name'] for partition in partitions.list_partitions(engine)]
+    assert 'stock_movements_history_p2026_01' in names
+    with engine.begin() as connection:
+        connection.execute(text('DELETE FROM items'))
+        assert connection.execute(text('SELECT count(*) FROM stock_movements_history')).scalar() == 0
+
+
+def test_concurrent_migrations_wait_for_the_advisory_lock(postgresql):
+    result = []
+    with engine.connect() as holder:
+        holder.execute(text('SELECT pg_advisory_lock(:key)'), {'key': MIGRATION_LOCK_KEY})
+        runner = threading.Thread(target=lambda: result.append(migrate(engine, MIGRATIONS)))
+        runner.start()
+        runner.join(timeout=0.5)
+        assert runner.is_alive()
+        holder.execute(text('SELECT pg_advisory_unlock(:key)'), {'key': MIGRATION_LOCK_KEY})
+        runner.join(timeout=10)
+
+    assert result == [[]]
@@ -0,0 +1,188 @@
+import pytest
+
+ITEM = {'produto': 'Cimento', 'unidade_medida': 'quilograma', 'custo_medio': 2.0, 'valor_venda': 3.0, 'estoque': 10.0}
+
+
+def history_of(client, item_id, **params):
+    return client.get(f'/api/movements/{item_id}', params=params).json()['movements']
+
+
+def test_stock_changes_write_their_movements(client, create_item):
+    item = create_item(estoque=10.0)
+
+    client.put(f'/api/items/{item["id"]}', json={**ITEM, 'estoque': 4.0})
+    client.put(f'/api/items/{item["id"]}', json={**ITEM, 'estoque': 6.0})
+
+    history = history_of(client, item['id'])
+    assert [(movement['movimentacao'], movement['quantidade']) for movement in history] == [
+        ('entrada', 10.0),
+        ('saida', 6.0),
+        ('entrada', 2.0),
+    ]
+    assert [movement['estoque_final'] for movement in history] == [10.0, 4.0, 6.0]
+    assert all(movement['data'] for movement in history)
+
+
+def test_movements_change_the_stock_atomically(client, create_item):
+    item = create_item(estoque=10.0)
+
+    response = client.post(f'/api/items/{item["id"]}/movements', json={'quantidade': -4.0})
+    assert response.status_code == 200, response.text
+    assert response.json()['movimentacao'] == 'saida'
+    assert response.json()['estoque_final'] == 6.0
+
+    response = client.post(f'/api/items/{item["id"]}/movements', json={'quantidade': 3.0, 'movimentacao': 'saida'})
+    assert response.json()['estoque_final'] == 3.0
+    assert client.get(f'/api/items/{item["id"]}').json()['estoque'] == 3.0
+
+
+def test_movement_leaving_negative_stock_is_a_conflict(client, create_item):
+    item = create_item(estoque=2.0)
+
+    response = client.post(f'/api/items/{item["id"]}/movements', json={'quantidade': -3.0})
+
+    assert response.status_code == 409
+    assert client.get(f'/api/items/{item["id"]}').json()['estoque'] == 2.0
+    assert len(history_of(client, item['id'])) == 1
+
+
+def test_movement_of_missing_item_is_not_found(client):
+    assert client.post('/api/items/999/movements', json={'quantidade': 1.0}).status_code == 404
+
+
+@pytest.mark.parametrize('quantidade', ['Infinity', '-Infinity', 'NaN', '0'])
+def test_invalid_movement_quantities_are_rejected(client, create_item, quantidade):
+    item = create_item(estoque=10.0)
+
+    response = client.post(
+        f'/api/items/{item["id"]}/movements',
+        content=f'{{"quantidade": {quantidade}}}',
+        headers={'Content-Type': 'application/json'},
+    )
+
+    assert response.status_code == 422
+    assert client.get(f'/api/items/{item["id"]}').json()['estoque'] == 10.0
+
+
+def test_non_finite_item_stock_is_rejected(client):
+    response = client.post(
+        '/api/items',
+        content='{"produto": "Areia", "unidade_medida": "quilograma", "custo_medio": 1, "valor_venda": 2, "estoque": NaN}',
+        headers={'Content-Type': 'application/json'},
+    )
+
+    assert response.status_code == 422
+    assert response.json()['detail'][0]['input'] == 'nan'
+
+
+def test_entrada_updates_the_weighted_average_cost(client, create_item):
+    item = create_item(estoque=10.0, custo_medio=2.0)
+
+    response = client.post(f'/api/items/{item["id"]}/movements', json={'quantidade': 10.0, 'custo_unitario': 4.0})
+
+    assert response.json()['custo_unitario'] == 4.0
+    assert client.get(f'/api/items/{item["id"]}').json()['custo_medio'] == pytest.approx(3.0)
+
+
+@pytest.mark.parametrize(
+    'body', ['{"quantidade": -1, "custo_unitario": 4}', '{"quantidade": 1, "custo_unitario": Infinity}']
+)
+def test_invalid_unit_costs_are_rejected(client, create_item, body):
+    item = create_item(estoque=10.0, custo_medio=2.0)
+
+    response = client.post(
+        f'/api/items/{item["id"]}/movements', content=body, headers={'Content-Type': 'application/json'}
+    )
+
+    assert response.status_code == 422
+    assert client.get(f'/api/items/{item["id"]}').json()['custo_medio'] == 2.0
+
+
+def test_movement_batch_updates_the_weighted_average_cost(client, create_item):
+    item = create_item(estoque=10.0, custo_medio=2.0)
+    lines = [
+        {'produto_id': item['id'], 'quantidade': 10.0, 'custo_unitario': 4.0},
+        {'produto_id': item['id'], 'quantidade': -5.0},
+        {'produto_id': item['id'], 'quantidade': 5.0, 'custo_unitario': 6.0},
+    ]
+
+    assert client.post('/api/movements/batch', json={'lines': lines}).json()['applied'] == 3
+
+    item = client.get(f'/api/items/{item["id"]}').json()
+    assert (item['estoque'], item['custo_medio']) == (20.0, pytest.approx(3.75))
+
+
+def test_movement_batch_all_or_nothing_rejects_the_whole_batch(client, create_item):
+    cimento = create_item(estoque=10.0)
+    areia = create_item(produto='Areia', estoque=1.0)
+
+    response = client.post(
+        '/api/movements/batch',
+        json={
+            'lines': [
+                {'produto_id': cimento['id'], 'quantidade': -4.0},
+                {'produto_id': areia['id'], 'quantidade': -2.0},
+            ]
+        },
+    )
+
+    assert response.status_code == 409
+    assert response.json()['detail']['errors'] == [
+        {'line': 2, 'produto_id': areia['id'], 'error': 'Estoque insuficiente no local para a movimentação'}
+    ]
+    assert client.get(f'/api/items/{cimento["id"]}').json()['estoque'] == 10.0
+
+
+def test_movement_batch_best_effort_applies_the_valid_lines(client, create_item):
+    item = create_item(estoque=10.0)
+    lines = [
+        {'produto_id': item['id'], 'quantidade': -4.0},
+        {'produto_id': item['id'], 'quantidade': -7.0},
+        {'produto_id': 999, 'quantidade': 1.0},
+        {'produto_id': item['id'], 'quantidade': 2.0, 'movimentacao': 'entrada'},
+    ]
+
+    report = client.post('/api/movements/batch', json={'lines': lines, 'mode': 'best_effort'}).json()
+
+    assert (report['applied'], report['failed']) == (2, 2)
+    assert [error['line'] for error in report['errors']] == [2, 3]
+    assert client.get(f'/api/items/{item["id"]}').json()['estoque'] == 8.0
+    assert [movement['estoque_final'] for movement in history_of(client, item['id'])] == [10.0, 6.0, 8.0]
+
+
+def test_history_is_paginated_in_chronological_order(client, create_item):
+    item = create_item(estoque=10.0)
+    for quantidade in (1.0, -2.0, 3.0, -4.0):
+        client.post(f'/api/items/{item["id"]}/movements', json={'quantidade': quantidade})
+
+    for order, expected in (('asc', [10.0, 11.0, 9.0, 12.0, 8.0]), ('desc', [8.0, 12.0, 9.0, 11.0, 10.0])):
+        stocks, after = [], None
+        while True:
+            page = client.get(
+                f'/api/movements/{item["id"]}',
+                params={'limit': 2, 'order': order, **({'after': after} if after else {})},
+            ).json()
+            stocks += [movement['estoque_final'] for movement in page['movements']]
+            after = page['next_cursor']
+            if after is None:
+                break
+        assert stocks == expected
+
+
+def test_history_filters_by_movement_type(client, create_item):
+    item = create_item(estoque=10.0)
+    client.post(f'/api/items/{item["id"]}/movements', json={'quantidade': -2.0})
+
+    saidas = history_of(client, item['id'], movimentacao='saida')
+
+    assert [movement['estoque_final'] for movement in saidas] == [8.0]
+
+
+def test_empty_history_page_is_not_an_error(client, create_item):
+    item = create_item(estoque=10.0)
+
+    response = client.get(f'/api/movements/{item["id"]}', params={'movimentacao': 'saida'})
+
+    assert response.status_code == 200
+    assert response.json() == {'movements': [], 'next_cursor': None}
+    assert client.get('/api/movements/999').json()['movements'] == []
@@ -0,0 +1,46 @@
+import csv
+import gzip
+from datetime import date, datetime, timezone
+
+from controller import partitions
+from models.database import engine
+from models.models import StockMovementHistory, StockSnapshot
+from sqlalchemy import select, update
+
+
+def test_history_is_partitioned_by_month(postgresql, client, create_item):
+    item = create_item(estoque=10.0)
+    month = partitions.add_months(datetime.now(timezone.utc).date(), 0)
+
+    names = [partition['name'] for partition in client.get('/api/partitions').json()]
+
+    assert partitions.partition_name(month) in names
+    assert partitions.partition_name(partitions.add_months(month, partitions.PARTITION_MONTHS_AHEAD)) in names
+    assert f'{partitions.TABLE_NAME}_default' in names
+    assert client.get(f'/api/movements/{item["id"]}').json()['movements'][0]['estoque_final'] == 10.0
+
+
+def test_expired_partition_is_exported_and_dropped(postgresql, client, db, create_item):
+    item = create_item(estoque=10.0)
+    client.post(f'/api/items/{item["id"]}/movements', json={'quantidade': -4.0})
+    old_month = date(2020, 1, 1)
+    partitions.ensure_partitions(engine, today=old_month)
+    first_id = db.scalar(select(StockMovementHistory.id).where(StockMovementHistory.produto_id == item['id']))
+    db.execute(
+        update(StockMovementHistory)
+        .where(StockMovementHistory.id == first_id)
+        .values(data=datetime(2020, 1, 15, tzinfo=timezone.utc))
+    )
+    db.commit()
+
+    (path,) = partitions.archive_expired_partitions(engine, today=date(2020, 3, 10), retention_months=1)
+
+    with gzip.open(path, 'rt', newline='') as file:
+        rows = list(csv.DictReader(file))
+    assert [int(row['id']) for row in rows] == [first_id]
+    names = [partition['name'] for partition in partitions.list_partitions(engine)]
+    assert partitions.partition_name(old_month) not in names
+    assert partitions.partition_name(date(2020, 2, 1)) in names
+    assert db.scalar(select(StockSnapshot.data)) == datetime(2020, 2, 1, tzinfo=timezone.utc)
+    history = client.get(f'/api/movements/{item["id"]}').json()['movements']
+    assert [movement['estoque_final'] for movement in history] == [6.0]
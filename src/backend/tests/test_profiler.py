@@ -0,0 +1,45 @@
+import pstats
+
+import orjson
+import pytest
+from fastapi.testclient import TestClient
+from main import app
+from models.database import async_engine
+from monitoring.profiler import ProfilerMiddleware
+
+ITEM = {'produto': 'Cimento', 'unidade_medida': 'quilograma', 'custo_medio': 2.0, 'valor_venda': 3.0, 'estoque': 10.0}
+
+
+@pytest.fixture
+def profiled(tmp_path):
+    """Get a client of the application wrapped by the profiler, writing into a temporary directory."""
+    with TestClient(ProfilerMiddleware(app, directory=str(tmp_path))) as test_client:
+        yield test_client
+        if async_engine is not None:
+            test_client.portal.call(async_engine.dispose)
+
+
+def test_requests_without_the_header_are_not_profiled(profiled, tmp_path):
+    response = profiled.get('/api/items')
+
+    assert response.status_code == 200
+    assert 'x-profile-file' not in response.headers
+    assert not list(tmp_path.iterdir())
+
+
+def test_sampling_profile_writes_collapsed_stacks_and_speedscope(profiled, tmp_path):
+    profiled.post('/api/items', json=ITEM)
+
+    response = profiled.get('/api/items', headers={'X-Profile': 'sampling'})
+
+    name = response.headers['x-profile-file']
+    assert response.json()['items']
+    assert (tmp_path / f'{name}.collapsed.txt').exists()
+    assert orjson.loads((tmp_path / f'{name}.speedscope.json').read_bytes())['name'] == name
+
+
+def test_cprofile_profile_writes_pstats(profiled, tmp_path):
+    response = profiled.get('/api/items', headers={'X-Profile': 'cprofile'})
+
+    stats = pstats.Stats(str(tmp_path / f'{response.headers["x-profile-file"]}.prof'))
+    assert stats.total_calls > 0
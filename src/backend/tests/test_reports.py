@@ -0,0 +1,79 @@
+import time
+from datetime import datetime, timezone
+
+import pytest
+from controller import crud
+
+
+def approx_report(report):
+    """Compare the report values with a tolerance, as the summaries add floats in another order."""
+    if isinstance(report, dict):
+        return {key: approx_report(value) for key, value in report.items()}
+    if isinstance(report, list):
+        return [approx_report(value) for value in report]
+    if isinstance(report, float):
+        return pytest.approx(report)
+    return report
+
+
+def test_valuation_report(client, create_item):
+    create_item(produto='Cimento', estoque=10.0, custo_medio=2.0, valor_venda=3.0)
+    create_item(produto='Areia', estoque=4.0, custo_medio=1.5, valor_venda=2.5, unidade_medida='metro')
+
+    valuation = client.get('/api/reports/valuation').json()
+
+    assert valuation['total']['itens'] == 2
+    assert valuation['total']['valor_estoque'] == pytest.approx(26.0)
+    assert valuation['total']['receita_potencial'] == pytest.approx(40.0)
+
+
+def test_daily_movements_report(client, create_item):
+    item = create_item(estoque=10.0)
+    client.post(f'/api/items/{item["id"]}/movements', json={'quantidade': -4.0})
+
+    (day,) = client.get('/api/reports/movements/daily').json()
+
+    assert (day['entrada'], day['saida'], day['movimentos']) == (10.0, 4.0, 2)
+
+
+def test_stock_as_of_uses_snapshots_and_later_movements(client, create_item):
+    item = create_item(estoque=10.0)
+    time.sleep(0.01)
+    assert client.post('/api/snapshots').status_code == 200
+    client.post(f'/api/items/{item["id"]}/movements', json={'quantidade': 5})
+    time.sleep(0.01)
+    middle = datetime.now(timezone.utc)
+    time.sleep(0.01)
+    client.post(f'/api/items/{item["id"]}/movements', json={'quantidade': -7})
+
+    def stock_at(moment):
+        page = client.get('/api/items/as-of', params={'at': moment.isoformat()}).json()
+        return {row['id']: row['estoque'] for row in page['items']}
+
+    assert stock_at(middle) == {item['id']: 15.0}
+    assert stock_at(datetime.now(timezone.utc)) == {item['id']: 8.0}
+    assert len(client.get('/api/snapshots').json()) == 1
+
+
+def test_summaries_match_a_rebuild(client, db, create_item):
+    cimento = create_item(produto='Cimento', estoque=10.0, custo_medio=2.0)
+    areia = create_item(produto='Areia', estoque=4.0, custo_medio=1.5, unidade_medida='metro')
+    brita = create_item(produto='Brita', estoque=3.0)
+    client.put(f'/api/items/{cimento["id"]}', json={**cimento, 'estoque': 12.0, 'valor_venda': 3.5})
+    client.post(f'/api/items/{areia["id"]}/movements', json={'quantidade': 1.3, 'movimentacao': 'saida'})
+    client.post(
+        '/api/movements/batch',
+        json={
+            'lines': [{'produto_id': cimento['id'], 'quantidade': -3.1}, {'produto_id': areia['id'], 'quantidade': 2}]
+        },
+    )
+    client.delete(f'/api/items/{brita["id"]}')
+    crud.archive_item(db, areia['id'])
+    crud.purge_item(db, areia['id'], batch_size=1)
+
+    valuation = client.get('/api/reports/valuation').json()
+    daily = client.get('/api/reports/movements/daily').json()
+
+    assert approx_report(client.post('/api/reports/rebuild').json()) == valuation
+    assert approx_report(client.get('/api/reports/movements/daily').json()) == daily
+    assert valuation['total']['itens'] == 1
@@ -0,0 +1,71 @@
+from controller import search
+from models.models import Item
+from sqlalchemy import text, update
+
+
+def search_names(client, term, **params):
+    return [item['produto'] for item in client.get('/api/items/search', params={'q': term, **params}).json()['items']]
+
+
+def test_search_ranks_the_best_match_first(client, create_item):
+    for produto in ('Cimento CP II', 'Cimento branco', 'Areia fina', 'Cal hidratada'):
+        create_item(produto=produto)
+
+    assert search_names(client, 'cimento branco') == ['Cimento branco', 'Cimento CP II']
+    assert search_names(client, 'aeria fina') == ['Areia fina']
+    assert search_names(client, 'cal') == ['Cal hidratada']
+
+
+def test_search_pages_follow_the_ranking(client, create_item):
+    for produto in ('Tijolo', 'Tijolo baiano', 'Tijolo maciço'):
+        create_item(produto=produto)
+
+    first = client.get('/api/items/search', params={'q': 'tijolo', 'limit': 2}).json()
+    second = client.get('/api/items/search', params={'q': 'tijolo', 'after': first['next_cursor']}).json()
+
+    assert [item['produto'] for item in first['items'] + second['items']] == [
+        'Tijolo',
+        'Tijolo baiano',
+        'Tijolo maciço',
+    ]
+    assert second['next_cursor'] is None
+    assert client.get('/api/items/search', params={'q': 'areia', 'after': first['next_cursor']}).status_code == 400
+
+
+def test_search_sees_renames_and_archived_items(client, create_item):
+    item = create_item(produto='Cimento')
+    areia = create_item(produto='Areia')
+    assert search_names(client, 'cimento') == ['Cimento']
+
+    client.put(f'/api/items/{item["id"]}', json={**item, 'produto': 'Argamassa'})
+    client.delete(f'/api/items/{areia["id"]}', params={'archive': True})
+
+    assert search_names(client, 'cimento') == []
+    assert search_names(client, 'argamassa') == ['Argamassa']
+    assert search_names(client, 'areia') == []
+
+
+def test_search_sees_names_committed_by_other_workers(client, db, create_item):
+    item = create_item(produto='Cimento')
+    assert search_names(client, 'cimento') == ['Cimento']
+
+    # Outro worker renomeia o item sem passar por este processo
+    db.execute(update(Item).where(Item.id == item['id']).values(produto='Argamassa'))
+    search.invalidate(db)
+    db.commit()
+
+    assert search_names(client, 'argamassa') == ['Argamassa']
+
+
+def test_search_uses_the_trigram_index(postgresql, client, db, create_item):
+    for number in range(20):
+        create_item(produto=f'Produto {number}')
+    statement, _ = search.trigram_search_statement('produto 7')
+    compiled = statement.limit(10).compile(db.get_bind())
+    db.execute(text('SET LOCAL enable_seqscan = off'))
+
+    cursor = db.connection().connection.cursor()
+    cursor.execute(f'EXPLAIN {compiled}', compiled.params)
+
+    assert any('ix_items_produto_trgm' in line for (line,) in cursor.fetchall())
+    assert search_names(client, 'produto 7')[0] == 'Produto 7'
@@ -1,22 +1,151 @@
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
 import pandas as pd
 import requests
 import streamlit as st
+from requests.adapters import HTTPAdapter
+from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
 
 API_URL = 'http://backend:8000/api'
+# Validade, em segundos, das leituras em cache; as escritas feitas pelo app invalidam o cache
+CACHE_TTL = int(os.getenv('FRONTEND_CACHE_TTL', '30'))
+# Conexões mantidas abertas com a API e requisições simultâneas por página
+POOL_SIZE = int(os.getenv('FRONTEND_POOL_SIZE', '10'))
+REQUEST_TIMEOUT = 10
+UNITS = ['litro', 'metro', 'quilograma', 'metro_cubico', 'quantidade']
+MOVEMENT_TYPES = ['entrada', 'saida']
+PAGE_SIZES = [25, 50, 100, 200]
+EMPTY_PAGE = {'items': [], 'next_cursor': None}
+
+
+class APIError(Exception):
+    """Error response from the API.
+
+    Attributes:
+        status_code (int): The HTTP status code.
+        text (str): The response body.
+    """
 
+    def __init__(self, status_code, text):
+        super().__init__(f'{status_code} - {text}')
+        self.status_code = status_code
+        self.text = text
 
-def get_items():
-    """Fetch all items from the API.
+
+@st.cache_resource
+def get_session():
+    """Get the HTTP session shared by every script run, with a pool of keep-alive connections.
 
     Returns:
-        list: A list of items if the request is successful, otherwise an empty list.
+        requests.Session: The session.
     """
-    response = requests.get(f'{API_URL}/items')
-    if response.status_code == 200:
-        return response.json()
-    else:
-        st.error(f'Erro: {response.status_code} - {response.text}')
-        return []
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=POOL_SIZE)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return session
+
+
+@st.cache_resource
+def get_executor():
+    """Get the thread pool used to fetch independent data at the same time.
+
+    Returns:
+        ThreadPoolExecutor: The thread pool.
+    """
+    return ThreadPoolExecutor(max_workers=POOL_SIZE, thread_name_prefix='api')
+
+
+def request_api(method, path, **kwargs):
+    """Send a request to the API through the shared session.
+
+    Args:
+        method (str): The HTTP method.
+        path (str): The path after the API URL.
+        **kwargs: Arguments for ``requests.Session.request``, such as ``params`` or ``json``.
+
+    Returns:
+        dict: The JSON response.
+
+    Raises:
+        APIError: If the response status is not 200.
+    """
+    response = get_session().request(method, f'{API_URL}{path}', timeout=REQUEST_TIMEOUT, **kwargs)
+    if response.status_code != 200:
+        raise APIError(response.status_code, response.text)
+    return response.json()
+
+
+@st.cache_data(ttl=CACHE_TTL, show_spinner=False)
+def fetch(path, params=None):
+    """Read from the API, caching the response for ``CACHE_TTL`` seconds.
+
+    Errors are raised and therefore never cached.
+
+    Args:
+        path (str): The path after the API URL.
+        params (dict): Optional query parameters.
+
+    Returns:
+        dict: The JSON response.
+    """
+    return request_api('GET', path, params=params)
+
+
+def send(method, path, **kwargs):
+    """Write through the API and discard the cached reads, which may now be outdated.
+
+    Args:
+        method (str): The HTTP method.
+        path (str): The path after the API URL.
+        **kwargs: Arguments for ``requests.Session.request``.
+
+    Returns:
+        dict: The JSON response.
+    """
+    try:
+        return request_api(method, path, **kwargs)
+    finally:
+        fetch.clear()
+
+
+def fetch_concurrently(*calls):
+    """Run independent fetch helpers at the same time.
+
+    Args:
+        *calls (tuple): The helper and its arguments, such as ``(get_item, 1)``.
+
+    Returns:
+        list: The result of each call, in order.
+    """
+    ctx = get_script_run_ctx()
+
+    def run(call):
+        # As threads do pool precisam do contexto da execução para exibir mensagens de erro
+        add_script_run_ctx(threading.current_thread(), ctx)
+        function, *args = call
+        return function(*args)
+
+    return list(get_executor().map(run, calls))
+
+
+def get_items(params=None):
+    """Fetch a page of items from the API.
+
+    Args:
+        params (dict): Optional pagination, sorting and filter query parameters.
+
+    Returns:
+        dict: The items in the page and the cursor for the next one; an empty page if the request fails.
+    """
+    try:
+        return fetch('/items', params)
+    except APIError as e:
+        st.error(f'Erro: {e.status_code} - {e.text}')
+        return EMPTY_PAGE
 
 
 def get_item(item_id):
@@ -28,11 +157,39 @@ def get_item(item_id):
     Returns:
         dict: The item data if the request is successful, otherwise None.
     """
-    response = requests.get(f'{API_URL}/items/{item_id}')
-    if response.status_code == 200:
-        return response.json()
-    else:
-        st.error(f'Erro: {response.status_code} - {response.text}')
+    try:
+        return fetch(f'/items/{item_id}')
+    except APIError as e:
+        st.error(f'Erro: {e.status_code} - {e.text}')
+        return None
+
+
+def search_items(term):
+    """Search items by product name through the API.
+
+    Args:
+        term (str): The search term.
+
+    Returns:
+        list: The matching items, best match first, if the request is successful, otherwise an empty list.
+    """
+    try:
+        return fetch('/items/search', {'q': term})['items']
+    except APIError as e:
+        st.error(f'Erro: {e.status_code} - {e.text}')
+        return []
+
+
+def get_valuation():
+    """Fetch the stock valuation totals from the API.
+
+    Returns:
+        dict: The totals if the request is successful, otherwise None.
+    """
+    try:
+        return fetch('/reports/valuation')['total']
+    except APIError as e:
+        st.error(f'Erro: {e.status_code} - {e.text}')
         return None
 
 
@@ -45,11 +202,10 @@ def create_item(data):
     Returns:
         dict: The created item data if the request is successful, otherwise None.
     """
-    response = requests.post(f'{API_URL}/items', json=data)
-    if response.status_code == 200:
-        return response.json()
-    else:
-        st.error(f'Erro: {response.status_code} - {response.text}')
+    try:
+        return send('POST', '/items', json=data)
+    except APIError as e:
+        st.error(f'Erro: {e.status_code} - {e.text}')
         return None
 
 
@@ -63,11 +219,10 @@ def update_item(item_id, data):
     Returns:
         dict: The updated item data if the request is successful, otherwise None.
     """
-    response = requests.put(f'{API_URL}/items/{item_id}', json=data)
-    if response.status_code == 200:
-        return response.json()
-    else:
-        st.error(f'Erro: {response.status_code} - {response.text}')
+    try:
+        return send('PUT', f'/items/{item_id}', json=data)
+    except APIError as e:
+        st.error(f'Erro: {e.status_code} - {e.text}')
         return None
 
 
@@ -80,29 +235,104 @@ def delete_item(item_id):
     Returns:
         dict: The deleted item data if the request is successful, otherwise None.
     """
-    response = requests.delete(f'{API_URL}/items/{item_id}')
-    if response.status_code == 200:
-        return response.json()
-    else:
-        st.error(f'Erro: {response.status_code} - {response.text}')
+    try:
+        return send('DELETE', f'/items/{item_id}')
+    except APIError as e:
+        st.error(f'Erro: {e.status_code} - {e.text}')
         return None
 
 
-def get_movement_history(product_id):
-    """Fetch the movement history for a product by ID from the API.
+def get_movement_history(product_id, params=None):
+    """Fetch a page of the movement history for a product by ID from the API.
 
     Args:
         product_id (int): The ID of the product to fetch the movement history for.
+        params (dict): Optional pagination and filter query parameters.
 
     Returns:
-        list: A list of movement history records if the request is successful, otherwise an empty list.
+        dict: The movements in the page and the cursor for the next one; an empty page if the request fails.
     """
-    response = requests.get(f'{API_URL}/movements/{product_id}')
-    if response.status_code == 200:
-        return response.json()
-    else:
-        st.error(f'Erro: {response.status_code} - {response.text}')
-        return []
+    try:
+        return fetch(f'/movements/{product_id}', params)
+    except APIError as e:
+        st.error(f'Erro: {e.status_code} - {e.text}')
+        return {'movements': [], 'next_cursor': None}
+
+
+def show_table(rows):
+    """Render rows in Streamlit's virtualized table.
+
+    Args:
+        rows (list): The rows to render.
+    """
+    st.dataframe(pd.DataFrame(rows), use_container_width=True, hide_index=True)
+
+
+def current_cursor(key, filters):
+    """Get the cursor of the page shown by a paged view.
+
+    The cursors of the pages already visited are kept in the session state, so the
+    view can go back without the API supporting backward cursors. Changing the
+    filters goes back to the first page.
+
+    Args:
+        key (str): The session state key of the view.
+        filters (dict): The filter and sorting parameters of the view.
+
+    Returns:
+        str: The cursor of the current page, or None for the first page.
+    """
+    pager = st.session_state.get(key)
+    if pager is None or pager['filters'] != filters:
+        pager = st.session_state[key] = {'filters': filters, 'cursors': [None]}
+    return pager['cursors'][-1]
+
+
+def next_page(key, cursor):
+    """Move a paged view to the next page.
+
+    Args:
+        key (str): The session state key of the view.
+        cursor (str): The cursor returned with the current page.
+    """
+    st.session_state[key]['cursors'].append(cursor)
+
+
+def previous_page(key):
+    """Move a paged view to the previous page.
+
+    Args:
+        key (str): The session state key of the view.
+    """
+    st.session_state[key]['cursors'].pop()
+
+
+def page_controls(key, next_cursor):
+    """Render the previous and next page buttons of a paged view.
+
+    Args:
+        key (str): The session state key of the view.
+        next_cursor (str): The cursor returned with the current page, or None on the last page.
+    """
+    page = len(st.session_state[key]['cursors'])
+    previous, label, following = st.columns([1, 2, 1])
+    previous.button('Anterior', key=f'{key}_previous', disabled=page == 1, on_click=previous_page, args=(key,))
+    label.write(f'Página {page}')
+    following.button(
+        'Próxima', key=f'{key}_next', disabled=next_cursor is None, on_click=next_page, args=(key, next_cursor)
+    )
+
+
+def query_params(**params):
+    """Build query parameters, leaving out the empty ones.
+
+    Args:
+        **params: The parameter values.
+
+    Returns:
+        dict: The parameters with a value.
+    """
+    return {name: value for name, value in params.items() if value not in (None, '')}
 
 
 st.title('Gestão de Inventário')
@@ -135,21 +365,55 @@ choice = st.session_state.choice
 if choice == 'view_items':
     st.subheader('Ver Itens')
     item_id = st.number_input('Busar item por ID', min_value=1, format='%d')
+    termo = st.text_input('Buscar item por nome')
     if st.button('Buscar'):
         item = get_item(item_id)
         if item:
-            df = pd.DataFrame([item])
-            st.write(df.to_html(index=False), unsafe_allow_html=True)
-    else:
-        items = get_items()
+            show_table([item])
+    elif termo.strip():
+        items = search_items(termo.strip())
         if items:
-            df = pd.DataFrame(items)
-            st.write(df.to_html(index=False), unsafe_allow_html=True)
+            show_table(items)
+        else:
+            st.info('Nenhum item encontrado')
+    else:
+        with st.expander('Filtros e ordenação'):
+            produto = st.text_input('Nome começa com')
+            unidade_medida = st.selectbox('Unidade de Medida', ['Todas', *UNITS])
+            estoque_min = st.number_input('Estoque mínimo', min_value=0.0, value=None, format='%.2f')
+            estoque_max = st.number_input('Estoque máximo', min_value=0.0, value=None, format='%.2f')
+            low_stock = st.number_input('Estoque abaixo de', min_value=0.01, value=None, format='%.2f')
+            sort = st.selectbox('Ordenar por', ['id', 'produto'], format_func={'id': 'ID', 'produto': 'Produto'}.get)
+            order = st.radio('Ordem', ['asc', 'desc'], format_func={'asc': 'Crescente', 'desc': 'Decrescente'}.get)
+            limit = st.selectbox('Itens por página', PAGE_SIZES, index=1)
+        filters = query_params(
+            produto=produto.strip(),
+            unidade_medida=None if unidade_medida == 'Todas' else unidade_medida,
+            estoque_min=estoque_min,
+            estoque_max=estoque_max,
+            low_stock=low_stock,
+            sort=sort,
+            order=order,
+            limit=limit,
+        )
+        params = query_params(**filters, after=current_cursor('items_pager', filters))
+        # Totais e página são independentes: buscados ao mesmo tempo
+        totals, page = fetch_concurrently((get_valuation,), (get_items, params))
+        if totals:
+            columns = st.columns(3)
+            columns[0].metric('Itens', totals['itens'])
+            columns[1].metric('Valor em Estoque', f"{totals['valor_estoque']:.2f}")
+            columns[2].metric('Receita Potencial', f"{totals['receita_potencial']:.2f}")
+        if page['items']:
+            show_table(page['items'])
+        else:
+            st.info('Nenhum item encontrado')
+        page_controls('items_pager', page['next_cursor'])
 
 elif choice == 'add_item':
     st.subheader('Adicionar Item')
     produto = st.text_input('Nome do Produto')
-    unidade_medida = st.selectbox('Unidade de Medida', ['litro', 'metro', 'quilograma', 'metro_cubico', 'quantidade'])
+    unidade_medida = st.selectbox('Unidade de Medida', UNITS)
     custo_medio = st.number_input('Custo Médio', min_value=0.0, format='%.2f')
     valor_venda = st.number_input('Valor de Venda', min_value=0.0, format='%.2f')
     if unidade_medida == 'quantidade':
@@ -168,8 +432,7 @@ elif choice == 'add_item':
         item = create_item(data)
         if item:
             st.success('Item adicionado com sucesso')
-            df = pd.DataFrame([item])
-            st.write(df.to_html(index=False), unsafe_allow_html=True)
+            show_table([item])
 
 elif choice == 'update_item':
     st.subheader('Atualizar Item')
@@ -184,8 +447,8 @@ elif choice == 'update_item':
         produto = st.text_input('Nome do Produto', value=item['produto'])
         unidade_medida = st.selectbox(
             'Unidade de Medida',
-            ['litro', 'metro', 'quilograma', 'metro_cubico', 'quantidade'],
-            index=['litro', 'metro', 'quilograma', 'metro_cubico', 'quantidade'].index(item['unidade_medida']),
+            UNITS,
+            index=UNITS.index(item['unidade_medida']),
         )
         custo_medio = st.number_input('Custo Médio', min_value=0.0, format='%.2f', value=item['custo_medio'])
         valor_venda = st.number_input('Valor de Venda', min_value=0.0, format='%.2f', value=item['valor_venda'])
@@ -205,8 +468,7 @@ elif choice == 'update_item':
             updated_item = update_item(item_id, data)
             if updated_item:
                 st.success('Item atualizado com sucesso')
-                df = pd.DataFrame([updated_item])
-                st.write(df.to_html(index=False), unsafe_allow_html=True)
+                show_table([updated_item])
 
 elif choice == 'delete_item':
     st.subheader('Deletar Item')
@@ -221,7 +483,32 @@ elif choice == 'view_movement_history':
     st.subheader('Ver Histórico de Movimentação')
     product_id = st.number_input('ID do Produto', min_value=1, format='%d')
     if st.button('Buscar'):
-        movements = get_movement_history(product_id)
-        if movements:
-            df = pd.DataFrame(movements)
-            st.write(df.to_html(index=False), unsafe_allow_html=True)
+        st.session_state.history_product = product_id
+
+    if 'history_product' in st.session_state:
+        product_id = st.session_state.history_product
+        with st.expander('Filtros e ordenação'):
+            inicio = st.date_input('De', value=None, format='DD/MM/YYYY')
+            fim = st.date_input('Até', value=None, format='DD/MM/YYYY')
+            movimentacao = st.selectbox('Tipo', ['Todas', *MOVEMENT_TYPES])
+            order = st.radio('Ordem', ['asc', 'desc'], format_func={'asc': 'Mais antigas', 'desc': 'Mais recentes'}.get)
+            limit = st.selectbox('Movimentações por página', PAGE_SIZES, index=1)
+        filters = query_params(
+            product_id=product_id,
+            # 'to' é exclusivo: o dia final inteiro entra no filtro
+            **{'from': inicio and inicio.isoformat()},
+            to=fim and (fim + timedelta(days=1)).isoformat(),
+            movimentacao=None if movimentacao == 'Todas' else movimentacao,
+            order=order,
+            limit=limit,
+        )
+        params = query_params(**filters, after=current_cursor('movements_pager', filters))
+        params.pop('product_id')
+        item, page = fetch_concurrently((get_item, product_id), (get_movement_history, product_id, params))
+        if item:
+            st.write(f"**{item['produto']}** — estoque atual: {item['estoque']}")
+        if page['movements']:
+            show_table(page['movements'])
+        else:
+            st.info('Nenhuma movimentação encontrada')
+        page_controls('movements_pager', page['next_cursor'])